@@ -1,26 +1,59 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.routing import Match
 from pydantic import BaseModel
-from chains.rag_chain import build_chain, build_contextual_chain
+from chains.rag_chain import build_retriever, build_answer_chain, build_contextual_chain, CHAT_MODEL
 from typing import List, Dict, Optional
 from memory.session_memory import get_memory
 from langchain_core.messages import HumanMessage, AIMessage
-from groq import Groq
 import base64
+import io
 import tempfile
 import os
 from loaders.load_csv import load_csv
-from loaders.load_pdf import PyPDFLoader, ingest_pdf
+from loaders.load_table import load_table
+from loaders.load_pdf import load_pdf, ingest_pdf
 from diskcache import Cache
 import hashlib
+import time
 import pandas as pd
 from utils.data_analyzer import DataAnalyzer
+from utils.image_utils import (
+    decode_image,
+    perceptual_hash,
+    find_similar_image,
+    add_to_phash_index,
+    prepare_image_for_upload,
+)
+from utils import llm_gateway
+from utils.single_flight import SingleFlight, SINGLE_FLIGHT_RESULT_TTL
+from utils.metrics import (
+    current_endpoint,
+    stage,
+    render_metrics,
+    REQUEST_SECONDS,
+    REQUESTS_IN_FLIGHT,
+    LLM_TOKENS,
+)
+from utils.profiling import (
+    authorized,
+    should_profile,
+    new_request_id,
+    profile_request,
+    profiled,
+    load_profile,
+)
+
+VISION_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
 
 # Set up cache directory
 cache = Cache(directory="./.cache")
 # Store chat histories per session
 chat_store = cache.get("chat_store", {})  # recover from cache if available
+# Run concurrent identical work (same content hash) once, across threads and workers
+single_flight = SingleFlight(cache)
 
 # Util: Create stable hash key
 def hash_data(data: str) -> str:
@@ -38,6 +71,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_path(request: Request) -> str:
+    """Route template (e.g. /recent-chats/{session_id}) to keep metric labels bounded."""
+    for route in app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def track_request_metrics(request: Request, call_next):
+    endpoint = route_path(request)
+    current_endpoint.set(endpoint)
+    REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, status=status)
+
+@app.middleware("http")
+async def profile_sampled_requests(request: Request, call_next):
+    # Opt-in: X-Profile header (with the profiling token) or PROFILE_SAMPLE_RATE, otherwise no profiling overhead
+    if not should_profile(request.headers):
+        return await call_next(request)
+    request_id = new_request_id()
+    with profile_request(request_id, route_path(request)) as profile:
+        response = await call_next(request)
+    # Writing the profile files would block the event loop
+    await run_in_threadpool(profile.save)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+def require_profiling_token(request: Request):
+    # Unknown, not forbidden: the routes do not exist without the token
+    if not authorized(request.headers):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/debug/profiles/{request_id}")
+def get_profile(request_id: str, request: Request):
+    require_profiling_token(request)
+    profile = load_profile(request_id, "json")
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@app.get("/debug/profiles/{request_id}/folded")
+def get_profile_stacks(request_id: str, request: Request):
+    """Folded stacks, ready for flamegraph.pl or speedscope."""
+    require_profiling_token(request)
+    stacks = load_profile(request_id, "folded")
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(stacks)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+def persist_chat_store():
+    with stage("cache_write"):
+        cache["chat_store"] = chat_store
+
 # Input schema
 class QueryRequest(BaseModel):
     question: str
@@ -56,6 +155,10 @@ class PdfQueryRequest(QueryRequest):
     pdf_base64: str
     pdf_filename: str
 
+class CSVStatisticsRequest(BaseModel):
+    csv_base64: str
+    csv_filename: Optional[str] = None
+
 def update_memory_and_history(memory, chat_history, session_id: str):
     session_key = session_id or "default"
     memory.messages.clear()
@@ -83,37 +186,110 @@ def update_memory_and_history(memory, chat_history, session_id: str):
 
     # Persist updated chat history
     chat_store[session_key] = existing_history + updated_history
-    cache["chat_store"] = chat_store
+    persist_chat_store()
 
     # Langchain-style formatted string
     chat_history_str = "\n".join([f"{m.type}: {m.content}" for m in memory.messages])
     return chat_history_str
 
-# Initialize retrieval chain once
-rag_chain = build_chain()
+# Initialize the retriever and answer chain once
+retriever = build_retriever()
+answer_chain = build_answer_chain()
 
 @app.post("/chat")
+@profiled
 def chat_endpoint(request: QueryRequest):
     memory = get_memory(request.session_id or "default")
     # Pass memory to the chain
     session_key = request.session_id or "default"
     # Update memory + store human message
-    chat_history_str = update_memory_and_history(memory, request.chat_history, session_key)
-    # Invoke model
-    response = rag_chain.invoke({
-        "input": request.question,
-        "chat_history": chat_history_str
-    })
+    with stage("history_rebuild"):
+        chat_history_str = update_memory_and_history(memory, request.chat_history, session_key)
+    # Invoke model (identical in-flight questions of one session share one call)
+    response_key = hash_data(f"chat:{session_key}:{chat_history_str}:{request.question}")
+
+    def invoke():
+        docs = retriever.invoke(request.question)
+        # Only the model request goes through the gateway: retries and hedges do not retrieve again
+        return llm_gateway.call(CHAT_MODEL, answer_chain.invoke, {
+            "input": request.question,
+            "chat_history": chat_history_str,
+            "context": docs
+        }) or "No response"
+
+    answer = single_flight.do(response_key, invoke, expire=SINGLE_FLIGHT_RESULT_TTL, name="chat_response")
     # Append AI response to history
     chat_store.setdefault(session_key, [])
     chat_store[session_key].append({
         "type": "ai",
-        "content": response.get("answer", "No response")
+        "content": answer
     })
-    cache["chat_store"] = chat_store
-    return {"response": response.get("answer", "No response")}
+    persist_chat_store()
+    return {"response": answer}
+
+def answer_with_context(question: str, chat_history_str: str, context: str, context_key: str, session_key: str) -> str:
+    """Invoke the contextual chain; identical in-flight requests of one session share one call."""
+    contextual_chain = build_contextual_chain()
+
+    def invoke():
+        response = llm_gateway.call(CHAT_MODEL, contextual_chain.invoke, {
+            "input": question,
+            "chat_history": chat_history_str,
+            "context": context
+        })
+        return response.content if hasattr(response, "content") else str(response)
+
+    response_key = hash_data(f"response:{session_key}:{context_key}:{chat_history_str}:{question}")
+    return single_flight.do(response_key, invoke, expire=SINGLE_FLIGHT_RESULT_TTL, name="contextual_response")
+
+def describe_image(image, image_base64: str, image_type: str) -> str:
+    """Ask the vision model to describe an image, downscaled and recompressed first."""
+    upload_base64, upload_type = prepare_image_for_upload(image, image_base64, image_type)
+    client = llm_gateway.get_groq_client()
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Describe this image for data analysis:"},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{upload_type};base64,{upload_base64}",
+                    },
+                },
+            ],
+        }
+    ]
+    chat_completion = llm_gateway.call(
+        VISION_MODEL,
+        client.chat.completions.create,
+        messages=messages,
+        model=VISION_MODEL
+    )
+    if chat_completion.usage is not None:
+        LLM_TOKENS.inc(chat_completion.usage.prompt_tokens, model=VISION_MODEL, kind="prompt")
+        LLM_TOKENS.inc(chat_completion.usage.completion_tokens, model=VISION_MODEL, kind="completion")
+    return chat_completion.choices[0].message.content
+
+def get_image_context(image_base64: str, image_type: str, image_key: str) -> str:
+    with stage("image_decode"):
+        image = decode_image(image_base64)
+    phash = perceptual_hash(image)
+    # Reuse the description of a near-identical image (re-saved, re-compressed, resized)
+    similar_key = find_similar_image(cache, phash)
+    if similar_key is not None:
+        # The description may have expired or been evicted since the index lookup
+        similar_context = cache.get(similar_key)
+        if similar_context is not None:
+            return similar_context
+    image_context = describe_image(image, image_base64, image_type)
+    # Stored before it is indexed, so the index never points at a missing description
+    cache.set(image_key, image_context)
+    add_to_phash_index(cache, phash, image_key)
+    return image_context
 
 @app.post("/image-upload")
+@profiled
 def image_upload_endpoint(request: ImageQueryRequest):
     if request.chat_history:
         for msg in request.chat_history:
@@ -125,60 +301,45 @@ def image_upload_endpoint(request: ImageQueryRequest):
                 }
 
     image_key = hash_data(request.image_base64)
-    if image_key in cache:
-        image_context = cache[image_key]
-    else:
-        client = Groq()
-        model = "meta-llama/llama-4-maverick-17b-128e-instruct"
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "Describe this image for data analysis:"},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{request.image_type};base64,{request.image_base64}",
-                        },
-                    },
-                ],
-            }
-        ]
-        chat_completion = client.chat.completions.create(
-            messages=messages,
-            model=model
-        )
-        image_context = chat_completion.choices[0].message.content
-        cache[image_key] = image_context
+    image_context = single_flight.do(
+        image_key,
+        lambda: get_image_context(request.image_base64, request.image_type, image_key),
+        name="image"
+    )
     # Step 2: Use build_contextual_chain with image context
-    contextual_chain = build_contextual_chain()
-
     memory = get_memory(request.session_id or "default")
 
     session_key = request.session_id or "default"
 
     # Update memory + store human message
-    chat_history_str = update_memory_and_history(memory, request.chat_history, session_key)
+    with stage("history_rebuild"):
+        chat_history_str = update_memory_and_history(memory, request.chat_history, session_key)
 
     # Invoke model
-    response = contextual_chain.invoke({
-        "input": request.question,
-        "chat_history": chat_history_str,
-        "context": image_context
-    })
+    answer = answer_with_context(request.question, chat_history_str, image_context, image_key, session_key)
 
     # Append AI response to history
     chat_store.setdefault(session_key, [])
     chat_store[session_key].append({
         "type": "ai",
-        "content": response.content if hasattr(response, "content") else str(response)
+        "content": answer
     })
-    cache["chat_store"] = chat_store  # persist
+    persist_chat_store()
 
     # After getting image_context (for image-upload)
-    return {"response": response.content if hasattr(response, "content") else str(response)}
+    return {"response": answer}
+
+def parse_csv_context(csv_base64: str) -> str:
+    csv_bytes = base64.b64decode(csv_base64)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp_csv:
+        tmp_csv.write(csv_bytes)
+        tmp_csv_path = tmp_csv.name
+    csv_docs = load_csv(tmp_csv_path)
+    os.unlink(tmp_csv_path)
+    return "\n".join([doc.page_content for doc in csv_docs])
 
 @app.post("/csv-upload")
+@profiled
 def csv_upload_endpoint(request: CSVQueryRequest):
     
     if request.chat_history:
@@ -191,43 +352,65 @@ def csv_upload_endpoint(request: CSVQueryRequest):
                 }
 
     csv_key = hash_data(request.csv_base64 + request.question)
-    if csv_key in cache:
-        csv_context = cache[csv_key]
-    else:
-        csv_bytes = base64.b64decode(request.csv_base64)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp_csv:
-            tmp_csv.write(csv_bytes)
-            tmp_csv_path = tmp_csv.name
-        csv_docs = load_csv(tmp_csv_path)
-        os.unlink(tmp_csv_path)
-        csv_context = "\n".join([doc.page_content for doc in csv_docs])
-        cache[csv_key] = csv_context
+    csv_context = single_flight.do(csv_key, lambda: parse_csv_context(request.csv_base64), name="csv")
 
-    contextual_chain = build_contextual_chain()
     memory = get_memory(request.session_id or "default")
     session_key = request.session_id or "default"
 
     # Update memory + store human message
-    chat_history_str = update_memory_and_history(memory, request.chat_history, session_key)
+    with stage("history_rebuild"):
+        chat_history_str = update_memory_and_history(memory, request.chat_history, session_key)
 
     # Invoke model
-    response = contextual_chain.invoke({
-        "input": request.question,
-        "chat_history": chat_history_str,
-        "context": csv_context
-    })
+    answer = answer_with_context(request.question, chat_history_str, csv_context, csv_key, session_key)
 
     # Append AI response to history
     chat_store.setdefault(session_key, [])
     chat_store[session_key].append({
         "type": "ai",
-        "content": response.content if hasattr(response, "content") else str(response)
+        "content": answer
     })
-    cache["chat_store"] = chat_store  # persist
-
-    return {"response": response.content if hasattr(response, "content") else str(response)}
+    persist_chat_store()
+
+    return {"response": answer}
+
+_analyzer = None
+
+def get_analyzer() -> DataAnalyzer:
+    """One DataAnalyzer per worker, created on first use (it needs the Gemini/Google API key)"""
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = DataAnalyzer()
+    return _analyzer
+
+def csv_statistics(csv_base64: str, filename: str, key: str) -> dict:
+    try:
+        df = load_table(io.BytesIO(base64.b64decode(csv_base64)), name=filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Could not read the file: {e}")
+    analyzer = get_analyzer()
+    cleaned_df, _ = analyzer.deep_clean_data(df)
+    return analyzer.statistical_analysis(cleaned_df, fingerprint=key).to_dict()
+
+@app.post("/csv-statistics")
+@profiled
+def csv_statistics_endpoint(request: CSVStatisticsRequest):
+    """StatisticalReport of the cleaned file as JSON: numeric summary, normality tests, correlations, top values"""
+    filename = request.csv_filename or "data.csv"
+    stats_key = hash_data(f"statistics:{filename}:{request.csv_base64}")
+    return single_flight.do(stats_key, lambda: csv_statistics(request.csv_base64, filename, stats_key), name="statistics")
+
+def parse_pdf_context(pdf_base64: str) -> str:
+    pdf_bytes = base64.b64decode(pdf_base64)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
+        tmp_pdf.write(pdf_bytes)
+        tmp_pdf_path = tmp_pdf.name
+    pdf_docs = load_pdf(tmp_pdf_path)
+    os.unlink(tmp_pdf_path)
+    return "\n".join([doc.page_content for doc in pdf_docs])
 
 @app.post("/pdf-upload")
+@profiled
 def pdf_upload_endpoint(request: PdfQueryRequest):
     if request.chat_history:
         for msg in request.chat_history:
@@ -239,44 +422,28 @@ def pdf_upload_endpoint(request: PdfQueryRequest):
                 }
 
     pdf_key = hash_data(request.pdf_base64 + request.question)
-    if pdf_key in cache:
-        pdf_context = cache[pdf_key]
-    else:
-        pdf_bytes = base64.b64decode(request.pdf_base64)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
-            tmp_pdf.write(pdf_bytes)
-            tmp_pdf_path = tmp_pdf.name
-        loader = PyPDFLoader(tmp_pdf_path)
-        pdf_docs = loader.load()
-        os.unlink(tmp_pdf_path)
-        pdf_context = "\n".join([doc.page_content for doc in pdf_docs])
-        cache[pdf_key] = pdf_context
-
+    pdf_context = single_flight.do(pdf_key, lambda: parse_pdf_context(request.pdf_base64), name="pdf")
 
     # Prepare chat history
     memory = get_memory(request.session_id or "default")
     session_key = request.session_id or "default"
 
     # Update memory + store human message
-    chat_history_str = update_memory_and_history(memory, request.chat_history, session_key)
+    with stage("history_rebuild"):
+        chat_history_str = update_memory_and_history(memory, request.chat_history, session_key)
 
     # Invoke model
-    contextual_chain = build_contextual_chain()
-    response = contextual_chain.invoke({
-        "input": request.question,
-        "chat_history": chat_history_str,
-        "context": pdf_context
-    })
+    answer = answer_with_context(request.question, chat_history_str, pdf_context, pdf_key, session_key)
 
     # Append AI response to history
     chat_store.setdefault(session_key, [])
     chat_store[session_key].append({
         "type": "ai",
-        "content": response.content if hasattr(response, "content") else str(response)
+        "content": answer
     })
-    cache["chat_store"] = chat_store  # persist
+    persist_chat_store()
 
-    return {"response": response.content if hasattr(response, "content") else str(response)}
+    return {"response": answer}
 
 @app.get("/recent-chats/{session_id}")
 def get_recent_chats(session_id: str):
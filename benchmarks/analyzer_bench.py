@@ -0,0 +1,166 @@
+"""
+DataAnalyzer benchmark over synthetic datasets.
+
+Generates frames with mixed numeric, string, date, categorical, high-missing,
+constant and duplicated columns, then times every deep_clean_data step
+separately plus statistical_analysis and create_visualizations. Timings come
+from a run without tracing; peak memory per step comes from a second run
+under tracemalloc (which slows allocation-heavy steps down).
+
+    python benchmarks/analyzer_bench.py --rows 10000 100000 1000000 --repeat 3
+    python benchmarks/analyzer_bench.py --rows 1000000 --n-jobs 0 --skip-plots
+    python benchmarks/analyzer_bench.py --rows 1000000 --engine polars
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+# generate_insights is not benchmarked, no real key is needed
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+from utils.data_analyzer import DataAnalyzer, CleaningRun, clear_figure_cache
+from utils import correlation, stats_report
+
+CITIES = ["New York", " new york", "LONDON", "London ", "paris", "Paris!", "Berlin", "berlin",
+          "Tokyo", "tokyo.", "Delhi", "DELHI"]
+FLAGS = ["Yes", "Y", "true", "1", "No", "n", "FALSE", "0", "yes", "no"]
+
+
+def make_synthetic_frame(n_rows: int, seed: int = 42, duplicate_ratio: float = 0.05) -> pd.DataFrame:
+    """Synthetic frame mixing the column shapes users upload."""
+    rng = np.random.default_rng(seed)
+    names = np.array([f"  Customer #{i}, Inc. " for i in range(50_000)], dtype=object)
+    dates = pd.date_range("2015-01-01", periods=3650, freq="D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+    notes = np.array([f"Note {i}: follow-up?" for i in range(1000)], dtype=object)
+
+    amount = rng.normal(250, 60, n_rows)
+    outliers = rng.random(n_rows) < 0.01
+    amount[outliers] *= 50
+    score = rng.normal(0.5, 0.2, n_rows)
+    score[rng.random(n_rows) < 0.2] = np.nan
+
+    df = pd.DataFrame({
+        "id": np.arange(n_rows),
+        "amount": amount,
+        "quantity": rng.integers(1, 100, n_rows),
+        "score": score,
+        "customer": names[rng.integers(0, len(names), n_rows)],
+        "city": np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), n_rows)],
+        "subscribed": np.array(FLAGS, dtype=object)[rng.integers(0, len(FLAGS), n_rows)],
+        "signup_date": dates[rng.integers(0, len(dates), n_rows)],
+        "notes": notes[rng.integers(0, len(notes), n_rows)],
+        "source": "web",
+    })
+    df.loc[rng.random(n_rows) < 0.05, "signup_date"] = None
+    df.loc[rng.random(n_rows) < 0.02, "subscribed"] = None
+    df.loc[rng.random(n_rows) < 0.7, "notes"] = None
+
+    # Overwrite a share of rows with copies of other rows (id included) to create exact duplicates
+    n_duplicates = int(n_rows * duplicate_ratio)
+    if n_duplicates:
+        targets = rng.choice(n_rows, n_duplicates, replace=False)
+        sources = rng.choice(n_rows, n_duplicates, replace=False)
+        df.iloc[targets] = df.iloc[sources].to_numpy()
+        df = df.infer_objects()
+    return df
+
+
+def build_plots(analyzer: DataAnalyzer, df, engine: str) -> dict:
+    """create_visualizations builds lazily, build every figure from a cold cache"""
+    clear_figure_cache()
+    correlation.clear_cache()
+    return {key: spec.figure() for key, spec in analyzer.create_visualizations(df, engine).items()}
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def peak_call(fn, *args):
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_size(analyzer: DataAnalyzer, n_rows: int, args) -> dict:
+    df = make_synthetic_frame(n_rows, args.seed)
+    result = {"rows": n_rows, "input_mb": round(df.memory_usage(deep=True).sum() / 2 ** 20, 1)}
+
+    best = {}
+    for _ in range(args.repeat):
+        run = CleaningRun()
+        (cleaned_df, _), total = time_call(lambda: analyzer.deep_clean_data(df, args.n_jobs, args.engine, run=run))
+        for step, seconds in list(run.step_timings.items()) + [("deep_clean_total", total)]:
+            best[step] = min(best.get(step, float("inf")), seconds)
+        # Reports and correlation matrices are cached per dataset: time the computation, not the lookup
+        stats_report.clear_cache()
+        correlation.clear_cache()
+        _, seconds = time_call(analyzer.statistical_analysis, cleaned_df, args.engine)
+        best["statistical_analysis"] = min(best.get("statistical_analysis", float("inf")), seconds)
+        if not args.skip_plots:
+            _, seconds = time_call(build_plots, analyzer, cleaned_df, args.engine)
+            best["create_visualizations"] = min(best.get("create_visualizations", float("inf")), seconds)
+    result["seconds"] = {step: round(seconds, 4) for step, seconds in best.items()}
+
+    if not args.skip_memory:
+        peaks = {}
+        run = CleaningRun()
+        (cleaned_df, _), last_peak = peak_call(lambda: analyzer.deep_clean_data(df, args.n_jobs, args.engine, run=run))
+        # Steps reset the tracemalloc peak, the overall peak is the largest step peak
+        peaks.update(run.step_peak_memory)
+        peaks["deep_clean_total"] = max([last_peak] + list(run.step_peak_memory.values()))
+        stats_report.clear_cache()
+        correlation.clear_cache()
+        _, peaks["statistical_analysis"] = peak_call(analyzer.statistical_analysis, cleaned_df, args.engine)
+        if not args.skip_plots:
+            _, peaks["create_visualizations"] = peak_call(build_plots, analyzer, cleaned_df, args.engine)
+        result["peak_mb"] = {step: round(peak / 2 ** 20, 1) for step, peak in peaks.items()}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Dataset sizes, e.g. 10000 100000 1000000 10000000")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per size (best is reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=1, help="Worker processes for the column-local steps (0 = every core)")
+    parser.add_argument("--engine", choices=["pandas", "polars"], default="pandas", help="DataAnalyzer backend")
+    parser.add_argument("--skip-plots", action="store_true", help="Do not time create_visualizations")
+    parser.add_argument("--skip-memory", action="store_true", help="Do not run the tracemalloc pass")
+    parser.add_argument("--json-out", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    analyzer = DataAnalyzer()
+    results = []
+    for n_rows in args.rows:
+        result = bench_size(analyzer, n_rows, args)
+        results.append(result)
+        print(json.dumps(result))
+
+    steps = list(results[0]["seconds"])
+    print("\nstep | " + " | ".join(f"{r['rows']:,} rows (s / peak MB)" for r in results))
+    for step in steps:
+        cells = [
+            f"{r['seconds'].get(step, '-')} / {r.get('peak_mb', {}).get(step, '-')}"
+            for r in results
+        ]
+        print(f"{step} | " + " | ".join(cells))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
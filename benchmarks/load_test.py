@@ -0,0 +1,320 @@
+"""
+End-to-end load test of api/main.py against the local stub LLM server.
+
+Starts the stub (benchmarks/stub_llm_server.py) and the API under uvicorn,
+replays a mixed chat / CSV / PDF / image workload at fixed concurrency levels
+and reports throughput, p50/p95/p99 latency and server CPU and RSS.
+
+The workload is seeded from a JSONL trace. Each line may set "endpoint"
+(chat, csv, pdf, image) and "question"; lines shaped like requests.jsonl
+(title/body) are used as questions and get an endpoint from --mix.
+
+    python benchmarks/load_test.py --trace requests.jsonl --concurrency 1 4 16 --requests 200
+"""
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import base64
+import random
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+from benchmarks.stub_llm_server import start_stub_server, StubConfig
+
+ENDPOINTS = {
+    "chat": "/chat",
+    "csv": "/csv-upload",
+    "pdf": "/pdf-upload",
+    "image": "/image-upload",
+}
+DEFAULT_QUESTIONS = [
+    "How do I handle missing values in a pandas DataFrame?",
+    "What is the difference between a histogram and a bar chart?",
+    "Summarize the key columns of this dataset.",
+    "Which SQL join should I use to keep unmatched rows?",
+    "How do I detect outliers with the IQR method?",
+]
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in --mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def load_trace(path: str, mix: dict, seed: int) -> list:
+    """Read the trace into [{"endpoint", "question"}] items."""
+    rng = random.Random(seed)
+    items = []
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                question = record.get("question") or record.get("title") or record.get("body")
+                endpoint = record.get("endpoint") or rng.choices(list(mix), weights=list(mix.values()))[0]
+                items.append({"endpoint": endpoint, "question": question})
+    if not items:
+        items = [
+            {"endpoint": rng.choices(list(mix), weights=list(mix.values()))[0], "question": question}
+            for question in DEFAULT_QUESTIONS
+        ]
+    return items
+
+
+def make_fixtures(seed: int) -> dict:
+    """Small synthetic CSV, PDF and PNG payloads, base64 encoded."""
+    rng = random.Random(seed)
+    rows = ["id,region,sales,date"] + [
+        f"{i},{rng.choice(['north', 'south', 'east', 'west'])},{rng.uniform(10, 500):.2f},2024-01-{1 + i % 28:02d}"
+        for i in range(200)
+    ]
+    csv_bytes = "\n".join(rows).encode("utf-8")
+
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (800, 600), "white")
+    draw = ImageDraw.Draw(image)
+    for i in range(8):
+        height = rng.randint(50, 500)
+        draw.rectangle((60 + i * 90, 580 - height, 120 + i * 90, 580), fill=(40, 90, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+
+    return {
+        "csv": base64.b64encode(csv_bytes).decode("utf-8"),
+        "pdf": base64.b64encode(_minimal_pdf("Quarterly sales grew 12 percent in the north region.")).decode("utf-8"),
+        "image": base64.b64encode(buffer.getvalue()).decode("utf-8"),
+    }
+
+
+def _minimal_pdf(text: str) -> bytes:
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def build_payload(item: dict, fixtures: dict, unique: bool) -> dict:
+    question = item["question"]
+    if unique:
+        # Defeat the response caches so every request reaches the (stub) LLM
+        question = f"{question} [{uuid.uuid4().hex[:8]}]"
+    payload = {"question": question, "session_id": f"bench-{uuid.uuid4().hex}", "chat_history": []}
+    endpoint = item["endpoint"]
+    if endpoint == "csv":
+        payload.update(csv_base64=fixtures["csv"], csv_filename="bench.csv")
+    elif endpoint == "pdf":
+        payload.update(pdf_base64=fixtures["pdf"], pdf_filename="bench.pdf")
+    elif endpoint == "image":
+        payload.update(image_base64=fixtures["image"], image_type="image/png")
+    return payload
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of the API process (and its children) in the background."""
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.rss_peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        try:
+            import psutil
+            self._process = psutil.Process(pid)
+        except ImportError:
+            self._process = None
+
+    def cpu_seconds(self) -> float:
+        if self._process is not None:
+            processes = [self._process] + self._process.children(recursive=True)
+            return sum(p.cpu_times().user + p.cpu_times().system for p in processes)
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def rss_bytes(self) -> int:
+        if self._process is not None:
+            processes = [self._process] + self._process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes)
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.rss_peak = max(self.rss_peak, self.rss_bytes())
+
+    def __enter__(self):
+        self.rss_peak = self.rss_bytes()
+        self._cpu_start = self.cpu_seconds()
+        self._wall_start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.cpu_used = self.cpu_seconds() - self._cpu_start
+        self.wall = time.perf_counter() - self._wall_start
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_level(client: httpx.Client, api_url: str, items: list, fixtures: dict,
+              concurrency: int, n_requests: int, unique: bool, sampler_pid: int) -> dict:
+    workload = [items[i % len(items)] for i in range(n_requests)]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def send(item):
+        nonlocal errors
+        payload = build_payload(item, fixtures, unique)
+        start = time.perf_counter()
+        try:
+            response = client.post(api_url + ENDPOINTS[item["endpoint"]], json=payload)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    with ProcessSampler(sampler_pid) as sampler:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(send, workload))
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / sampler.wall, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "server_cpu_pct": round(100 * sampler.cpu_used / sampler.wall, 1),
+        "server_rss_peak_mb": round(sampler.rss_peak / 2 ** 20, 1),
+    }
+
+
+def start_api(port: int, stub_url: str, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": env.get("GROQ_API_KEY", "stub"),
+        "GROQ_BASE_URL": stub_url,
+        "GROQ_API_BASE": stub_url,
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+
+
+def wait_until_ready(client: httpx.Client, api_url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API process exited during startup")
+        try:
+            if client.get(api_url + "/metrics").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("API did not become ready in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", help="JSONL trace file (requests.jsonl style)")
+    parser.add_argument("--mix", default="chat=0.6,csv=0.15,pdf=0.1,image=0.15",
+                        help="Endpoint weights for trace lines without an endpoint")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Stub time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=200.0, help="Stub token rate")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Stub tokens per answer")
+    parser.add_argument("--allow-cache-hits", action="store_true",
+                        help="Replay questions verbatim instead of making each one unique")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--json-out", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    items = load_trace(args.trace, parse_mix(args.mix), args.seed)
+    fixtures = make_fixtures(args.seed)
+    stub, stub_url = start_stub_server(0, StubConfig(args.ttft_ms, args.tokens_per_s, args.completion_tokens))
+    api_url = f"http://127.0.0.1:{args.port}"
+    api = start_api(args.port, stub_url, args.workers)
+    results = []
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    try:
+        with httpx.Client(timeout=300, limits=limits) as client:
+            wait_until_ready(client, api_url, api, args.startup_timeout)
+            for concurrency in args.concurrency:
+                result = run_level(client, api_url, items, fixtures, concurrency, args.requests,
+                                   not args.allow_cache_hits, api.pid)
+                results.append(result)
+                print(json.dumps(result))
+    finally:
+        api.terminate()
+        api.wait(timeout=30)
+        stub.shutdown()
+
+    header = ["concurrency", "throughput_rps", "p50_ms", "p95_ms", "p99_ms",
+              "server_cpu_pct", "server_rss_peak_mb", "errors"]
+    print("\n" + " | ".join(header))
+    for result in results:
+        print(" | ".join(str(result[column]) for column in header))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Retrieval benchmark: recall@k, MRR and latency across FAISS index configurations.
+
+Builds flat, IVF, HNSW and quantized indexes over data/data.jsonl with the
+same embedding model as vector_db/faiss_db.py, runs a held-out query set and
+reports recall@k, MRR, query latency percentiles, index size and build time.
+The production retriever (MMR, k=6, lambda_mult=0.25, fetch_k=20) is scored
+on the flat index alongside the plain similarity variants.
+
+Queries come from a JSONL file with {"query": ..., "relevant": [chunk_id, ...]}.
+Without one, a seeded sample of chunks is held out and a span of each chunk's
+text is used as its query (self-retrieval proxy). Runs offline on CPU once the
+embedding model is in the local HuggingFace cache (set HF_HUB_OFFLINE=1).
+
+    python benchmarks/retrieval_bench.py --k 1 5 10 --n-queries 200
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+import faiss
+from loaders.load_data import load_jsonl
+
+FETCH_K = 20
+
+
+def chunk_ids(data: list) -> list:
+    return [str(item.get("chunk_id") or i) for i, item in enumerate(data)]
+
+
+def load_queries(path: str, data: list, ids: list, n_queries: int, seed: int) -> list:
+    """[(query, set(relevant chunk ids))]"""
+    if path:
+        return [(q["query"], set(map(str, q["relevant"]))) for q in load_jsonl(path)]
+    rng = random.Random(seed)
+    queries = []
+    for i in rng.sample(range(len(data)), min(n_queries, len(data))):
+        words = data[i]["content"].split()
+        if len(words) < 6:
+            continue
+        length = min(12, len(words))
+        start = rng.randint(0, len(words) - length)
+        queries.append((" ".join(words[start:start + length]), {ids[i]}))
+    return queries
+
+
+def embed(texts: list, batch_size: int = 256) -> np.ndarray:
+    from vector_db.faiss_db import EMBEDDING
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(EMBEDDING.embed_documents(texts[start:start + batch_size]))
+    return np.asarray(vectors, dtype="float32")
+
+
+def build_variants(dim: int, n: int, args) -> dict:
+    """Index factories keyed by variant name; LangChain's FAISS store uses IndexFlatL2."""
+    nlist = max(1, min(args.nlist, n // 39))
+    pq_m = next(m for m in (16, 8, 4, 2, 1) if dim % m == 0)
+    # 8-bit codes need ~39 * 256 training points, use 4-bit codes on small corpora
+    pq_bits = 8 if n >= 39 * 256 else 4
+
+    def ivf():
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.nprobe = args.nprobe
+        return index
+
+    def hnsw():
+        index = faiss.IndexHNSWFlat(dim, args.hnsw_m)
+        index.hnsw.efConstruction = args.ef_construction
+        index.hnsw.efSearch = args.ef_search
+        return index
+
+    def ivf_pq():
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, pq_m, pq_bits)
+        index.nprobe = args.nprobe
+        return index
+
+    return {
+        "flat": lambda: faiss.IndexFlatL2(dim),
+        f"ivf{nlist}_nprobe{args.nprobe}": ivf,
+        f"hnsw{args.hnsw_m}_ef{args.ef_search}": hnsw,
+        "sq8": lambda: faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit),
+        f"ivf{nlist}_pq{pq_m}": ivf_pq,
+    }
+
+
+def mmr_search(index, vectors: np.ndarray, query: np.ndarray, k: int, lambda_mult: float) -> list:
+    """Same selection as the production retriever (search_type="mmr")."""
+    from langchain_community.vectorstores.utils import maximal_marginal_relevance
+    _, candidates = index.search(query.reshape(1, -1), FETCH_K)
+    candidates = [i for i in candidates[0] if i != -1]
+    selected = maximal_marginal_relevance(query, vectors[candidates], k=k, lambda_mult=lambda_mult)
+    return [candidates[i] for i in selected]
+
+
+def score(ranked: list, relevant: set, ids: list, ks: list) -> tuple:
+    hits = [ids[i] in relevant for i in ranked]
+    recalls = {k: sum(hits[:k]) / len(relevant) for k in ks}
+    reciprocal_rank = next((1 / (rank + 1) for rank, hit in enumerate(hits) if hit), 0.0)
+    return recalls, reciprocal_rank
+
+
+def evaluate(name: str, search, queries: list, query_vectors: np.ndarray, ids: list, ks: list) -> dict:
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks = []
+    latencies = []
+    for (_, relevant), vector in zip(queries, query_vectors):
+        start = time.perf_counter()
+        ranked = search(vector)
+        latencies.append(time.perf_counter() - start)
+        query_recalls, reciprocal_rank = score(ranked, relevant, ids, ks)
+        for k in ks:
+            recalls[k].append(query_recalls[k])
+        reciprocal_ranks.append(reciprocal_rank)
+    latencies_ms = np.asarray(latencies) * 1000
+    result = {"variant": name}
+    result.update({f"recall@{k}": round(float(np.mean(recalls[k])), 4) for k in ks})
+    result["mrr"] = round(float(np.mean(reciprocal_ranks)), 4)
+    result.update({
+        f"p{q}_ms": round(float(np.percentile(latencies_ms, q)), 3) for q in (50, 95, 99)
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join(ROOT, "data", "data.jsonl"))
+    parser.add_argument("--queries", help="JSONL of {query, relevant: [chunk_id, ...]}")
+    parser.add_argument("--n-queries", type=int, default=200, help="Synthetic queries when --queries is not given")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 6, 10])
+    parser.add_argument("--mmr-lambda", type=float, nargs="+", default=[0.25], help="MMR lambda_mult values to score")
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--embeddings-cache", help="Reuse/store chunk embeddings in this .npy file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json-out", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    data = load_jsonl(args.data)
+    if not data:
+        sys.exit(f"No chunks found in {args.data}")
+    ids = chunk_ids(data)
+    queries = load_queries(args.queries, data, ids, args.n_queries, args.seed)
+    ks = sorted(set(args.k))
+    max_k = max(ks)
+
+    if args.embeddings_cache and os.path.exists(args.embeddings_cache):
+        vectors = np.load(args.embeddings_cache)
+    else:
+        vectors = embed([item["content"] for item in data])
+        if args.embeddings_cache:
+            np.save(args.embeddings_cache, vectors)
+    query_vectors = embed([query for query, _ in queries])
+    n, dim = vectors.shape
+    print(f"{n} chunks, {len(queries)} queries, dim={dim}")
+
+    results = []
+    for name, factory in build_variants(dim, n, args).items():
+        start = time.perf_counter()
+        index = factory()
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        build_s = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 2 ** 20
+
+        def similarity(vector, index=index):
+            return [i for i in index.search(vector.reshape(1, -1), max_k)[1][0] if i != -1]
+
+        variants = [(name, similarity)]
+        if name == "flat":
+            for lambda_mult in args.mmr_lambda:
+                variants.append((
+                    f"flat+mmr(k=6,lambda={lambda_mult})",
+                    lambda vector, lambda_mult=lambda_mult: mmr_search(index, vectors, vector, 6, lambda_mult),
+                ))
+        for variant_name, search in variants:
+            result = evaluate(variant_name, search, queries, query_vectors, ids, ks)
+            result.update({"build_s": round(build_s, 3), "index_mb": round(size_mb, 2)})
+            results.append(result)
+            print(json.dumps(result))
+
+    header = list(results[0].keys())
+    print("\n" + " | ".join(header))
+    for result in results:
+        print(" | ".join(str(result[column]) for column in header))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Local OpenAI/Groq-compatible chat completions server for benchmarks.
+Answers POST /openai/v1/chat/completions (and /v1/chat/completions) after a
+configurable time-to-first-token, then emits tokens at a configurable rate,
+streamed (SSE) or not.
+
+    python benchmarks/stub_llm_server.py --port 9100 --ttft-ms 300 --tokens-per-s 200
+"""
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(self, ttft_ms: float = 300.0, tokens_per_s: float = 200.0, completion_tokens: int = 120):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_s = tokens_per_s
+        self.completion_tokens = completion_tokens
+
+
+def _prompt_tokens(payload: dict) -> int:
+    # Rough estimate, about 4 characters per token
+    text = json.dumps(payload.get("messages", []))
+    return max(1, len(text) // 4)
+
+
+def make_handler(config: StubConfig):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            model = payload.get("model", "stub")
+            prompt_tokens = _prompt_tokens(payload)
+            n_tokens = min(config.completion_tokens, payload.get("max_tokens") or config.completion_tokens)
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": n_tokens,
+                "total_tokens": prompt_tokens + n_tokens,
+            }
+            time.sleep(config.ttft_ms / 1000)
+            if payload.get("stream"):
+                self._stream(model, n_tokens, usage)
+            else:
+                time.sleep(n_tokens / config.tokens_per_s)
+                self._send_json({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "stub " * n_tokens},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                })
+
+        def _send_json(self, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, model: str, n_tokens: int, usage: dict):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+            for i in range(n_tokens + 1):
+                last = i == n_tokens
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {} if last else {"role": "assistant", "content": "stub "},
+                        "finish_reason": "stop" if last else None,
+                    }],
+                }
+                if last:
+                    chunk["x_groq"] = {"usage": usage}
+                else:
+                    time.sleep(1 / config.tokens_per_s)
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return StubHandler
+
+
+def start_stub_server(port: int = 0, config: StubConfig = None):
+    """Start the stub in a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Latency before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=200.0, help="Token generation rate")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Tokens per answer")
+    args = parser.parse_args()
+    server, url = start_stub_server(args.port, StubConfig(args.ttft_ms, args.tokens_per_s, args.completion_tokens))
+    print(f"Stub LLM server listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
@@ -0,0 +1,66 @@
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from utils.metrics import STAGE_SECONDS, LLM_TOKENS, current_endpoint
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Record prompt build time, LLM time-to-first-token, total LLM time and
+    token usage of chain runs into utils.metrics.
+    """
+
+    def __init__(self):
+        self._prompt_starts = {}
+        self._llm_runs = {}
+
+    def _observe(self, stage: str, start: float):
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint=current_endpoint.get(), stage=stage)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+        if kwargs.get("run_type") == "prompt":
+            self._prompt_starts[run_id] = time.perf_counter()
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        start = self._prompt_starts.pop(run_id, None)
+        if start is not None:
+            self._observe("prompt_build", start)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._prompt_starts.pop(run_id, None)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or "unknown"
+        self._llm_runs[run_id] = {"start": time.perf_counter(), "model": model, "first_token": False}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._llm_runs.get(run_id)
+        if run is not None and not run["first_token"]:
+            run["first_token"] = True
+            self._observe("llm_first_token", run["start"])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._llm_runs.pop(run_id, None)
+        if run is None:
+            return
+        self._observe("llm_total", run["start"])
+
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        if prompt_tokens is None and response.generations and response.generations[0]:
+            # Streaming runs report usage on the aggregated message instead
+            message = getattr(response.generations[0][0], "message", None)
+            usage_metadata = getattr(message, "usage_metadata", None) or {}
+            prompt_tokens = usage_metadata.get("input_tokens")
+            completion_tokens = usage_metadata.get("output_tokens")
+        if prompt_tokens:
+            LLM_TOKENS.inc(prompt_tokens, model=run["model"], kind="prompt")
+        if completion_tokens:
+            LLM_TOKENS.inc(completion_tokens, model=run["model"], kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._llm_runs.pop(run_id, None)
+
+
+METRICS_CALLBACK = MetricsCallbackHandler()
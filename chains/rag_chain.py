@@ -4,15 +4,21 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from langchain.prompts import PromptTemplate
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_groq import ChatGroq
 from langchain_community.vectorstores import FAISS
-from langchain_core.runnables.base import RunnableSequence
+from langchain_core.runnables.base import RunnableSequence, RunnableLambda
 from vector_db.faiss_db import EMBEDDING
+from utils.llm_gateway import get_chat_llm
+from utils.metrics import stage
+from chains.callbacks import METRICS_CALLBACK
 
-LLM = ChatGroq(
-    model_name="meta-llama/llama-4-scout-17b-16e-instruct",
+CHAT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+LLM = get_chat_llm(
+    CHAT_MODEL,
     temperature=0.1,
-    max_tokens=1024
+    max_tokens=1024,
+    # Stream internally so time-to-first-token can be measured
+    streaming=True
 )
 
 TEMPLATE = """
@@ -38,12 +44,21 @@ TEMPLATE = """
 
 INPUT_VARIABLES = ["context", "input", "chat_history"]
 
-def build_chain():
+def build_retriever():
+    """MMR retriever over the FAISS store, with query embedding and search timed separately"""
     vectorstore = FAISS.load_local("vectorstore_data", EMBEDDING, allow_dangerous_deserialization=True)
-    retriever = vectorstore.as_retriever(
-        search_type="mmr",
-        search_kwargs={'k': 6, 'lambda_mult': 0.25}
-    )
+
+    def retrieve(query: str):
+        with stage("query_embedding"):
+            embedding = EMBEDDING.embed_query(query)
+        with stage("mmr_search"):
+            return vectorstore.max_marginal_relevance_search_by_vector(
+                embedding, k=6, lambda_mult=0.25
+            )
+    return RunnableLambda(retrieve)
+
+def build_answer_chain():
+    """Prompt + LLM over retrieved documents ({"input", "chat_history", "context"} -> answer text)"""
     # prompt for retrieval QA chat
     retrieval_prompt = PromptTemplate(
         input_variables=INPUT_VARIABLES,
@@ -56,18 +71,28 @@ def build_chain():
         llm=llm,
         prompt=retrieval_prompt
     )
+    return combine_docs_chain.with_config(callbacks=[METRICS_CALLBACK])
+
+def build_chain():
     # Create the retrieval chain
     chain = create_retrieval_chain(
-        retriever=retriever,
-        combine_docs_chain=combine_docs_chain
+        retriever=build_retriever(),
+        combine_docs_chain=build_answer_chain()
     )
-    return chain
+    return chain.with_config(callbacks=[METRICS_CALLBACK])
+
+_contextual_chain = None
 
 def build_contextual_chain():
+    # The chain is stateless, build it once and share it across requests
+    global _contextual_chain
+    if _contextual_chain is not None:
+        return _contextual_chain
     contextual_prompt = PromptTemplate(
         input_variables=INPUT_VARIABLES,
         template=TEMPLATE
     )
     llm = LLM
-    return RunnableSequence(contextual_prompt, llm)
+    _contextual_chain = RunnableSequence(contextual_prompt, llm).with_config(callbacks=[METRICS_CALLBACK])
+    return _contextual_chain
 
@@ -1,7 +1,11 @@
 from langchain_community.document_loaders.csv_loader import CSVLoader
+from loaders.load_table import sniff_csv
+from utils.metrics import stage
 
 def load_csv(file_path: str):
     """Load a CSV file and return its content."""
-    loader = CSVLoader(file_path=file_path)
-    documents = loader.load()
+    csv_args = sniff_csv(file_path)
+    loader = CSVLoader(file_path=file_path, encoding=csv_args["encoding"], csv_args={"delimiter": csv_args["sep"]})
+    with stage("csv_parse"):
+        documents = loader.load()
     return documents
\ No newline at end of file
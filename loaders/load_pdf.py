@@ -3,6 +3,13 @@ from langchain_community.document_loaders import PyPDFLoader
 from langchain.docstore.document import Document
 from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
+from utils.metrics import stage
+
+def load_pdf(file_path: str):
+    """Load a PDF file and return one Document per page."""
+    loader = PyPDFLoader(file_path)
+    with stage("pdf_parse"):
+        return loader.load()
 
 def ingest_pdf(file_path: str, vectorstore_dir: str = "vectorstore_data"):
     # Load and split PDF into pages
@@ -0,0 +1,162 @@
+"""
+Tabular file loading for the analysis apps and the API.
+The encoding and delimiter are sniffed from the first bytes, then the file is
+parsed once: the pyarrow CSV engine (multithreaded, Arrow-backed dtypes) when
+pyarrow is installed (date and timestamp columns re-read as text, like the C
+engine gives them), the C engine otherwise. Excel goes through calamine when
+python-calamine is installed.
+"""
+import os
+import csv
+import codecs
+import importlib.util
+import pandas as pd
+from utils.metrics import stage
+
+# Bytes read to sniff the encoding and delimiter
+SNIFF_BYTES = 64 * 1024
+# Delimiters the sniffer chooses from
+DELIMITERS = ",;\t|"
+
+PYARROW_CSV = importlib.util.find_spec("pyarrow") is not None
+EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") is not None else "openpyxl"
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls", ".xlsb", ".ods")
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def sniff_encoding(head: bytes) -> str:
+    """BOM, else utf-8 if the bytes decode, else cp1252, else latin-1 (decodes anything)"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    try:
+        # Incremental decode: a multi-byte character cut at the end of the head is fine
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        head.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def sniff_delimiter(text: str) -> str:
+    try:
+        return csv.Sniffer().sniff(text, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+
+def _read_head(source) -> bytes:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(SNIFF_BYTES)
+    position = source.tell()
+    head = source.read(SNIFF_BYTES)
+    source.seek(position)
+    return head
+
+
+def sniff_csv(source) -> dict:
+    """read_csv arguments ({"encoding", "sep"}) of a CSV path or binary file object"""
+    head = _read_head(source)
+    encoding = sniff_encoding(head)
+    text = head.decode(encoding, errors="ignore")
+    if len(head) == SNIFF_BYTES:
+        # Drop the last line, it is probably cut
+        text = text.rsplit("\n", 1)[0]
+    return {"encoding": encoding, "sep": sniff_delimiter(text)}
+
+
+def _temporal_columns(df) -> list:
+    """Columns the Arrow parser inferred as dates, timestamps or times"""
+    import pyarrow as pa
+
+    return [
+        col for col, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.ArrowDtype) and (
+            pa.types.is_date(dtype.pyarrow_dtype)
+            or pa.types.is_timestamp(dtype.pyarrow_dtype)
+            or pa.types.is_time(dtype.pyarrow_dtype)
+        )
+    ]
+
+
+def _read_as_text(source, columns: list, encoding: str, sep: str) -> pd.DataFrame:
+    """
+    Columns of a CSV read again by pyarrow as plain text. pandas only casts the
+    parsed Arrow timestamps back for dtype=str ("2024-01-05 10:00:00" comes back
+    as "2024-01-05T10:00:00"), so the column types go to pyarrow directly.
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    table = pa_csv.read_csv(
+        source,
+        read_options=pa_csv.ReadOptions(encoding=encoding),
+        parse_options=pa_csv.ParseOptions(delimiter=sep),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: pa.string() for col in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def _read_csv_pyarrow(source, args: dict, position) -> pd.DataFrame:
+    """
+    pyarrow engine parse with the date and timestamp columns kept as the text in the
+    file, as the C engine gives them: deep_clean_data detects and parses dates itself
+    (and records their formats in the cleaning plan).
+    """
+    df = pd.read_csv(source, engine="pyarrow", dtype_backend="pyarrow", **args)
+    temporal = _temporal_columns(df)
+    if not temporal:
+        return df
+    if not df.columns.is_unique:
+        # pandas renames repeated headers, pyarrow cannot select them by name
+        raise ValueError("Repeated column names")
+    if position is not None:
+        source.seek(position)
+    text = _read_as_text(source, temporal, args["encoding"], args["sep"])
+    for col in temporal:
+        df[col] = text[col]
+    return df
+
+
+def read_csv(source, **kwargs) -> pd.DataFrame:
+    """Parse a CSV path or binary file object once with the sniffed encoding and delimiter"""
+    args = sniff_csv(source)
+    args.update(kwargs)
+    position = None if isinstance(source, (str, os.PathLike)) else source.tell()
+    with stage("csv_parse"):
+        if PYARROW_CSV and "nrows" not in args:
+            try:
+                return _read_csv_pyarrow(source, args, position)
+            except (ValueError, UnicodeDecodeError):
+                # Rows the Arrow parser rejects (ragged lines, bad bytes past the sniffed head)
+                if position is not None:
+                    source.seek(position)
+        try:
+            return pd.read_csv(source, **args)
+        except UnicodeDecodeError:
+            if position is not None:
+                source.seek(position)
+            return pd.read_csv(source, **{**args, "encoding": "latin-1"})
+
+
+def load_table(source, name: str = None) -> pd.DataFrame:
+    """CSV or Excel file (path or uploaded file object) as a DataFrame"""
+    name = name or getattr(source, "name", None) or str(source)
+    if name.lower().endswith(EXCEL_EXTENSIONS):
+        with stage("excel_parse"):
+            return pd.read_excel(source, engine=EXCEL_ENGINE)
+    return read_csv(source)
@@ -12,7 +12,32 @@ from PIL import Image
 import io
 import hashlib
 import pandas as pd
+import shutil
+import tempfile
 from utils.data_analyzer import DataAnalyzer
+from loaders.load_table import load_table, sniff_csv
+from utils import analysis_cache, incremental, correlation, engines, stats_report, dedup, cleaning_plan
+from utils.pipeline import run_stages
+
+# CSV uploads above this size (MB) are cleaned out of core, chunk by chunk
+# (below the upload cap, .streamlit/config.toml maxUploadSize)
+STREAMING_THRESHOLD_MB = float(os.getenv("STREAMING_THRESHOLD_MB", "100"))
+# Cleaned files above this size (MB) are not offered as an in-app download, which reads them into memory
+DOWNLOAD_MAX_MB = float(os.getenv("DOWNLOAD_MAX_MB", "100"))
+# Rows of a streamed dataset loaded back for statistics and plots
+STREAMING_SAMPLE_ROWS = int(os.getenv("STREAMING_SAMPLE_ROWS", "200000"))
+# CSV uploads always go through the streaming cleaner and keep its state, so a later
+# upload of the same file with rows appended only cleans the new rows (utils.incremental)
+INCREMENTAL_ANALYSIS = os.getenv("INCREMENTAL_ANALYSIS", "0") == "1"
+# Raw rows kept for the preview (the display slider goes up to 50)
+RAW_PREVIEW_ROWS = 50
+# Settings that change the analysis results, part of the cache key
+ANALYSIS_SETTINGS = {
+    "streaming_threshold_mb": STREAMING_THRESHOLD_MB, "streaming_sample_rows": STREAMING_SAMPLE_ROWS,
+    "incremental": INCREMENTAL_ANALYSIS,
+    "dedup_mode": dedup.DEDUP_MODE, "near_duplicate_similarity": dedup.NEAR_DUPLICATE_SIMILARITY,
+    "reuse_cleaning_plans": cleaning_plan.REUSE_CLEANING_PLANS,
+}
 import plotly.express as px
 
 # Set page config first, before any other Streamlit commands
@@ -55,6 +80,12 @@ def encode_image_file(file):
     """Encodes an image file to base64."""
     return base64.b64encode(file.read()).decode('utf-8')
 
+@st.fragment
+def render_plot_panel(spec, expanded=False):
+    """Plot panel; switching it reruns only this fragment, which builds (or reuses) the figure"""
+    if st.toggle(f"📈 {spec.title}", value=expanded, key=f"plot_{spec.key}"):
+        st.plotly_chart(spec.figure(), use_container_width=True)
+
 def load_chat_history_from_backend(session_id):
     """Load and format chat history from backend"""
     full_history = get_chat_history_for_session(session_id)
@@ -128,63 +159,143 @@ with col2:
 st.markdown('</div>', unsafe_allow_html=True)
 
 
-analyzer = DataAnalyzer()
+@st.cache_resource
+def get_analyzer():
+    """One DataAnalyzer (and Gemini model) per server process instead of per rerun"""
+    return DataAnalyzer()
+
+
+analyzer = get_analyzer()
 if data_file:
     analyze_button = st.button("🚀 Start Analysis", type="primary", use_container_width=True)
     
-    if analyze_button:
+    # Same bytes and settings -> same cached analysis, from any session
+    fingerprints = st.session_state.setdefault("file_fingerprints", {})
+    if data_file.file_id not in fingerprints:
+        fingerprints[data_file.file_id] = analysis_cache.file_fingerprint(data_file, ANALYSIS_SETTINGS)
+    analysis_key = fingerprints[data_file.file_id]
+    
+    # Keep showing the results on later reruns (widget changes) instead of dropping them
+    if analyze_button or st.session_state.get("analysis_key") == analysis_key:
+        st.session_state["analysis_key"] = analysis_key
         progress_bar = st.progress(0)
         status_text = st.empty()
         
         try:
-            # Step 1: Load data
-            status_text.text("📖 Loading dataset...")
-            progress_bar.progress(10)
-            
-            if data_file.name.endswith(".csv"):
-                # Try different encodings for CSV files
-                try:
-                    df = pd.read_csv(data_file, encoding='utf-8')
-                except UnicodeDecodeError:
-                    try:
-                        df = pd.read_csv(data_file, encoding='latin-1')
-                    except UnicodeDecodeError:
-                        df = pd.read_csv(data_file, encoding='cp1252')
+            cached = analysis_cache.load(analysis_key)
+            if cached is not None:
+                status_text.text("⚡ Loading cached analysis...")
+                raw_summary = cached["raw_summary"]
+                raw_preview = cached["raw_preview"]
+                cleaning_log = cached["cleaning_log"]
+                cleaned_df = cached["cleaned_df"]
+                memory_report = cached["memory_report"]
+                cleaned_duplicates = cached["cleaned_duplicates"]
+                streamed = cached["streamed"]
+                cleaned_csv_path = os.path.join(analysis_cache.entry_path(analysis_key), "cleaned.csv")
             else:
-                df = pd.read_excel(data_file, engine='openpyxl')
-            
-            progress_bar.progress(30)
+                # Step 1: Load data
+                status_text.text("📖 Loading dataset...")
+                progress_bar.progress(10)
+                
+                streamed = False
+                stream_stats = {}
+                large = data_file.size > STREAMING_THRESHOLD_MB * 1024 * 1024
+                if data_file.name.endswith(".csv") and (large or INCREMENTAL_ANALYSIS):
+                    # Too large to hold twice in memory (or incremental mode): clean it in chunks on disk, analyse a sample
+                    status_text.text("🧹 Cleaning dataset in chunks...")
+                    stream_dir = tempfile.mkdtemp(prefix="analyst-")
+                    raw_path = os.path.join(stream_dir, "raw.csv")
+                    cleaned_path = os.path.join(stream_dir, "cleaned.csv")
+                    with open(raw_path, "wb") as f:
+                        shutil.copyfileobj(data_file, f)
+                    csv_args = sniff_csv(raw_path)
+                    if INCREMENTAL_ANALYSIS:
+                        result = incremental.clean_csv(analyzer, raw_path, csv_args)
+                        cleaned_path, cleaning_log = result["cleaned_path"], result["cleaning_log"]
+                        stream_totals = result["totals"]
+                        # Statistics of every row, merged from the running statistics of the cleaned rows
+                        stream_stats = {"statistics": result["statistics"].to_dict()}
+                        if result["statistics"].correlation is not None:
+                            stream_stats["corr_matrix"] = result["statistics"].correlation
+                        if result["unchanged"]:
+                            st.info("🔁 Same file as one analyzed before: its cleaned rows were reused.")
+                        elif result["extended"]:
+                            st.info(f"🔁 Extends a file analyzed before: only its {result['new_rows']:,} new rows were cleaned.")
+                    else:
+                        stream_state = {}
+                        _, cleaning_log = analyzer.deep_clean_csv(
+                            raw_path, cleaned_path, csv_args=csv_args, state=stream_state, statistics=False,
+                        )
+                        stream_totals = stream_state["totals"]
+                    df = pd.read_csv(raw_path, nrows=STREAMING_SAMPLE_ROWS, **csv_args)
+                    cleaned_df = pd.read_csv(cleaned_path, nrows=STREAMING_SAMPLE_ROWS)
+                    # Counts of the whole file, not of the sample
+                    raw_summary = analysis_cache.summarize_stream(df, stream_totals, os.path.getsize(raw_path))
+                    streamed = True
+                else:
+                    # Encoding and delimiter are sniffed once, then the file is parsed once
+                    df = load_table(data_file)
+                    raw_summary = analysis_cache.summarize_frame(df)
+                raw_preview = df.head(RAW_PREVIEW_ROWS)
+                
+                progress_bar.progress(30)
+                
+                # Step 2: Data cleaning
+                status_text.text("🧹 Cleaning dataset...")
+                
+                if not streamed:
+                    cleaned_df, cleaning_log = analyzer.deep_clean_data(df)
+                # Smallest lossless dtypes for the statistics, plots and session state below
+                cleaned_df, memory_report = analyzer.optimize_memory(cleaned_df)
+                # Exact duplicates left after cleaning, counted once from row hashes
+                cleaned_duplicates = dedup.count_duplicates(cleaned_df)
+                
+                progress_bar.progress(50)
+                
+                # Statistics, correlation and insights are added to the entry once computed below
+                analysis_cache.store(
+                    analysis_key, raw_summary=raw_summary, raw_preview=raw_preview, cleaning_log=cleaning_log,
+                    cleaned_df=cleaned_df, memory_report=memory_report, cleaned_duplicates=cleaned_duplicates,
+                    streamed=streamed, **stream_stats,
+                )
+                cleaned_csv_path = None
+                if streamed:
+                    cleaned_csv_path = analysis_cache.attach_file(analysis_key, "cleaned.csv", cleaned_path)
+                    shutil.rmtree(stream_dir, ignore_errors=True)
+                del df
+                cached = stream_stats
+            
+            progress_bar.progress(60)
+            if streamed and INCREMENTAL_ANALYSIS:
+                st.info(f"📦 File cleaned in chunks. Statistics cover every row, previews and plots use the first {STREAMING_SAMPLE_ROWS:,} rows.")
+            elif streamed:
+                st.info(f"📦 Large file cleaned in chunks. Previews, statistics and plots use the first {STREAMING_SAMPLE_ROWS:,} rows.")
             
             # Display success message with dataset info
             st.markdown(f'''
             <div class="success-box">
                 <h4>✅ Dataset loaded successfully!</h4>
-                <p><strong>Shape:</strong> {df.shape[0]:,} rows × {df.shape[1]} columns</p>
-                <p><strong>Size:</strong> {df.memory_usage(deep=True).sum() / 1024:.2f} KB</p>
+                <p><strong>Shape:</strong> {raw_summary["rows"]:,} rows × {raw_summary["columns"]} columns</p>
+                <p><strong>Size:</strong> {raw_summary["bytes"] / 1024:.2f} KB</p>
             </div>
             ''', unsafe_allow_html=True)
             
             # Display metrics
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("📊 Total Rows", f"{df.shape[0]:,}")
+                st.metric("📊 Total Rows", f"{raw_summary['rows']:,}")
             with col2:
-                st.metric("📈 Columns", df.shape[1])
+                st.metric("📈 Columns", raw_summary["columns"])
             with col3:
-                st.metric("🔢 Numeric Cols", df.select_dtypes(include=['number']).shape[1])
+                st.metric("🔢 Numeric Cols", raw_summary["numeric_cols"])
             with col4:
-                st.metric("📝 Text Cols", df.select_dtypes(include=['object']).shape[1])
+                st.metric("📝 Text Cols", raw_summary["text_cols"])
             
             # Show raw data if requested
             if show_raw_data:
                 with st.expander("👁️ Raw Data Preview", expanded=False):
-                    st.dataframe(df.head(max_rows_display), use_container_width=True)
-            
-            # Step 2: Data cleaning
-            status_text.text("🧹 Cleaning dataset...")
-            progress_bar.progress(50)
-            
-            cleaned_df, cleaning_log = analyzer.deep_clean_data(df)
+                    st.dataframe(raw_preview.head(max_rows_display), use_container_width=True)
             
             # Display cleaning results
             st.subheader("🧹 Data Cleaning Results")
@@ -200,16 +311,16 @@ if data_file:
                 comparison_data = {
                     "Metric": ["Rows", "Columns", "Missing Values", "Duplicates"],
                     "Before": [
-                        df.shape[0],
-                        df.shape[1],
-                        df.isnull().sum().sum(),
-                        df.duplicated().sum()
+                        raw_summary["rows"],
+                        raw_summary["columns"],
+                        raw_summary["missing"],
+                        raw_summary["duplicates"]
                     ],
                     "After": [
-                        cleaned_df.shape[0],
+                        raw_summary.get("cleaned_rows", cleaned_df.shape[0]),
                         cleaned_df.shape[1],
                         cleaned_df.isnull().sum().sum(),
-                        cleaned_df.duplicated().sum()
+                        cleaned_duplicates
                     ]
                 }
                 comparison_df = pd.DataFrame(comparison_data)
@@ -218,50 +329,79 @@ if data_file:
             # Cleaned data preview
             with st.expander("✨ Cleaned Data Preview", expanded=False):
                 st.dataframe(cleaned_df.head(max_rows_display), use_container_width=True)
+
+            with st.expander("💾 Memory Optimization", expanded=False):
+                bytes_before = memory_report["bytes_before"].sum()
+                bytes_after = memory_report["bytes_after"].sum()
+                st.write(f"**{bytes_before / 1024:.2f} KB → {bytes_after / 1024:.2f} KB** "
+                         f"({1 - bytes_after / max(bytes_before, 1):.0%} smaller)")
+                st.dataframe(memory_report, use_container_width=True, hide_index=True)
             
             # Download button for cleaned data
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            csv_buffer = io.StringIO()
-            cleaned_df.to_csv(csv_buffer, index=False)
-            csv_data = csv_buffer.getvalue()
-            
-            st.download_button(
-                label="💾 Download Cleaned Dataset",
-                data=csv_data,
-                file_name=f"cleaned_dataset_{timestamp}.csv",
-                mime="text/csv",
-                help="Download the cleaned version of your dataset"
-            )
+            csv_data = None
+            if streamed:
+                cleaned_mb = os.path.getsize(cleaned_csv_path) / (1024 * 1024)
+                if cleaned_mb > DOWNLOAD_MAX_MB:
+                    # Too large to read into memory on every rerun, the file stays on disk
+                    st.info(f"💾 The cleaned dataset ({cleaned_mb:,.0f} MB) is saved at `{os.path.abspath(cleaned_csv_path)}`.")
+                else:
+                    with open(cleaned_csv_path, "rb") as f:
+                        csv_data = f.read()
+            else:
+                csv_buffer = io.StringIO()
+                cleaned_df.to_csv(csv_buffer, index=False)
+                csv_data = csv_buffer.getvalue()
+            
+            if csv_data is not None:
+                st.download_button(
+                    label="💾 Download Cleaned Dataset",
+                    data=csv_data,
+                    file_name=f"cleaned_dataset_{timestamp}.csv",
+                    mime="text/csv",
+                    help="Download the cleaned version of your dataset"
+                )
             
             progress_bar.progress(70)
             
-            # Step 3: Statistical analysis
-            status_text.text("📊 Performing statistical analysis...")
+            # Steps 3-5: statistics, correlation, visualizations and AI insights run concurrently
+            # after cleaning; each section below is drawn as soon as its stage finishes
+            status_text.text("📊 Running statistics, visualizations and AI insights...")
+            numeric_cols = cleaned_df.select_dtypes(include=['number']).columns
             
-            st.subheader("📊 Statistical Summary")
+            def stats_stage():
+                if cached.get("statistics") is not None:
+                    return stats_report.StatisticalReport.from_dict(cached["statistics"])
+                return analyzer.statistical_analysis(cleaned_df, fingerprint=analysis_key)
+            
+            def corr_stage():
+                if cached.get("corr_matrix") is not None or len(numeric_cols) < 2:
+                    return cached.get("corr_matrix")
+                # Same key as the heatmap of create_visualizations: computed once for both
+                return correlation.correlation_matrix(engines.frame(cleaned_df), numeric_cols, analysis_key)
+            
+            def plots_stage():
+                plots = analyzer.create_visualizations(cleaned_df, fingerprint=analysis_key)
+                # The first panel opens expanded, build its figure here instead of in the script thread
+                for spec in list(plots.values())[:1]:
+                    spec.figure()
+                return plots
+            
+            def insights_stage(stats):
+                # The profile of the prompt is built from the statistics stage's report
+                return cached.get("insights") or analyzer.generate_insights(cleaned_df, cleaning_log, stats)
+            
+            stages = {
+                "stats": (stats_stage, ()),
+                "corr": (corr_stage, ()),
+                "plots": (plots_stage, ()),
+                "insights": (insights_stage, ("stats",)),
+            }
             
-            # Basic statistics
-            numeric_cols = cleaned_df.select_dtypes(include=['number']).columns
-            if len(numeric_cols) > 0:
-                stats_summary = cleaned_df[numeric_cols].describe()
-                st.markdown("#### 📈 Descriptive Statistics")
-                st.dataframe(stats_summary, use_container_width=True)
-                
-                # Correlation matrix
-                if len(numeric_cols) > 1:
-                    st.markdown("#### 🔗 Correlation Analysis")
-                    corr_matrix = cleaned_df[numeric_cols].corr()
-                    
-                    # Create correlation heatmap
-                    fig_corr = px.imshow(
-                        corr_matrix,
-                        text_auto=True,
-                        aspect="auto",
-                        title="Correlation Matrix Heatmap",
-                        color_continuous_scale="RdBu_r"
-                    )
-                    fig_corr.update_traces(texttemplate="%{z:.2f}", textfont_size=10)
-                    st.plotly_chart(fig_corr, use_container_width=True)
+            # Page layout first, filled in completion order
+            st.subheader("📊 Statistical Summary")
+            stats_area = st.container()
+            corr_area = st.container()
             
             # Data types and missing values analysis
             col1, col2 = st.columns(2)
@@ -291,73 +431,112 @@ if data_file:
                 else:
                     st.success("🎉 No missing values found!")
             
-            progress_bar.progress(85)
-            
-            # Step 4: Visualizations
-            status_text.text("📊 Creating visualizations...")
-            
             st.subheader("📊 Data Visualizations")
+            plots_area = st.empty()
+            plots_area.info("⏳ Creating visualizations...")
             
-            try:
-                plots = analyzer.create_visualizations(cleaned_df)
+            st.subheader("🤖 AI-Generated Insights")
+            insights_area = st.empty()
+            insights_area.info("⏳ Analyzing patterns and generating insights...")
+            
+            results = {}
+            for finished, (name, result, error) in enumerate(run_stages(stages), 1):
+                results[name] = result
+                progress_bar.progress(70 + 30 * finished // (len(stages) + 1))
+                if name in ("stats", "corr") and error is not None:
+                    raise error
                 
-                # Display plots in a grid layout
-                plot_names = list(plots.keys())
-                for i in range(0, len(plot_names), 2):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        if i < len(plot_names):
-                            st.plotly_chart(plots[plot_names[i]], use_container_width=True)
-                    
-                    with col2:
-                        if i + 1 < len(plot_names):
-                            st.plotly_chart(plots[plot_names[i + 1]], use_container_width=True)
+                if name == "stats" and len(result.numeric):
+                    with stats_area:
+                        st.markdown("#### 📈 Descriptive Statistics")
+                        st.dataframe(result.numeric.T, use_container_width=True)
+                        st.markdown("#### 🔔 Normality Tests")
+                        st.dataframe(result.normality, use_container_width=True)
+                
+                elif name == "corr" and result is not None:
+                    with corr_area:
+                        st.markdown("#### 🔗 Correlation Analysis")
                         
-            except Exception as e:
-                st.warning(f"⚠️ Could not generate all visualizations: {str(e)}")
-                # Create basic visualizations as fallback
-                if len(numeric_cols) > 0:
-                    col = numeric_cols[0]
-                    fig = px.histogram(cleaned_df, x=col, title=f"Distribution of {col}")
-                    st.plotly_chart(fig, use_container_width=True)
-            
-            progress_bar.progress(95)
-            
-            # Step 5: AI Insights
-            status_text.text("🤖 Generating AI insights...")
-            
-            st.subheader("🤖 AI-Generated Insights")
-            
-            with st.spinner("Analyzing patterns and generating insights..."):
-                try:
-                    insights = analyzer.generate_insights(cleaned_df, cleaning_log)
-                    
-                    # Format insights nicely
-                    st.markdown(f'''
-                    <div class="info-card">
-                        {insights.replace(chr(10), '<br>')}
-                    </div>
-                    ''', unsafe_allow_html=True)
-                    
-                except Exception as e:
-                    st.warning(f"⚠️ Could not generate AI insights: {str(e)}")
-                    
-                    # Provide basic insights as fallback
-                    basic_insights = f"""
-                    **Basic Dataset Insights:**
-                    
-                    • Your dataset contains **{cleaned_df.shape[0]:,} records** and **{cleaned_df.shape[1]} features**
-                    • **{len(numeric_cols)} numeric columns** and **{len(cleaned_df.select_dtypes(include=['object']).columns)} text columns**
-                    • Data cleaning removed **{df.shape[0] - cleaned_df.shape[0]} rows** and addressed **{len(cleaning_log)} issues**
-                    • The dataset appears to be **{'well-structured' if cleaned_df.isnull().sum().sum() == 0 else 'moderately clean'}**
-                    """
-                    
-                    st.markdown(f'''
-                    <div class="info-card">
-                        {basic_insights}
-                    </div>
-                    ''', unsafe_allow_html=True)
+                        shown = result
+                        if len(result) > correlation.CORR_MAX_DISPLAY_COLUMNS:
+                            # Too wide to read: strongest pairs, and a clustered heatmap of the most correlated columns
+                            st.dataframe(correlation.top_pairs(result), use_container_width=True, hide_index=True)
+                            shown = correlation.clustered(result)
+                            st.caption(f"Heatmap of the {len(shown)} most correlated of {len(result)} numeric columns, clustered")
+                        
+                        # Create correlation heatmap
+                        fig_corr = px.imshow(
+                            shown,
+                            text_auto=True,
+                            aspect="auto",
+                            title="Correlation Matrix Heatmap",
+                            color_continuous_scale="RdBu_r"
+                        )
+                        fig_corr.update_traces(texttemplate="%{z:.2f}", textfont_size=10)
+                        st.plotly_chart(fig_corr, use_container_width=True)
+                
+                elif name == "plots":
+                    with plots_area.container():
+                        if error is None:
+                            # Display plots in a grid layout, each figure is built when its panel is switched on
+                            plot_names = list(result.keys())
+                            for i in range(0, len(plot_names), 2):
+                                col1, col2 = st.columns(2)
+                                
+                                with col1:
+                                    if i < len(plot_names):
+                                        render_plot_panel(result[plot_names[i]], expanded=(i == 0))
+                                
+                                with col2:
+                                    if i + 1 < len(plot_names):
+                                        render_plot_panel(result[plot_names[i + 1]])
+                        else:
+                            st.warning(f"⚠️ Could not generate all visualizations: {str(error)}")
+                            # Create basic visualizations as fallback
+                            if len(numeric_cols) > 0:
+                                col = numeric_cols[0]
+                                fig = px.histogram(cleaned_df, x=col, title=f"Distribution of {col}")
+                                st.plotly_chart(fig, use_container_width=True)
+                
+                elif name == "insights":
+                    with insights_area.container():
+                        if error is None:
+                            # Format insights nicely
+                            st.markdown(f'''
+                            <div class="info-card">
+                                {result.replace(chr(10), '<br>')}
+                            </div>
+                            ''', unsafe_allow_html=True)
+                        else:
+                            st.warning(f"⚠️ Could not generate AI insights: {str(error)}")
+                            
+                            # Provide basic insights as fallback
+                            basic_insights = f"""
+                            **Basic Dataset Insights:**
+                            
+                            • Your dataset contains **{raw_summary.get('cleaned_rows', cleaned_df.shape[0]):,} records** and **{cleaned_df.shape[1]} features**
+                            • **{len(numeric_cols)} numeric columns** and **{len(cleaned_df.select_dtypes(include=['object', 'string', 'category']).columns)} text columns**
+                            • Data cleaning removed **{raw_summary['rows'] - raw_summary.get('cleaned_rows', cleaned_df.shape[0])} rows** and addressed **{len(cleaning_log)} issues**
+                            • The dataset appears to be **{'well-structured' if cleaned_df.isnull().sum().sum() == 0 else 'moderately clean'}**
+                            """
+                            
+                            st.markdown(f'''
+                            <div class="info-card">
+                                {basic_insights}
+                            </div>
+                            ''', unsafe_allow_html=True)
+            
+            # Add what this run computed to the cache entry; error text is shown but not cached, the next run retries
+            new_parts = {
+                part: results[name] for part, name in (("statistics", "stats"), ("corr_matrix", "corr"), ("insights", "insights"))
+                if results.get(name) is not None and part not in cached
+            }
+            if "statistics" in new_parts:
+                new_parts["statistics"] = new_parts["statistics"].to_dict()
+            if str(new_parts.get("insights", "")).startswith(("Error generating insights", "<span")):
+                del new_parts["insights"]
+            if new_parts:
+                analysis_cache.update(analysis_key, **new_parts)
             
             # Complete
             progress_bar.progress(100)
@@ -375,11 +554,11 @@ if data_file:
                 st.write("**Error Details:**")
                 st.code(str(e))
                 
-                if 'df' in locals():
+                if 'raw_summary' in locals():
                     st.write("**Dataset Info:**")
-                    st.write(f"Shape: {df.shape}")
-                    st.write(f"Columns: {list(df.columns)}")
-                    st.write(f"Data types: {df.dtypes.to_dict()}")
+                    st.write(f"Shape: {(raw_summary['rows'], raw_summary['columns'])}")
+                    st.write(f"Columns: {list(raw_summary['dtypes'])}")
+                    st.write(f"Data types: {raw_summary['dtypes']}")
 # Sidebar for recent chats
 with st.sidebar:
     st.header("🕓 Recent Chats")
@@ -3,11 +3,31 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import streamlit as st
 import pandas as pd
+import shutil
+import tempfile
 import io
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 from utils.data_analyzer import DataAnalyzer
+from loaders.load_table import load_table, sniff_csv
+from utils import analysis_cache, correlation, stats_report, dedup, cleaning_plan
+
+# CSV uploads above this size (MB) are cleaned out of core, chunk by chunk
+# (below the upload cap, .streamlit/config.toml maxUploadSize)
+STREAMING_THRESHOLD_MB = float(os.getenv("STREAMING_THRESHOLD_MB", "100"))
+# Cleaned files above this size (MB) are not offered as an in-app download, which reads them into memory
+DOWNLOAD_MAX_MB = float(os.getenv("DOWNLOAD_MAX_MB", "100"))
+# Rows of a streamed dataset loaded back for statistics and plots
+STREAMING_SAMPLE_ROWS = int(os.getenv("STREAMING_SAMPLE_ROWS", "200000"))
+# Raw rows kept for the preview (the display slider goes up to 50)
+RAW_PREVIEW_ROWS = 50
+# Settings that change the analysis results, part of the cache key
+ANALYSIS_SETTINGS = {
+    "streaming_threshold_mb": STREAMING_THRESHOLD_MB, "streaming_sample_rows": STREAMING_SAMPLE_ROWS,
+    "dedup_mode": dedup.DEDUP_MODE, "near_duplicate_similarity": dedup.NEAR_DUPLICATE_SIMILARITY,
+    "reuse_cleaning_plans": cleaning_plan.REUSE_CLEANING_PLANS,
+}
 # Configure page
 st.set_page_config(
     page_title="Data Analyzer Pro",
@@ -53,9 +73,15 @@ with col2:
 
 st.markdown('</div>', unsafe_allow_html=True)
 
+@st.cache_resource
+def get_analyzer():
+    """One DataAnalyzer (and Gemini model) per server process instead of per rerun"""
+    return DataAnalyzer()
+
+
 # Initialize analyzer (assuming DataAnalyzer class exists)
 try:
-    analyzer = DataAnalyzer()
+    analyzer = get_analyzer()
 except NameError:
     # Fallback if DataAnalyzer class is not defined
     st.error("⚠️ DataAnalyzer class not found. Please ensure it's properly imported.")
@@ -65,59 +91,126 @@ except NameError:
 if data_file:
     analyze_button = st.button("🚀 Start Analysis", type="primary", use_container_width=True)
     
-    if analyze_button:
+    # Same bytes and settings -> same cached analysis, from any session
+    fingerprints = st.session_state.setdefault("file_fingerprints", {})
+    if data_file.file_id not in fingerprints:
+        fingerprints[data_file.file_id] = analysis_cache.file_fingerprint(data_file, ANALYSIS_SETTINGS)
+    analysis_key = fingerprints[data_file.file_id]
+    
+    # Keep showing the results on later reruns (widget changes) instead of dropping them
+    if analyze_button or st.session_state.get("analysis_key") == analysis_key:
+        st.session_state["analysis_key"] = analysis_key
         progress_bar = st.progress(0)
         status_text = st.empty()
         
         try:
-            # Step 1: Load data
-            status_text.text("📖 Loading dataset...")
-            progress_bar.progress(10)
-            
-            if data_file.name.endswith(".csv"):
-                # Try different encodings for CSV files
-                try:
-                    df = pd.read_csv(data_file, encoding='utf-8')
-                except UnicodeDecodeError:
-                    try:
-                        df = pd.read_csv(data_file, encoding='latin-1')
-                    except UnicodeDecodeError:
-                        df = pd.read_csv(data_file, encoding='cp1252')
+            cached = analysis_cache.load(analysis_key)
+            if cached is not None:
+                status_text.text("⚡ Loading cached analysis...")
+                raw_summary = cached["raw_summary"]
+                raw_preview = cached["raw_preview"]
+                cleaning_log = cached["cleaning_log"]
+                cleaned_df = cached["cleaned_df"]
+                memory_report = cached["memory_report"]
+                cleaned_duplicates = cached["cleaned_duplicates"]
+                if cached.get("statistics") is not None:
+                    report = stats_report.StatisticalReport.from_dict(cached["statistics"])
+                else:
+                    # Entry written by the other page before its statistics stage finished
+                    report = analyzer.statistical_analysis(cleaned_df, fingerprint=analysis_key)
+                corr_matrix = report.correlation
+                streamed = cached["streamed"]
+                cleaned_csv_path = os.path.join(analysis_cache.entry_path(analysis_key), "cleaned.csv")
             else:
-                df = pd.read_excel(data_file, engine='openpyxl')
-            
-            progress_bar.progress(30)
+                # Step 1: Load data
+                status_text.text("📖 Loading dataset...")
+                progress_bar.progress(10)
+                
+                streamed = False
+                if data_file.name.endswith(".csv") and data_file.size > STREAMING_THRESHOLD_MB * 1024 * 1024:
+                    # Too large to hold twice in memory: clean it in chunks on disk, analyse a sample
+                    status_text.text("🧹 Cleaning large dataset in chunks...")
+                    stream_dir = tempfile.mkdtemp(prefix="analyst-")
+                    raw_path = os.path.join(stream_dir, "raw.csv")
+                    cleaned_path = os.path.join(stream_dir, "cleaned.csv")
+                    with open(raw_path, "wb") as f:
+                        shutil.copyfileobj(data_file, f)
+                    csv_args = sniff_csv(raw_path)
+                    stream_state = {}
+                    _, cleaning_log = analyzer.deep_clean_csv(
+                        raw_path, cleaned_path, csv_args=csv_args, state=stream_state, statistics=False,
+                    )
+                    stream_totals = stream_state["totals"]
+                    df = pd.read_csv(raw_path, nrows=STREAMING_SAMPLE_ROWS, **csv_args)
+                    cleaned_df = pd.read_csv(cleaned_path, nrows=STREAMING_SAMPLE_ROWS)
+                    # Counts of the whole file, not of the sample
+                    raw_summary = analysis_cache.summarize_stream(df, stream_totals, os.path.getsize(raw_path))
+                    streamed = True
+                else:
+                    # Encoding and delimiter are sniffed once, then the file is parsed once
+                    df = load_table(data_file)
+                    raw_summary = analysis_cache.summarize_frame(df)
+                raw_preview = df.head(RAW_PREVIEW_ROWS)
+                
+                progress_bar.progress(30)
+                
+                # Step 2: Data cleaning
+                status_text.text("🧹 Cleaning dataset...")
+                
+                if not streamed:
+                    cleaned_df, cleaning_log = analyzer.deep_clean_data(df)
+                # Smallest lossless dtypes for the statistics, plots and session state below
+                cleaned_df, memory_report = analyzer.optimize_memory(cleaned_df)
+                # Exact duplicates left after cleaning, counted once from row hashes
+                cleaned_duplicates = dedup.count_duplicates(cleaned_df)
+                
+                progress_bar.progress(50)
+                
+                # Step 3: Statistical analysis
+                status_text.text("📊 Performing statistical analysis...")
+                # Numeric summary, normality tests and correlations in one report, reused by the insights below
+                report = analyzer.statistical_analysis(cleaned_df, fingerprint=analysis_key)
+                corr_matrix = report.correlation
+                
+                analysis_cache.store(
+                    analysis_key, raw_summary=raw_summary, raw_preview=raw_preview, cleaning_log=cleaning_log,
+                    cleaned_df=cleaned_df, memory_report=memory_report, cleaned_duplicates=cleaned_duplicates,
+                    streamed=streamed, statistics=report.to_dict(),
+                )
+                cleaned_csv_path = None
+                if streamed:
+                    cleaned_csv_path = analysis_cache.attach_file(analysis_key, "cleaned.csv", cleaned_path)
+                    shutil.rmtree(stream_dir, ignore_errors=True)
+                del df
+            
+            progress_bar.progress(60)
+            if streamed:
+                st.info(f"📦 Large file cleaned in chunks. Previews, statistics and plots use the first {STREAMING_SAMPLE_ROWS:,} rows.")
             
             # Display success message with dataset info
             st.markdown(f'''
             <div class="success-box">
                 <h4>✅ Dataset loaded successfully!</h4>
-                <p><strong>Shape:</strong> {df.shape[0]:,} rows × {df.shape[1]} columns</p>
-                <p><strong>Size:</strong> {df.memory_usage(deep=True).sum() / 1024:.2f} KB</p>
+                <p><strong>Shape:</strong> {raw_summary["rows"]:,} rows × {raw_summary["columns"]} columns</p>
+                <p><strong>Size:</strong> {raw_summary["bytes"] / 1024:.2f} KB</p>
             </div>
             ''', unsafe_allow_html=True)
             
             # Display metrics
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("📊 Total Rows", f"{df.shape[0]:,}")
+                st.metric("📊 Total Rows", f"{raw_summary['rows']:,}")
             with col2:
-                st.metric("📈 Columns", df.shape[1])
+                st.metric("📈 Columns", raw_summary["columns"])
             with col3:
-                st.metric("🔢 Numeric Cols", df.select_dtypes(include=['number']).shape[1])
+                st.metric("🔢 Numeric Cols", raw_summary["numeric_cols"])
             with col4:
-                st.metric("📝 Text Cols", df.select_dtypes(include=['object']).shape[1])
+                st.metric("📝 Text Cols", raw_summary["text_cols"])
             
             # Show raw data if requested
             if show_raw_data:
                 with st.expander("👁️ Raw Data Preview", expanded=False):
-                    st.dataframe(df.head(max_rows_display), use_container_width=True)
-            
-            # Step 2: Data cleaning
-            status_text.text("🧹 Cleaning dataset...")
-            progress_bar.progress(50)
-            
-            cleaned_df, cleaning_log = analyzer.deep_clean_data(df)
+                    st.dataframe(raw_preview.head(max_rows_display), use_container_width=True)
             
             # Display cleaning results
             st.subheader("🧹 Data Cleaning Results")
@@ -133,16 +226,16 @@ if data_file:
                 comparison_data = {
                     "Metric": ["Rows", "Columns", "Missing Values", "Duplicates"],
                     "Before": [
-                        df.shape[0],
-                        df.shape[1],
-                        df.isnull().sum().sum(),
-                        df.duplicated().sum()
+                        raw_summary["rows"],
+                        raw_summary["columns"],
+                        raw_summary["missing"],
+                        raw_summary["duplicates"]
                     ],
                     "After": [
-                        cleaned_df.shape[0],
+                        raw_summary.get("cleaned_rows", cleaned_df.shape[0]),
                         cleaned_df.shape[1],
                         cleaned_df.isnull().sum().sum(),
-                        cleaned_df.duplicated().sum()
+                        cleaned_duplicates
                     ]
                 }
                 comparison_df = pd.DataFrame(comparison_data)
@@ -151,43 +244,65 @@ if data_file:
             # Cleaned data preview
             with st.expander("✨ Cleaned Data Preview", expanded=False):
                 st.dataframe(cleaned_df.head(max_rows_display), use_container_width=True)
+
+            with st.expander("💾 Memory Optimization", expanded=False):
+                bytes_before = memory_report["bytes_before"].sum()
+                bytes_after = memory_report["bytes_after"].sum()
+                st.write(f"**{bytes_before / 1024:.2f} KB → {bytes_after / 1024:.2f} KB** "
+                         f"({1 - bytes_after / max(bytes_before, 1):.0%} smaller)")
+                st.dataframe(memory_report, use_container_width=True, hide_index=True)
             
             # Download button for cleaned data
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            csv_buffer = io.StringIO()
-            cleaned_df.to_csv(csv_buffer, index=False)
-            csv_data = csv_buffer.getvalue()
-            
-            st.download_button(
-                label="💾 Download Cleaned Dataset",
-                data=csv_data,
-                file_name=f"cleaned_dataset_{timestamp}.csv",
-                mime="text/csv",
-                help="Download the cleaned version of your dataset"
-            )
+            csv_data = None
+            if streamed:
+                cleaned_mb = os.path.getsize(cleaned_csv_path) / (1024 * 1024)
+                if cleaned_mb > DOWNLOAD_MAX_MB:
+                    # Too large to read into memory on every rerun, the file stays on disk
+                    st.info(f"💾 The cleaned dataset ({cleaned_mb:,.0f} MB) is saved at `{os.path.abspath(cleaned_csv_path)}`.")
+                else:
+                    with open(cleaned_csv_path, "rb") as f:
+                        csv_data = f.read()
+            else:
+                csv_buffer = io.StringIO()
+                cleaned_df.to_csv(csv_buffer, index=False)
+                csv_data = csv_buffer.getvalue()
+            
+            if csv_data is not None:
+                st.download_button(
+                    label="💾 Download Cleaned Dataset",
+                    data=csv_data,
+                    file_name=f"cleaned_dataset_{timestamp}.csv",
+                    mime="text/csv",
+                    help="Download the cleaned version of your dataset"
+                )
             
             progress_bar.progress(70)
             
-            # Step 3: Statistical analysis
-            status_text.text("📊 Performing statistical analysis...")
-            
             st.subheader("📊 Statistical Summary")
             
             # Basic statistics
             numeric_cols = cleaned_df.select_dtypes(include=['number']).columns
-            if len(numeric_cols) > 0:
-                stats_summary = cleaned_df[numeric_cols].describe()
+            if len(report.numeric):
                 st.markdown("#### 📈 Descriptive Statistics")
-                st.dataframe(stats_summary, use_container_width=True)
+                st.dataframe(report.numeric.T, use_container_width=True)
+                st.markdown("#### 🔔 Normality Tests")
+                st.dataframe(report.normality, use_container_width=True)
                 
                 # Correlation matrix
-                if len(numeric_cols) > 1:
+                if corr_matrix is not None:
                     st.markdown("#### 🔗 Correlation Analysis")
-                    corr_matrix = cleaned_df[numeric_cols].corr()
+                    
+                    shown = corr_matrix
+                    if len(corr_matrix) > correlation.CORR_MAX_DISPLAY_COLUMNS:
+                        # Too wide to read: strongest pairs, and a clustered heatmap of the most correlated columns
+                        st.dataframe(correlation.top_pairs(corr_matrix), use_container_width=True, hide_index=True)
+                        shown = correlation.clustered(corr_matrix)
+                        st.caption(f"Heatmap of the {len(shown)} most correlated of {len(corr_matrix)} numeric columns, clustered")
                     
                     # Create correlation heatmap
                     fig_corr = px.imshow(
-                        corr_matrix,
+                        shown,
                         text_auto=True,
                         aspect="auto",
                         title="Correlation Matrix Heatmap",
@@ -232,7 +347,7 @@ if data_file:
             st.subheader("📊 Data Visualizations")
             
             try:
-                plots = analyzer.create_visualizations(cleaned_df)
+                plots = analyzer.create_visualizations(cleaned_df, fingerprint=analysis_key)
                 
                 # Display plots in a grid layout
                 plot_names = list(plots.keys())
@@ -241,11 +356,11 @@ if data_file:
                     
                     with col1:
                         if i < len(plot_names):
-                            st.plotly_chart(plots[plot_names[i]], use_container_width=True)
+                            st.plotly_chart(plots[plot_names[i]].figure(), use_container_width=True)
                     
                     with col2:
                         if i + 1 < len(plot_names):
-                            st.plotly_chart(plots[plot_names[i + 1]], use_container_width=True)
+                            st.plotly_chart(plots[plot_names[i + 1]].figure(), use_container_width=True)
                         
             except Exception as e:
                 st.warning(f"⚠️ Could not generate all visualizations: {str(e)}")
@@ -264,7 +379,12 @@ if data_file:
             
             with st.spinner("Analyzing patterns and generating insights..."):
                 try:
-                    insights = analyzer.generate_insights(cleaned_df, cleaning_log)
+                    insights = cached.get("insights") if cached is not None else None
+                    if insights is None:
+                        insights = analyzer.generate_insights(cleaned_df, cleaning_log, report)
+                        # Error text is shown but not cached, the next run retries
+                        if not insights.startswith(("Error generating insights", "<span")):
+                            analysis_cache.update(analysis_key, insights=insights)
                     
                     # Format insights nicely
                     st.markdown(f'''
@@ -280,9 +400,9 @@ if data_file:
                     basic_insights = f"""
                     **Basic Dataset Insights:**
                     
-                    • Your dataset contains **{cleaned_df.shape[0]:,} records** and **{cleaned_df.shape[1]} features**
-                    • **{len(numeric_cols)} numeric columns** and **{len(cleaned_df.select_dtypes(include=['object']).columns)} text columns**
-                    • Data cleaning removed **{df.shape[0] - cleaned_df.shape[0]} rows** and addressed **{len(cleaning_log)} issues**
+                    • Your dataset contains **{raw_summary.get('cleaned_rows', cleaned_df.shape[0]):,} records** and **{cleaned_df.shape[1]} features**
+                    • **{len(numeric_cols)} numeric columns** and **{len(cleaned_df.select_dtypes(include=['object', 'string', 'category']).columns)} text columns**
+                    • Data cleaning removed **{raw_summary['rows'] - raw_summary.get('cleaned_rows', cleaned_df.shape[0])} rows** and addressed **{len(cleaning_log)} issues**
                     • The dataset appears to be **{'well-structured' if cleaned_df.isnull().sum().sum() == 0 else 'moderately clean'}**
                     """
                     
@@ -309,11 +429,11 @@ if data_file:
                 st.write("**Error Details:**")
                 st.code(str(e))
                 
-                if 'df' in locals():
+                if 'raw_summary' in locals():
                     st.write("**Dataset Info:**")
-                    st.write(f"Shape: {df.shape}")
-                    st.write(f"Columns: {list(df.columns)}")
-                    st.write(f"Data types: {df.dtypes.to_dict()}")
+                    st.write(f"Shape: {(raw_summary['rows'], raw_summary['columns'])}")
+                    st.write(f"Columns: {list(raw_summary['dtypes'])}")
+                    st.write(f"Data types: {raw_summary['dtypes']}")
 
 else:
     # Welcome message when no file is uploaded
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Run from any directory: the packages live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# DataAnalyzer needs a key to build its model; the tests never call Gemini
+os.environ.setdefault("GOOGLE_API_KEY", "test")
@@ -0,0 +1,67 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from benchmarks.analyzer_bench import make_synthetic_frame
+from utils import cleaning_plan
+from utils.data_analyzer import DataAnalyzer, CleaningRun
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return DataAnalyzer()
+
+
+@pytest.fixture
+def plan_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cleaning_plan, "CLEANING_PLAN_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_fit_then_apply_matches_deep_clean(analyzer):
+    df = make_synthetic_frame(3_000, seed=1)
+    expected, expected_log = analyzer.deep_clean_data(df, n_jobs=1, reuse_plan=False)
+    plan = analyzer.fit_cleaning_plan(df, n_jobs=1)
+    cleaned, log = analyzer.apply_cleaning_plan(df, plan)
+    pd.testing.assert_frame_equal(cleaned, expected)
+    assert log == expected_log
+
+
+def test_plan_survives_json_round_trip(analyzer, plan_dir):
+    df = make_synthetic_frame(2_000, seed=2)
+    plan = analyzer.fit_cleaning_plan(df, n_jobs=1)
+    assert cleaning_plan.store(plan)
+    loaded = cleaning_plan.load(plan["signature"])
+    assert loaded == json.loads(json.dumps(plan))
+    pd.testing.assert_frame_equal(analyzer.apply_cleaning_plan(df, loaded)[0], analyzer.apply_cleaning_plan(df, plan)[0])
+
+
+def test_reuse_plan_stores_then_applies(analyzer, plan_dir):
+    df = make_synthetic_frame(2_000, seed=3)
+    first = CleaningRun()
+    expected, _ = analyzer.deep_clean_data(df, n_jobs=1, reuse_plan=True, run=first)
+    assert (plan_dir / f"{first.plan['signature']}.json").exists()
+    # Second file with the same schema: the stored plan is applied, no date detection runs
+    second = CleaningRun()
+    cleaned, _ = analyzer.deep_clean_data(df, n_jobs=1, reuse_plan=True, run=second)
+    pd.testing.assert_frame_equal(cleaned, expected)
+    assert second.plan["date_cols"] == first.plan["date_cols"]
+
+
+def test_plan_rejects_other_schema(analyzer):
+    df = make_synthetic_frame(500, seed=4)
+    plan = analyzer.fit_cleaning_plan(df, n_jobs=1)
+    with pytest.raises(ValueError):
+        analyzer.apply_cleaning_plan(df.drop(columns=["notes"]), plan)
+    with pytest.raises(ValueError):
+        analyzer.apply_cleaning_plan(df.astype({"quantity": float}), plan)
+
+
+def test_concurrent_runs_keep_their_own_plan(analyzer):
+    frames = [make_synthetic_frame(1_000, seed=seed) for seed in range(4)]
+    expected = [analyzer.fit_cleaning_plan(df, n_jobs=1) for df in frames]
+    with ThreadPoolExecutor(4) as pool:
+        plans = list(pool.map(lambda df: analyzer.fit_cleaning_plan(df, n_jobs=1), frames * 2))
+    assert plans == expected * 2
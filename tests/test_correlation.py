@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import correlation, engines
+
+
+def _frame(n=5_000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=n)
+    return pd.DataFrame({
+        "x": x,
+        "y": 2 * x + rng.normal(size=n),
+        "z": -x + rng.normal(scale=3, size=n),
+        # Large offset and scale: no float32 cancellation after standardizing
+        "big": 1e9 + 1e6 * rng.normal(size=n),
+        "constant": np.full(n, 4.0),
+    })
+
+
+@pytest.mark.parametrize("block_rows", [correlation.CORR_BLOCK_ROWS, 333])
+def test_pearson_matches_dataframe_corr(block_rows):
+    df = _frame()
+    corr = correlation.pearson(df.to_numpy(), block_rows=block_rows)
+    np.testing.assert_allclose(corr, df.corr().to_numpy(), atol=1e-5, equal_nan=True)
+
+
+def test_pearson_with_missing_values_matches_pairwise_corr():
+    df = _frame(seed=1)
+    rng = np.random.default_rng(2)
+    for col in ["x", "y", "big"]:
+        df.loc[rng.random(len(df)) < 0.2, col] = np.nan
+    corr = correlation.pearson(df.to_numpy(), block_rows=777)
+    np.testing.assert_allclose(corr, df.corr().to_numpy(), atol=1e-5, equal_nan=True)
+
+
+def test_correlation_matrix_labels_and_cache():
+    correlation.clear_cache()
+    df = _frame(n=500)
+    cols = ["x", "y", "z"]
+    data = engines.frame(df, "pandas")
+    first = correlation.correlation_matrix(data, cols, fingerprint="frame")
+    assert list(first.index) == cols and list(first.columns) == cols
+    pd.testing.assert_frame_equal(first, df[cols].corr(), atol=1e-5)
+    assert correlation.correlation_matrix(data, cols, fingerprint="frame") is first
+    correlation.clear_cache()
+
+
+def test_top_pairs_orders_by_strength():
+    corr = _frame(n=2_000)[["x", "y", "z"]].corr()
+    pairs = correlation.top_pairs(corr, k=2)
+    assert len(pairs) == 2
+    assert {pairs["column_a"][0], pairs["column_b"][0]} == {"x", "y"}
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from utils import dedup
+
+
+def _frame():
+    return pd.DataFrame({
+        "name": ["ann", "bob", "ann", "cy", "bob", None, None],
+        "score": [1.0, 2.0, 1.0, 3.0, 2.5, np.nan, np.nan],
+        "zero": [0.0, 0.0, -0.0, 0.0, 0.0, 0.0, 0.0],
+    })
+
+
+def test_duplicated_matches_pandas():
+    df = _frame()
+    np.testing.assert_array_equal(dedup.duplicated(df), df.duplicated().to_numpy())
+    assert dedup.count_duplicates(df) == int(df.duplicated().sum())
+
+
+def test_hash_collision_falls_back_to_pandas():
+    df = pd.DataFrame({"a": [1, 2, 3, 1], "b": ["x", "y", "z", "x"]})
+    # Every row hashing alike: the flagged rows differ from their first occurrence
+    colliding = np.full(len(df), 7, dtype=np.uint64)
+    np.testing.assert_array_equal(dedup.duplicated(df, colliding), [False, False, False, True])
+
+
+def test_duplicated_without_columns_keeps_rows():
+    df = pd.DataFrame(index=range(3))
+    np.testing.assert_array_equal(dedup.duplicated(df), [False, False, False])
+
+
+def test_near_duplicates_of_formatting():
+    df = pd.DataFrame({
+        "name": ["Acme Corp.", "acme corp", "Globex", "Initech", "ACME  CORP!"],
+        "city": ["Paris", "paris", "Berlin", "Rome", "Paris"],
+        "amount": [100.0, 100.0000001, 7.0, 9.0, 100.0],
+        "code": ["a1", "a1", "b2", "c3", "a1"],
+        "flag": ["yes", "yes", "no", "no", "yes"],
+    })
+    np.testing.assert_array_equal(dedup.near_duplicated(df), [False, True, False, False, True])
+
+
+def test_near_duplicates_do_not_chain():
+    # Row 1 shares 4 of 5 cells with row 0, row 2 shares 4 with row 1 but 3 with row 0
+    df = pd.DataFrame([
+        ["a", "b", "c", "d", "e"],
+        ["a", "b", "c", "d", "X"],
+        ["a", "b", "c", "Y", "X"],
+    ])
+    near = dedup.near_duplicated(df, threshold=0.6, num_perm=128)
+    np.testing.assert_array_equal(near, [False, True, False])
+
+
+def test_near_duplicates_skip_removed_rows():
+    df = pd.DataFrame({"a": ["x", "x", "y"], "b": ["1", "1", "2"], "c": ["p", "p", "q"]})
+    assert dedup.near_duplicated(df)[1]
+    removed = dedup.duplicated(df)
+    assert not dedup.near_duplicated(df, removed=removed).any()
+
+
+def test_near_duplicates_of_distinct_rows():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({f"c{i}": rng.integers(0, 1_000_000, 2_000) for i in range(4)})
+    assert not dedup.near_duplicated(df).any()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.analyzer_bench import make_synthetic_frame
+from utils import parallel_clean
+from utils.data_analyzer import DataAnalyzer
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return DataAnalyzer()
+
+
+@pytest.fixture(scope="module")
+def frame():
+    df = make_synthetic_frame(4_000, seed=5)
+    # Near-empty and constant columns: the drop rules must agree too
+    df["sparse"] = np.where(np.arange(len(df)) % 50 == 0, 1.0, np.nan)
+    df["code"] = np.array(["A1", " a1", "B2", "b2 "], dtype=object)[np.arange(len(df)) % 4]
+    return df
+
+
+@pytest.mark.parametrize("dedup_mode", ["exact", "near"])
+def test_polars_matches_pandas(analyzer, frame, dedup_mode):
+    expected, expected_log = analyzer.deep_clean_data(frame, n_jobs=1, dedup_mode=dedup_mode)
+    cleaned, log = analyzer.deep_clean_data(frame, engine="polars", dedup_mode=dedup_mode)
+    assert log == expected_log
+    # Polars keeps datetimes in microseconds
+    pd.testing.assert_frame_equal(cleaned.to_pandas(), expected.reset_index(drop=True), check_dtype=False)
+
+
+def test_parallel_matches_serial(analyzer, frame, monkeypatch):
+    monkeypatch.setattr(parallel_clean, "PARALLEL_MIN_CELLS", 1)
+    expected, expected_log = analyzer.deep_clean_data(frame, n_jobs=1)
+    cleaned, log = analyzer.deep_clean_data(frame, n_jobs=2)
+    assert log == expected_log
+    pd.testing.assert_frame_equal(cleaned, expected, check_exact=True)
+
+
+def test_engines_agree_on_empty_frame(analyzer):
+    df = pd.DataFrame({"a": pd.Series([], dtype=object), "b": pd.Series([], dtype=float)})
+    expected, expected_log = analyzer.deep_clean_data(df, n_jobs=1)
+    cleaned, log = analyzer.deep_clean_data(df, engine="polars")
+    assert cleaned.shape == expected.shape
+    assert log == expected_log
@@ -0,0 +1,66 @@
+import io
+
+import pandas as pd
+import pytest
+
+from loaders import load_table as lt
+
+DATED_CSV = (
+    "day,stamp,clock,amount,name\n"
+    "2024-01-05,2024-01-05 10:00:00,10:00:00,1,alpha\n"
+    "2024-01-06,2024-01-06T11:00:00,11:00:00,2,\n"
+    ",2024-01-07 12:00:00,,3,gamma\n"
+    "2024-01-06,2024-01-06T11:00:00,11:00:00,2,\n"
+)
+
+
+@pytest.mark.parametrize("sep", [",", ";", "\t", "|"])
+def test_sniff_delimiter(sep):
+    text = "\n".join(sep.join(row) for row in [["a", "b", "c"], ["1", "2", "x"], ["3", "4", "y"]])
+    assert lt.sniff_csv(io.BytesIO(text.encode()))["sep"] == sep
+
+
+@pytest.mark.parametrize("raw, encoding", [
+    ("a,b\n1,café\n".encode("utf-8"), "utf-8"),
+    (b"\xef\xbb\xbfa,b\n1,2\n", "utf-8-sig"),
+    ("a,b\n1,café €\n".encode("cp1252"), "cp1252"),
+    ("﻿a,b\n1,2\n".encode("utf-16-le"), "utf-16"),
+])
+def test_sniff_encoding(raw, encoding):
+    assert lt.sniff_csv(io.BytesIO(raw))["encoding"] == encoding
+
+
+def test_sniff_keeps_file_position():
+    source = io.BytesIO(b"a;b\n1;2\n")
+    lt.sniff_csv(source)
+    assert source.tell() == 0
+
+
+def test_read_csv_cp1252_semicolon():
+    raw = "name;price\ncafé;1,5\nthé;2\n".encode("cp1252")
+    df = lt.load_table(io.BytesIO(raw), name="prices.csv")
+    assert list(df.columns) == ["name", "price"]
+    assert list(df["name"].astype(object)) == ["café", "thé"]
+
+
+def test_dates_stay_text(tmp_path):
+    path = tmp_path / "dated.csv"
+    path.write_text(DATED_CSV)
+    df = lt.load_table(str(path))
+    expected = pd.read_csv(path)
+    assert lt._temporal_columns(df) == []
+    for col in ["day", "stamp", "clock"]:
+        assert df[col].astype(object).fillna("").tolist() == expected[col].fillna("").tolist()
+
+
+def test_clean_matches_c_parser(tmp_path):
+    from utils.data_analyzer import DataAnalyzer
+
+    path = tmp_path / "dated.csv"
+    path.write_text(DATED_CSV)
+    analyzer = DataAnalyzer()
+    arrow_clean, arrow_log = analyzer.deep_clean_data(lt.load_table(str(path)))
+    c_clean, c_log = analyzer.deep_clean_data(pd.read_csv(path))
+    pd.testing.assert_frame_equal(arrow_clean, c_clean)
+    assert arrow_log == c_log
+    assert "Parsed date columns: ['day']" in arrow_log
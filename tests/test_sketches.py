@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.sketches import FrequentItems, HyperLogLog, KLLSketch
+
+
+def _rank(sorted_values, value):
+    return np.searchsorted(sorted_values, value, side="right") / len(sorted_values)
+
+
+@pytest.mark.parametrize("chunks", [1, 17])
+def test_kll_rank_error(chunks):
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(size=200_000)
+    sketch = KLLSketch()
+    for chunk in np.array_split(values, chunks):
+        sketch.update(chunk)
+    ordered = np.sort(values)
+    assert sketch.n == len(values)
+    assert sketch.min == ordered[0] and sketch.max == ordered[-1]
+    for q in [0.01, 0.25, 0.5, 0.75, 0.99]:
+        assert abs(_rank(ordered, sketch.quantile(q)) - q) <= sketch.rank_error
+
+
+def test_kll_merge_matches_single_stream():
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=100_000)
+    left, right = KLLSketch(seed=1), KLLSketch(seed=2)
+    left.update(values[:40_000])
+    right.update(values[40_000:])
+    left.merge(right)
+    ordered = np.sort(values)
+    assert left.n == len(values)
+    for q in [0.1, 0.5, 0.9]:
+        assert abs(_rank(ordered, left.quantile(q)) - q) <= left.rank_error
+
+
+@pytest.mark.parametrize("distinct", [50, 5_000, 300_000])
+def test_hll_relative_error(distinct):
+    hll = HyperLogLog()
+    values = pd.Series(np.arange(distinct)).sample(frac=1, random_state=0)
+    # Every value seen twice, in two chunks
+    hll.update(values)
+    hll.update(values.iloc[::-1])
+    assert abs(hll.count() - distinct) <= 4 * hll.relative_error * distinct + 1
+
+
+def test_hll_merge():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update(pd.Series(np.arange(0, 60_000)))
+    right.update(pd.Series(np.arange(40_000, 100_000)))
+    left.merge(right)
+    assert abs(left.count() - 100_000) <= 4 * left.relative_error * 100_000
+
+
+def test_misra_gries_exact_below_capacity():
+    values = pd.Series(list("aabbbcddddd"))
+    items = FrequentItems(capacity=10)
+    items.update(values)
+    assert items.exact
+    assert items.counts == values.value_counts().to_dict()
+    assert items.distinct == 4
+    assert items.mode() == "d"
+    assert items.distinct_values() == ["a", "b", "c", "d"]
+
+
+def test_misra_gries_error_bound():
+    rng = np.random.default_rng(3)
+    # Zipf-like stream: a few heavy values and a long tail
+    values = pd.Series(rng.zipf(1.3, 100_000) % 5_000)
+    capacity = 100
+    items = FrequentItems(capacity)
+    for start in range(0, len(values), 10_000):
+        items.update(values.iloc[start:start + 10_000])
+    true_counts = values.value_counts()
+    assert not items.exact
+    assert len(items.counts) <= capacity
+    assert items.distinct == capacity + 1
+    for value, count in items.counts.items():
+        # Underestimates, by at most n / capacity
+        assert true_counts[value] - len(values) / capacity <= count <= true_counts[value]
+    # Every value above n / capacity survives
+    for value, count in true_counts[true_counts > len(values) / capacity].items():
+        assert value in items.counts
+    assert items.mode() == true_counts.idxmax()
+    with pytest.raises(ValueError):
+        items.distinct_values()
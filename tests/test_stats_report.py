@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import stats_report
+
+stats = pytest.importorskip("scipy.stats")
+
+
+def _frame(n=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "normal": rng.normal(loc=10, scale=2, size=n),
+        "exponential": rng.exponential(size=n),
+        "uniform": rng.uniform(size=n),
+        "offset": 1e8 + rng.normal(size=n),
+    })
+
+
+def _table(df, block_values=None, monkeypatch=None):
+    if block_values is not None:
+        monkeypatch.setattr(stats_report, "MOMENT_BLOCK_VALUES", block_values)
+    return stats_report.moments_table(df.to_numpy(), df.columns)
+
+
+@pytest.mark.parametrize("block_values", [None, 1_000])
+def test_moments_match_pandas_and_scipy(block_values, monkeypatch):
+    df = _frame()
+    table = _table(df, block_values, monkeypatch)
+    described = df.describe().T
+    for stat in ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]:
+        np.testing.assert_allclose(table[stat], described[stat], rtol=1e-9)
+    np.testing.assert_allclose(table["var"], df.var(), rtol=1e-9)
+    np.testing.assert_allclose(table["skew"], stats.skew(df, bias=False), rtol=1e-6, atol=1e-9)
+    np.testing.assert_allclose(table["kurtosis"], stats.kurtosis(df, bias=False), rtol=1e-6, atol=1e-9)
+
+
+def test_moments_skip_missing_values():
+    df = _frame(seed=1)
+    df.iloc[::7, 0] = np.nan
+    df.iloc[:, 3] = np.nan
+    table = stats_report.moments_table(df.to_numpy(), df.columns)
+    assert table.loc["normal", "count"] == df["normal"].count()
+    np.testing.assert_allclose(table.loc["normal", "skew"], df["normal"].skew(), rtol=1e-6)
+    np.testing.assert_allclose(table.loc["normal", "kurtosis"], df["normal"].kurt(), rtol=1e-6)
+    assert table.loc["offset", "count"] == 0
+    assert np.isnan(table.loc["offset", ["mean", "std", "min", "50%", "max"]].astype(float)).all()
+
+
+def test_normality_matches_scipy():
+    df = _frame(seed=2)
+    normality = stats_report.normality_table(stats_report.moments_table(df.to_numpy(), df.columns))
+    for col in df.columns:
+        jarque_bera = stats.jarque_bera(df[col])
+        k2 = stats.normaltest(df[col])
+        np.testing.assert_allclose(normality.loc[col, "jarque_bera"], jarque_bera.statistic, rtol=1e-6)
+        np.testing.assert_allclose(normality.loc[col, "jarque_bera_p"], jarque_bera.pvalue, rtol=1e-6, atol=1e-12)
+        np.testing.assert_allclose(normality.loc[col, "k2"], k2.statistic, rtol=1e-6)
+        np.testing.assert_allclose(normality.loc[col, "k2_p"], k2.pvalue, rtol=1e-6, atol=1e-12)
+    assert normality["normal"].tolist()[:3] == [True, False, False]
+
+
+def test_normality_skips_constant_and_short_columns():
+    df = pd.DataFrame({"constant": np.full(100, 3.0), "short": np.r_[np.arange(10.0), np.full(90, np.nan)]})
+    normality = stats_report.normality_table(stats_report.moments_table(df.to_numpy(), df.columns))
+    assert normality[["jarque_bera", "k2", "k2_p"]].isna().all().all()
+    assert normality["normal"].isna().all()
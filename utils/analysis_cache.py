@@ -0,0 +1,190 @@
+"""
+Persistent cache of the Streamlit analysis pipeline.
+Entries are keyed by a content fingerprint of the uploaded file plus the settings
+that change the results, so reruns and repeat uploads (from any session) skip
+loading, cleaning and statistics. Each entry is a directory under
+ANALYSIS_CACHE_DIR: frames as Parquet files (pickle for frames Parquet cannot
+hold, e.g. mixed object columns) and a meta.json with everything else.
+"""
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import pandas as pd
+from utils import dedup
+
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "./.cache/analysis")
+# Bump when a pipeline change makes cached results stale
+ANALYSIS_VERSION = "5"
+# Entries kept (and their total size), the least recently used ones are removed
+ANALYSIS_MAX_ENTRIES = int(os.getenv("ANALYSIS_MAX_ENTRIES", "20"))
+ANALYSIS_MAX_BYTES = int(float(os.getenv("ANALYSIS_MAX_MB", "2048")) * 1024 * 1024)
+
+_HASH_BLOCK = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+
+def file_fingerprint(file, settings: dict = None) -> str:
+    """blake2b of the file bytes (path or binary file object), the settings and ANALYSIS_VERSION"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps({"version": ANALYSIS_VERSION, "settings": settings or {}}, sort_keys=True).encode())
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+                digest.update(block)
+    else:
+        position = file.tell()
+        file.seek(0)
+        for block in iter(lambda: file.read(_HASH_BLOCK), b""):
+            digest.update(block)
+        file.seek(position)
+    return digest.hexdigest()
+
+
+def summarize_frame(df) -> dict:
+    """Shape, size and quality counts of a raw frame (JSON serializable)"""
+    return {
+        "rows": int(df.shape[0]),
+        "columns": int(df.shape[1]),
+        "bytes": int(df.memory_usage(deep=True).sum()),
+        "numeric_cols": int(df.select_dtypes(include=['number']).shape[1]),
+        "text_cols": int(sum(pd.api.types.is_string_dtype(dtype) for dtype in df.dtypes)),
+        "missing": int(df.isnull().sum().sum()),
+        "duplicates": dedup.count_duplicates(df),
+        "dtypes": {str(col): str(dtype) for col, dtype in df.dtypes.items()},
+    }
+
+
+def summarize_stream(sample, totals: dict, file_bytes: int) -> dict:
+    """
+    summarize_frame of a CSV cleaned in chunks (DataAnalyzer.deep_clean_csv): rows and
+    missing values of the whole file from the cleaning totals, dtypes from the sample,
+    bytes the file size. Duplicates are the rows the cleaning removed as duplicates
+    (after string normalization), and cleaned_rows the rows it kept.
+    """
+    return {
+        "rows": int(totals["input_rows"]),
+        "columns": int(sample.shape[1]),
+        "bytes": int(file_bytes),
+        "numeric_cols": int(sample.select_dtypes(include=['number']).shape[1]),
+        "text_cols": int(sum(pd.api.types.is_string_dtype(dtype) for dtype in sample.dtypes)),
+        "missing": int(totals["input_missing"]),
+        "duplicates": int(totals["duplicates"]),
+        "dtypes": {str(col): str(dtype) for col, dtype in sample.dtypes.items()},
+        "cleaned_rows": int(totals["rows"]),
+    }
+
+
+def entry_path(key: str) -> str:
+    return os.path.join(ANALYSIS_CACHE_DIR, key)
+
+
+def load(key: str):
+    """Cached parts of an analysis as a dict (frames loaded back), None on a miss"""
+    path = entry_path(key)
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            result = json.load(f)
+        for name, file_format in result.pop("frames").items():
+            file_path = os.path.join(path, f"{name}.{file_format}")
+            result[name] = pd.read_parquet(file_path) if file_format == "parquet" else pd.read_pickle(file_path)
+        # Reads count as uses for pruning
+        os.utime(os.path.join(path, "meta.json"))
+    except (OSError, ValueError, KeyError) as e:
+        if os.path.exists(path):
+            logger.warning("Ignoring unreadable analysis cache entry %s: %s", key, e)
+        return None
+    return result
+
+
+def _write_frame(directory: str, name: str, frame) -> str:
+    try:
+        frame.to_parquet(os.path.join(directory, f"{name}.parquet"))
+        return "parquet"
+    except (ImportError, ValueError, TypeError):
+        # pyarrow missing or a column Parquet cannot hold
+        if os.path.exists(os.path.join(directory, f"{name}.parquet")):
+            os.remove(os.path.join(directory, f"{name}.parquet"))
+        frame.to_pickle(os.path.join(directory, f"{name}.pkl"))
+        return "pkl"
+
+
+def store(key: str, **parts):
+    """
+    Write an entry; DataFrame parts become files, other parts must be JSON serializable.
+    The entry is written to a temporary directory and moved in place, readers never see half of it.
+    """
+    os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+    tmp = entry_path(f".{key}-{uuid.uuid4().hex}")
+    os.makedirs(tmp)
+    meta = {"frames": {}}
+    for name, value in parts.items():
+        if isinstance(value, pd.DataFrame):
+            meta["frames"][name] = _write_frame(tmp, name, value)
+        else:
+            meta[name] = value
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    shutil.rmtree(entry_path(key), ignore_errors=True)
+    try:
+        os.replace(tmp, entry_path(key))
+    except OSError:
+        # Another session stored the same key (same file and settings) in between: keep its entry
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(entry_path(key)):
+            raise
+    _prune()
+
+
+def _entries():
+    """(name, bytes) of the entries, most recently used first"""
+    if not os.path.isdir(ANALYSIS_CACHE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(ANALYSIS_CACHE_DIR):
+        path = entry_path(name)
+        try:
+            used = os.path.getmtime(os.path.join(path, "meta.json"))
+            size = sum(item.stat().st_size for item in os.scandir(path) if item.is_file())
+        except OSError:
+            continue
+        if not name.startswith("."):
+            entries.append((used, name, size))
+    return [(name, size) for _, name, size in sorted(entries, reverse=True)]
+
+
+def _prune():
+    total = 0
+    for i, (name, size) in enumerate(_entries()):
+        total += size
+        # The newest entry is kept whatever its size
+        if i > 0 and (i >= ANALYSIS_MAX_ENTRIES or total > ANALYSIS_MAX_BYTES):
+            shutil.rmtree(entry_path(name), ignore_errors=True)
+
+
+def update(key: str, **parts):
+    """Add parts (e.g. the statistics or the insights text) to an existing entry"""
+    meta_path = os.path.join(entry_path(key), "meta.json")
+    if not os.path.exists(meta_path):
+        return
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    for name, value in parts.items():
+        if isinstance(value, pd.DataFrame):
+            meta["frames"][name] = _write_frame(entry_path(key), name, value)
+        else:
+            meta[name] = value
+    tmp = f"{meta_path}.{uuid.uuid4().hex}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def attach_file(key: str, name: str, source_path: str) -> str:
+    """Copy a file (e.g. a streamed cleaned CSV) into an entry, returns its cached path"""
+    target = os.path.join(entry_path(key), name)
+    shutil.copyfile(source_path, target)
+    return target
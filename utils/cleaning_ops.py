@@ -0,0 +1,76 @@
+"""
+Column operations shared by the cleaning paths: DataAnalyzer.deep_clean_data and its
+streaming mode, the process pool (utils.parallel_clean) and the Polars engine
+(utils.engines). Kept apart from utils.data_analyzer so those modules do not import it.
+"""
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Mapping for common variations of categorical values
+CATEGORICAL_VALUE_MAPPING = {
+    'yes': 'yes', 'y': 'yes', 'true': 'yes', '1': 'yes',
+    'no': 'no', 'n': 'no', 'false': 'no', '0': 'no',
+    'nan': np.nan, 'none': np.nan, 'null': np.nan, '': np.nan
+}
+
+
+def first_valid(values, n):
+    """values.dropna().head(n) without copying the whole column first"""
+    size = 1000
+    while True:
+        sample = values.iloc[:size].dropna()
+        if len(sample) >= n or size >= len(values):
+            return sample.head(n)
+        size *= 10
+
+
+def guess_date_format(sample):
+    """Format pandas infers from the first non-null string, None when it falls back to dateutil"""
+    first = sample.iloc[0]
+    if type(first) is not str:
+        return None
+    return guess_datetime_format(first)
+
+
+def parse_dates(values, date_format):
+    if date_format:
+        return pd.to_datetime(values, format=date_format, errors='coerce')
+    return pd.to_datetime(values, errors='coerce')
+
+
+def normalize_strings(values):
+    return (values.astype(str)
+            .str.strip()
+            .str.lower()
+            .str.replace(r'[^\w\s]', '', regex=True))
+
+
+def normalize_string_column(values):
+    """Strip, lowercase and drop punctuation once per distinct value; returns (codes, normalized uniques)"""
+    if pd.api.types.infer_dtype(values, skipna=True) == 'string':
+        codes, uniques = pd.factorize(values)
+        uniques = normalize_strings(pd.Series(uniques, dtype=object))
+    else:
+        # Mixed objects (numbers, bytes, ...): equal-but-different values like 1 and 1.0
+        # would share a code, so stringify row by row
+        mask = values.notna()
+        values = values.copy()
+        values[mask] = normalize_strings(values[mask].astype(str))
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(uniques, dtype=object)
+    # Convert 'nan' strings back to actual NaN
+    uniques[uniques == 'nan'] = np.nan
+    return codes, uniques
+
+
+def map_categorical_values(uniques):
+    return uniques.map(lambda value: CATEGORICAL_VALUE_MAPPING.get(value, value))
+
+
+def take_uniques(values, codes, uniques):
+    """Map factorized codes back to (transformed) uniques; missing values (code -1) are kept as they were"""
+    missing = codes == -1
+    taken = values.to_numpy(dtype=object, copy=True)
+    taken[~missing] = uniques.to_numpy(dtype=object)[codes[~missing]]
+    return pd.Series(taken, index=values.index, name=values.name)
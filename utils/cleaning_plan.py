@@ -0,0 +1,82 @@
+"""
+Cleaning plans: the decisions DataAnalyzer.deep_clean_data derives from a frame
+(date columns and their formats, normalized and dropped columns, fill values, IQR
+clip bounds and category encodings) as one JSON document. apply_cleaning_plan runs
+a plan without any inference, so recurring files with the same schema skip date
+detection, cardinality counts, medians, modes and quartiles, and always get the
+same category codes.
+Plans are stored under CLEANING_PLAN_DIR by schema signature (column names and
+dtypes); with REUSE_CLEANING_PLANS=1 deep_clean_data applies the stored plan of a
+known schema and fits (then stores) one otherwise.
+"""
+import os
+import json
+import uuid
+import hashlib
+import numpy as np
+
+CLEANING_PLAN_DIR = os.getenv("CLEANING_PLAN_DIR", "./.cache/plans")
+# Apply the stored plan of a known schema instead of re-deriving every decision
+REUSE_CLEANING_PLANS = os.getenv("REUSE_CLEANING_PLANS", "0") == "1"
+# Bump when deep_clean_data derives its decisions differently
+PLAN_VERSION = "2"
+
+
+def schema_signature(df) -> str:
+    """blake2b of the column names and dtypes (and PLAN_VERSION) of a frame"""
+    schema = [[str(col), str(dtype)] for col, dtype in df.dtypes.items()]
+    payload = json.dumps({"version": PLAN_VERSION, "schema": schema})
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def new_plan(signature: str) -> dict:
+    return {
+        "version": PLAN_VERSION,
+        "signature": signature,
+        "date_cols": {},
+        "string_cols": [],
+        "dropped": [],
+        "fill": {},
+        "bounds": {},
+        "categories": {},
+        "approximate_bounds": False,
+    }
+
+
+def plan_value(value):
+    """JSON value of a fill value or bound (numpy scalars as Python numbers)"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def check_plan(plan: dict, df):
+    if plan.get("version") != PLAN_VERSION or plan.get("signature") != schema_signature(df):
+        raise ValueError("Cleaning plan was fitted on a different schema (columns or dtypes)")
+
+
+def _path(signature: str) -> str:
+    return os.path.join(CLEANING_PLAN_DIR, f"{signature}.json")
+
+
+def load(signature: str):
+    """Stored plan of a schema signature, None when there is none"""
+    try:
+        with open(_path(signature), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store(plan: dict) -> bool:
+    """
+    Write a plan under its signature (atomically). Plans key their decisions by column
+    name, so frames with non-string column names (lost in JSON keys) are not stored.
+    """
+    columns = set(plan["string_cols"]) | set(plan["fill"]) | set(plan["bounds"]) | set(plan["date_cols"])
+    if not all(isinstance(col, str) for col in columns | set(plan["dropped"])):
+        return False
+    os.makedirs(CLEANING_PLAN_DIR, exist_ok=True)
+    tmp = os.path.join(CLEANING_PLAN_DIR, f".{plan['signature']}-{uuid.uuid4().hex}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(plan, f)
+    os.replace(tmp, _path(plan["signature"]))
+    return True
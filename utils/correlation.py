@@ -0,0 +1,158 @@
+"""
+Pearson correlation engine shared by create_visualizations, statistical_analysis
+and the Streamlit app.
+Columns are standardized in float64, then multiplied in float32 row blocks with
+numpy BLAS (sgemm) and summed in float64: within ~1e-6 of DataFrame.corr(), which
+loops over column pairs in Python-level C and is many times slower on wide frames.
+Columns with missing values use pairwise complete observations like DataFrame.corr(). Matrices are cached per (dataset
+fingerprint, columns), so the callers of one dataset compute it once. Wide
+matrices are summarized with top_pairs and clustered instead of printed whole.
+"""
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils.sketches import CoMoments
+
+# Rows per float32 block (keeps the block copy small and float32 pair counts exact)
+CORR_BLOCK_ROWS = 65536
+# Correlation matrices kept in memory
+CORR_CACHE_SIZE = int(os.getenv("CORR_CACHE_SIZE", "16"))
+# Wider matrices are shown as a clustered submatrix of this many columns plus the top pairs
+CORR_MAX_DISPLAY_COLUMNS = int(os.getenv("CORR_MAX_DISPLAY_COLUMNS", "40"))
+# Strongest pairs listed for wide matrices
+CORR_TOP_PAIRS = int(os.getenv("CORR_TOP_PAIRS", "20"))
+
+_CACHE = OrderedDict()
+_LOCK = threading.Lock()
+_KEY_LOCKS = {}
+
+
+def _blocks(values, block_rows):
+    for start in range(0, len(values), block_rows):
+        yield values[start:start + block_rows]
+
+
+def pearson(values, dtype=np.float32, block_rows=CORR_BLOCK_ROWS) -> np.ndarray:
+    """Pearson matrix of the columns of a 2-D float array (NaN = missing)"""
+    values = np.asarray(values, dtype=float)
+    n_rows, n_cols = values.shape
+    if n_cols == 0:
+        return np.empty((0, 0))
+    has_nan = np.isnan(values).any()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nanmean(values, axis=0) if has_nan else values.mean(axis=0)
+        scale = np.nanstd(values, axis=0) if has_nan else values.std(axis=0)
+    # Standardized values: no float32 overflow or cancellation whatever the column scales
+    mean = np.nan_to_num(mean)
+    scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+
+    if has_nan:
+        comoments = CoMoments(n_cols, dtype=dtype)
+        for block in _blocks(values, block_rows):
+            comoments.update((block - mean) / scale)
+        corr = comoments.corr()
+    else:
+        gram = np.zeros((n_cols, n_cols))
+        for block in _blocks(values, block_rows):
+            standardized = ((block - mean) / scale).astype(dtype)
+            gram += standardized.T @ standardized
+        norms = np.sqrt(np.diag(gram))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = gram / np.outer(norms, norms)
+        # Constant columns (zero norm) have no correlation, as in DataFrame.corr()
+        corr[(norms == 0)[:, None] | (norms == 0)[None, :]] = np.nan
+        corr = np.clip(corr, -1.0, 1.0)
+    constant = np.isnan(np.diag(corr))
+    corr[np.diag_indices(n_cols)] = np.where(constant, np.nan, 1.0)
+    return corr
+
+
+def correlation_matrix(data, cols, fingerprint=None) -> pd.DataFrame:
+    """
+    Correlation DataFrame of cols of an engines frame, computed once per
+    (fingerprint, cols): concurrent callers wait for the first computation.
+    fingerprint defaults to a content hash of cols.
+    """
+    cols = list(cols)
+    key = (fingerprint or data.fingerprint(cols), tuple(cols))
+    with _LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key]
+        key_lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+    with key_lock:
+        with _LOCK:
+            if key in _CACHE:
+                return _CACHE[key]
+        try:
+            corr = data.corr(cols)
+        except Exception:
+            with _LOCK:
+                _KEY_LOCKS.pop(key, None)
+            raise
+        with _LOCK:
+            _CACHE[key] = corr
+            _KEY_LOCKS.pop(key, None)
+            while len(_CACHE) > CORR_CACHE_SIZE:
+                _CACHE.popitem(last=False)
+    return corr
+
+
+def clear_cache():
+    with _LOCK:
+        _CACHE.clear()
+
+
+def top_pairs(corr: pd.DataFrame, k: int = CORR_TOP_PAIRS) -> pd.DataFrame:
+    """The k column pairs with the largest |correlation|, strongest first"""
+    values = corr.to_numpy()
+    i, j = np.triu_indices(len(values), 1)
+    r = values[i, j]
+    finite = np.isfinite(r)
+    i, j, r = i[finite], j[finite], r[finite]
+    if len(r) > k:
+        strongest = np.argpartition(-np.abs(r), k)[:k]
+        i, j, r = i[strongest], j[strongest], r[strongest]
+    order = np.argsort(-np.abs(r), kind="stable")
+    columns = np.asarray(corr.columns, dtype=object)
+    return pd.DataFrame({
+        "column_a": columns[i[order]],
+        "column_b": columns[j[order]],
+        "correlation": r[order],
+    })
+
+
+def _linkage_order(distance: np.ndarray) -> list:
+    """Leaf order of average-linkage agglomerative clustering on a distance matrix"""
+    distance = distance.astype(float).copy()
+    np.fill_diagonal(distance, np.inf)
+    clusters = [[i] for i in range(len(distance))]
+    sizes = np.ones(len(distance))
+    active = np.ones(len(distance), dtype=bool)
+    for _ in range(len(distance) - 1):
+        masked = np.where(active[:, None] & active[None, :], distance, np.inf)
+        a, b = np.unravel_index(np.argmin(masked), masked.shape)
+        a, b = min(a, b), max(a, b)
+        merged = (sizes[a] * distance[a] + sizes[b] * distance[b]) / (sizes[a] + sizes[b])
+        distance[a, :] = distance[:, a] = merged
+        distance[a, a] = np.inf
+        active[b] = False
+        clusters[a] += clusters[b]
+        sizes[a] += sizes[b]
+    return clusters[int(np.flatnonzero(active)[0])] if len(distance) else []
+
+
+def clustered(corr: pd.DataFrame, max_columns: int = CORR_MAX_DISPLAY_COLUMNS) -> pd.DataFrame:
+    """
+    Submatrix of the max_columns columns with the largest summed |correlation| to the
+    others, rows and columns ordered so correlated columns sit together (1 - |r| distance)
+    """
+    strength = np.nan_to_num(np.abs(corr.to_numpy()))
+    np.fill_diagonal(strength, 0.0)
+    if len(corr) > max_columns:
+        keep = np.sort(np.argsort(-strength.sum(axis=0), kind="stable")[:max_columns])
+        corr, strength = corr.iloc[keep, keep], strength[np.ix_(keep, keep)]
+    order = _linkage_order(1.0 - strength)
+    return corr.iloc[order, order]
@@ -1,11 +1,294 @@
 import os
+import copy
+import time
+import hashlib
+import threading
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import google.generativeai as genai
+from utils import llm_gateway, correlation, stats_report
+from utils.cleaning_ops import (
+    first_valid, guess_date_format, parse_dates, normalize_string_column, map_categorical_values, take_uniques,
+)
+from utils.sketches import (
+    KLLSketch, FrequentItems, SeenRowHashes, StreamingMoments, HyperLogLog, CoMoments,
+    STREAM_CHUNK_ROWS, STREAM_DISTINCT_CAP, APPROX_STATS_MIN_ROWS,
+    sketch_numeric, approximate_nunique, approximate_top, approximation_note,
+)
+
+INSIGHTS_MODEL = 'gemini-2.0-flash'
+# Gemini insight answers are cached here by prompt (profile) hash, for this many seconds (0 = forever)
+INSIGHTS_CACHE_DIR = os.getenv("INSIGHTS_CACHE_DIR", "./.cache/insights")
+INSIGHTS_CACHE_TTL = int(os.getenv("INSIGHTS_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Text columns with fewer distinct values than this share of rows become category in optimize_memory
+CATEGORY_MAX_RATIO = float(os.getenv("CATEGORY_MAX_RATIO", "0.5"))
+# Bins of the histograms drawn by create_visualizations
+PLOT_BINS = int(os.getenv("PLOT_BINS", "50"))
+# Rows drawn in the scatter matrix, larger frames are sampled down to this
+PLOT_POINT_BUDGET = int(os.getenv("PLOT_POINT_BUDGET", "5000"))
+# Grid points of the violin density curves
+KDE_GRID_POINTS = 200
+# Built figures kept in memory across reruns (one dataset has up to 9)
+FIGURE_CACHE_SIZE = int(os.getenv("FIGURE_CACHE_SIZE", "64"))
+
+_FIGURE_CACHE = OrderedDict()
+_FIGURE_LOCK = threading.Lock()
+_INSIGHTS_CACHE = None
+
+
+def _insights_cache():
+    global _INSIGHTS_CACHE
+    if _INSIGHTS_CACHE is None:
+        from diskcache import Cache
+        _INSIGHTS_CACHE = Cache(directory=INSIGHTS_CACHE_DIR)
+    return _INSIGHTS_CACHE
+
+
+def _to_numpy_dtypes(df):
+    """
+    Arrow-backed columns (loaders.load_table) converted in place to the numpy dtypes the
+    C parser gives: text as object with NaN gaps, integers with gaps as float64, booleans
+    with gaps as object. Arrow dates and timestamps are already parsed, they become datetime64[ns].
+    """
+    arrow_cols = [col for col, dtype in df.dtypes.items() if isinstance(dtype, (pd.ArrowDtype, pd.StringDtype))]
+    if not arrow_cols:
+        return df
+    for col in arrow_cols:
+        series = df[col]
+        kind = series.dtype.kind
+        has_na = series.isna().any()
+        if kind in 'iu' and not has_na:
+            df[col] = series.to_numpy(dtype=series.dtype.numpy_dtype)
+        elif kind in 'iuf':
+            df[col] = series.to_numpy(dtype='float64', na_value=np.nan)
+        elif kind == 'b' and not has_na:
+            df[col] = series.to_numpy(dtype=bool)
+        elif kind == 'M':
+            df[col] = series.astype('datetime64[ns]')
+        else:
+            df[col] = series.to_numpy(dtype=object, na_value=np.nan)
+    return df
+
+
+def _approximate_describe(numeric_df):
+    """stats_report.NUMERIC_STATS rows from sketches: exact moments, KLL quartiles"""
+    return _describe_sketches({col: sketch_numeric(numeric_df[col]) for col in numeric_df.columns})
+
+
+def _describe_sketches(sketches):
+    """stats_report.NUMERIC_STATS rows of {col: (KLLSketch, StreamingMoments)}"""
+    rows = {}
+    for col, (sketch, moments) in sketches.items():
+        empty = moments.n == 0
+        rows[col] = {
+            'count': float(moments.n), 'mean': np.nan if empty else moments.mean, 'std': moments.std,
+            'var': moments.std ** 2, 'min': np.nan if empty else moments.min,
+            '25%': sketch.quantile(0.25), '50%': sketch.quantile(0.5), '75%': sketch.quantile(0.75),
+            'max': np.nan if empty else moments.max, 'skew': moments.skew, 'kurtosis': moments.kurtosis,
+        }
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def _new_stream_summary(params):
+    """Running statistics of the numeric (and category-coded) columns of a streamed clean"""
+    columns = [col for col in params["columns"] if col in params["numeric_dtypes"] or col in params["categories"]]
+    return {
+        "columns": columns,
+        "sketches": {col: (KLLSketch(), StreamingMoments()) for col in columns},
+        "comoments": CoMoments(len(columns)),
+    }
+
+
+def _update_stream_summary(summary, chunk):
+    values = chunk[summary["columns"]].to_numpy(dtype=float, na_value=np.nan)
+    for i, col in enumerate(summary["columns"]):
+        sketch, moments = summary["sketches"][col]
+        sketch.update(values[:, i])
+        moments.update(values[:, i])
+    summary["comoments"].update(values)
+
+
+def _stream_cleaning_log(params, totals):
+    cleaning_log = [f"Initial dataset shape: {(totals['input_rows'], params['initial_shape'][1])}"]
+    if params["date_cols"]:
+        cleaning_log.append(f"Parsed date columns: {list(params['date_cols'])}")
+    cleaning_log.append(f"Normalized string columns (excluding dates): {params['normalized_cols']}")
+    cleaning_log.append("Standardized common categorical values (yes/no, nan)")
+    if params["dropped"]:
+        cleaning_log.append(f"Dropped columns with >50% missing or ≤1 unique value: {params['dropped']}")
+    if totals["duplicates"] > 0:
+        cleaning_log.append(f"Removed {totals['duplicates']} duplicate rows")
+    if totals["missing"] > 0:
+        cleaning_log.append(f"Handled {totals['missing']} missing values")
+    if totals["outliers"] > 0:
+        cleaning_log.append(f"Capped {totals['outliers']} outliers using IQR method")
+    if params["categories"]:
+        cleaning_log.append(f"Encoded categorical columns with <20 unique values: {list(params['categories'])}")
+    cleaning_log.append(f"Final dataset shape: {(totals['rows'], len(params['columns']))}")
+    return cleaning_log
+
+
+def _finite(values):
+    values = np.asarray(values, dtype=float)
+    return values[np.isfinite(values)]
+
+
+def _histogram_trace(values, name):
+    """Histogram binned here, the figure holds PLOT_BINS bars whatever the row count"""
+    counts, edges = np.histogram(_finite(values), bins=PLOT_BINS)
+    return go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), name=name, showlegend=False)
+
+
+def _box_traces(values, name):
+    """Box from precomputed quartiles and Tukey fences, plus a sample of the points beyond the fences"""
+    values = _finite(values)
+    if len(values) == 0:
+        return [go.Box(name=name)]
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+    box = go.Box(
+        name=name, x=[name], q1=[q1], median=[median], q3=[q3],
+        lowerfence=[values[inside].min()], upperfence=[values[inside].max()],
+        mean=[values.mean()], sd=[values.std()],
+    )
+    outliers = values[~inside]
+    if len(outliers) > PLOT_POINT_BUDGET // 10:
+        outliers = np.random.default_rng(0).choice(outliers, PLOT_POINT_BUDGET // 10, replace=False)
+    if len(outliers) == 0:
+        return [box]
+    return [box, go.Scatter(x=[name] * len(outliers), y=outliers, mode='markers', name=name, showlegend=False)]
+
+
+def _kde(values):
+    """
+    Gaussian KDE (Silverman bandwidth) on a KDE_GRID_POINTS grid: the values are binned on
+    the grid and the counts smoothed with the kernel, O(rows + grid). None without spread.
+    """
+    values = _finite(values)
+    if len(values) < 2 or values.std() == 0:
+        return None
+    bandwidth = 1.06 * values.std() * len(values) ** (-1 / 5)
+    grid = np.linspace(values.min() - 3 * bandwidth, values.max() + 3 * bandwidth, KDE_GRID_POINTS)
+    step = grid[1] - grid[0]
+    counts, _ = np.histogram(values, bins=KDE_GRID_POINTS, range=(grid[0] - step / 2, grid[-1] + step / 2))
+    # The grid spans the data plus 3 bandwidths each side, so the kernel never outgrows it
+    offsets = np.arange(-int(3 * bandwidth / step), int(3 * bandwidth / step) + 1) * step
+    density = np.convolve(counts, np.exp(-0.5 * (offsets / bandwidth) ** 2), mode='same')
+    return grid, density / (density.sum() * step)
+
+
+def _violin_traces(values, name, position):
+    """Violin outline from the KDE grid with the inner box and mean line, centred on x=position"""
+    kde = _kde(values)
+    if kde is None:
+        return []
+    grid, density = kde
+    values = _finite(values)
+    half_width = 0.4 * density / density.max()
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    mean = values.mean()
+    return [
+        go.Scatter(
+            x=np.concatenate([position - half_width, (position + half_width)[::-1]]),
+            y=np.concatenate([grid, grid[::-1]]),
+            fill='toself', mode='lines', name=name,
+        ),
+        go.Scatter(x=[position, position], y=[q1, q3], mode='lines', line=dict(width=8, color='black'), showlegend=False),
+        go.Scatter(x=[position], y=[median], mode='markers', marker=dict(color='white', size=6), showlegend=False),
+        go.Scatter(x=[position - 0.4, position + 0.4], y=[mean, mean], mode='lines',
+                   line=dict(dash='dash', color='black', width=1), showlegend=False),
+    ]
+
+
+def _drop_duplicates(cleaned_df, dedup_mode, cleaning_log):
+    """Step 5 of deep_clean_data: (frame without duplicate rows, duplicated mask of the input rows)"""
+    from utils import dedup
+    duplicated = dedup.duplicated(cleaned_df)
+    duplicates = duplicated.sum()
+    if duplicates > 0:
+        cleaning_log.append(f"Removed {duplicates} duplicate rows")
+    if dedup_mode == "near":
+        near = dedup.near_duplicated(cleaned_df, removed=duplicated)
+        if near.any():
+            cleaning_log.append(f"Removed {near.sum()} near-duplicate rows "
+                                f"(similarity ≥ {dedup.NEAR_DUPLICATE_SIMILARITY})")
+        duplicated |= near
+    if duplicated.any():
+        cleaned_df = cleaned_df[~duplicated]
+    return cleaned_df, duplicated
+
+
+class CleaningRun:
+    """
+    Per-call details of deep_clean_data / apply_cleaning_plan: the cleaning plan it
+    applied or derived, and the wall time (and peak traced memory when tracemalloc is
+    on) of every step. Pass one as run= to read them; they are not kept on the analyzer,
+    which is shared across threads.
+    """
+
+    def __init__(self):
+        self.plan = None
+        self.step_timings = {}
+        self.step_peak_memory = {}
+
+    @contextmanager
+    def timed_step(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.step_timings[name] = time.perf_counter() - start
+            if tracing:
+                self.step_peak_memory[name] = tracemalloc.get_traced_memory()[1]
+
+
+class PlotSpec:
+    """
+    One figure of create_visualizations, built on the first figure() call.
+    Built figures are shared through a small LRU cache keyed by (dataset fingerprint, plot key).
+    """
+
+    def __init__(self, key, title, build, fingerprint):
+        self.key = key
+        self.title = title
+        self.fingerprint = fingerprint
+        self._build = build
+
+    def figure(self):
+        cache_key = (self.fingerprint, self.key)
+        with _FIGURE_LOCK:
+            if cache_key in _FIGURE_CACHE:
+                _FIGURE_CACHE.move_to_end(cache_key)
+                return _FIGURE_CACHE[cache_key]
+        fig = self._build()
+        with _FIGURE_LOCK:
+            _FIGURE_CACHE[cache_key] = fig
+            while len(_FIGURE_CACHE) > FIGURE_CACHE_SIZE:
+                _FIGURE_CACHE.popitem(last=False)
+        return fig
+
+
+def clear_figure_cache():
+    with _FIGURE_LOCK:
+        _FIGURE_CACHE.clear()
+
+
+def dataset_fingerprint(df, engine="pandas") -> str:
+    """Content hash of a frame (values, column names and dtypes) for cache keys"""
+    from utils import engines
+    return engines.frame(df, engine).fingerprint()
+
 
 class DataAnalyzer:
     def __init__(self):
@@ -14,176 +297,685 @@ class DataAnalyzer:
         api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("No Gemini or Google API key found in .env file.")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash') 
-    def deep_clean_data(self, df):
-        """Advanced data cleaning: string, date, categorical, outliers, irrelevant columns, encoding"""
-        cleaned_df = df.copy()
+        # Shared long-lived model, genai.configure runs once per process
+        self.model = llm_gateway.get_gemini_model(INSIGHTS_MODEL, api_key)
+
+    def deep_clean_data(self, df, n_jobs=None, engine="pandas", dedup_mode=None, plan=None, reuse_plan=None, run=None):
+        """
+        Advanced data cleaning: string, date, categorical, outliers, irrelevant columns, encoding.
+        n_jobs > 1 (0 = every core, default ANALYZER_N_JOBS) runs the column-local steps of
+        large frames on a process pool; the result is the same as the serial run.
+        engine="polars" runs the same steps as one Polars lazy query and returns a polars DataFrame.
+        dedup_mode="near" (default DEDUP_MODE) also removes near-duplicate rows (utils.dedup).
+        The pandas engine records its decisions in run.plan (utils.cleaning_plan) and step
+        timings in run (CleaningRun). A plan passed as plan, or with reuse_plan (default
+        REUSE_CLEANING_PLANS) the stored plan of df's schema, is applied instead of deriving
+        them again (apply_cleaning_plan).
+        """
+        from utils import engines, dedup, cleaning_plan
+        run = run if run is not None else CleaningRun()
+        dedup_mode = dedup.check_mode(dedup_mode or dedup.DEDUP_MODE)
+        if engines.check_engine(engine) == "polars":
+            return engines.polars_deep_clean(df, run.timed_step, dedup_mode)
+        from utils import parallel_clean
+        n_jobs = parallel_clean.resolve_n_jobs(n_jobs)
+        parallel = parallel_clean.use_pool(df, n_jobs)
+        cleaned_df = _to_numpy_dtypes(df.copy())
+        reuse_plan = cleaning_plan.REUSE_CLEANING_PLANS if reuse_plan is None else reuse_plan
+        signature = cleaning_plan.schema_signature(cleaned_df)
+        stored = plan is None and reuse_plan
+        if stored:
+            plan = cleaning_plan.load(signature)
+        if plan is not None:
+            cleaning_plan.check_plan(plan, cleaned_df)
+            result = self._apply_cleaning_plan(cleaned_df, plan, dedup_mode, run)
+            # Fill values derived for columns without gaps in the fitted data are kept for the next files
+            if stored and set(run.plan["fill"]) != set(plan["fill"]):
+                cleaning_plan.store(run.plan)
+            return result
+        plan = cleaning_plan.new_plan(signature)
         cleaning_log = []
         initial_shape = cleaned_df.shape
         cleaning_log.append(f"Initial dataset shape: {initial_shape}")
 
+        # Large frames get their quartiles and distinct counts from sketches
+        approx = len(cleaned_df) >= APPROX_STATS_MIN_ROWS
+        # Single dtype pass, later steps track their columns instead of re-running select_dtypes
+        object_cols = list(cleaned_df.select_dtypes(include=['object']).columns)
+        numeric_cols = list(cleaned_df.select_dtypes(include=[np.number]).columns)
+
         # 1. First, identify potential date columns before string normalization
-        potential_date_cols = []
-        for col in cleaned_df.select_dtypes(include=['object']).columns:
-            # Skip columns that are already datetime
-            if pd.api.types.is_datetime64_any_dtype(cleaned_df[col]):
-                continue
-                
-            # Check if column might contain dates by trying to parse a sample
-            sample_values = cleaned_df[col].dropna().head(10)
-            if len(sample_values) > 0:
-                try:
-                    parsed_sample = pd.to_datetime(sample_values, format='%Y-%m-%d', errors='coerce')
-                    if parsed_sample.notna().sum() > len(sample_values) * 0.7:  # 70% parseable
-                        potential_date_cols.append(col)
-                except:
-                    continue
-        
-        # 2. Parse dates BEFORE string normalization
-        date_cols = []
-        for col in potential_date_cols:
-            try:
-                parsed = pd.to_datetime(cleaned_df[col], errors='coerce')
-                valid_dates = parsed.notna().sum()
-                if valid_dates > 0 and valid_dates > 0.3 * len(parsed):  # Lower threshold
-                    cleaned_df[col] = parsed
-                    date_cols.append(col)
-            except Exception:
-                continue
-        if date_cols:
-            cleaning_log.append(f"Parsed date columns: {date_cols}")
-
-        # 3. Strip whitespace and normalize strings (EXCLUDE date columns)
-        string_cols = [col for col in cleaned_df.select_dtypes(include=['object']).columns 
-                    if col not in date_cols]
+        with run.timed_step("detect_dates"):
+            potential_date_cols = []
+            date_samples = {}
+            for col in object_cols:
+                # Check if column might contain dates by trying to parse a sample
+                sample_values = first_valid(cleaned_df[col], 10)
+                if len(sample_values) > 0:
+                    try:
+                        parsed_sample = pd.to_datetime(sample_values, format='%Y-%m-%d', errors='coerce')
+                        if parsed_sample.notna().sum() > len(sample_values) * 0.7:  # 70% parseable
+                            potential_date_cols.append(col)
+                            date_samples[col] = sample_values
+                    except:
+                        continue
         
-        for col in string_cols:
-            # Handle NaN values before string operations
-            mask = cleaned_df[col].notna()
-            cleaned_df.loc[mask, col] = (cleaned_df.loc[mask, col]
-                                    .astype(str)
-                                    .str.strip()
-                                    .str.lower()
-                                    .str.replace(r'[^\w\s]', '', regex=True))
-            # Convert 'nan' strings back to actual NaN
-            cleaned_df[col] = cleaned_df[col].replace('nan', np.nan)
-        cleaning_log.append(f"Normalized string columns (excluding dates): {string_cols}")
-
-        # 4. Normalize categorical values (EXCLUDE date columns)
-        categorical_cols = [col for col in cleaned_df.select_dtypes(include=['object']).columns 
-                        if col not in date_cols]
-        
-        for col in categorical_cols:
-            # Create a mapping for common variations
-            value_mapping = {
-                'yes': 'yes', 'y': 'yes', 'true': 'yes', '1': 'yes',
-                'no': 'no', 'n': 'no', 'false': 'no', '0': 'no',
-                'nan': np.nan, 'none': np.nan, 'null': np.nan, '': np.nan
-            }
-            cleaned_df[col] = cleaned_df[col].replace(value_mapping)
-        cleaning_log.append("Standardized common categorical values (yes/no, nan)")
+        if parallel:
+            # 2-4. Date parsing and string normalization, one pool task per object column
+            with run.timed_step("object_columns"):
+                date_cols, factorized = parallel_clean.clean_object_columns(cleaned_df, object_cols, date_samples, n_jobs)
+                plan["date_cols"] = {col: guess_date_format(date_samples[col]) for col in date_cols}
+                string_cols = [col for col in object_cols if col not in date_cols]
+                unique_counts = {col: pd.Series(mapped, dtype=object).nunique() for col, (_, mapped) in factorized.items()}
+            if date_cols:
+                cleaning_log.append(f"Parsed date columns: {date_cols}")
+            cleaning_log.append(f"Normalized string columns (excluding dates): {string_cols}")
+            cleaning_log.append("Standardized common categorical values (yes/no, nan)")
+        else:
+            # 2. Parse dates BEFORE string normalization
+            with run.timed_step("parse_dates"):
+                date_cols = []
+                for col in potential_date_cols:
+                    try:
+                        # Same format pandas would infer from the first value, detected once from the sample
+                        date_format = guess_date_format(date_samples[col])
+                        parsed = parse_dates(cleaned_df[col], date_format)
+                        valid_dates = parsed.notna().sum()
+                        if valid_dates > 0 and valid_dates > 0.3 * len(parsed):  # Lower threshold
+                            cleaned_df[col] = parsed
+                            date_cols.append(col)
+                            plan["date_cols"][col] = date_format
+                    except Exception:
+                        continue
+                if date_cols:
+                    cleaning_log.append(f"Parsed date columns: {date_cols}")
+
+            # 3. Strip whitespace and normalize strings (EXCLUDE date columns)
+            with run.timed_step("normalize_strings"):
+                string_cols = [col for col in object_cols if col not in date_cols]
+                # col -> (codes, uniques): string ops run once per distinct value, then map back by code
+                factorized = {}
+                for col in string_cols:
+                    codes, uniques = normalize_string_column(cleaned_df[col])
+                    factorized[col] = (codes, uniques)
+                    cleaned_df[col] = take_uniques(cleaned_df[col], codes, uniques)
+                cleaning_log.append(f"Normalized string columns (excluding dates): {string_cols}")
+
+            # 4. Normalize categorical values (EXCLUDE date columns)
+            with run.timed_step("normalize_categoricals"):
+                unique_counts = {}
+                for col in string_cols:
+                    codes, uniques = factorized[col]
+                    uniques = map_categorical_values(uniques)
+                    cleaned_df[col] = take_uniques(cleaned_df[col], codes, uniques)
+                    unique_counts[col] = uniques.nunique()
+                cleaning_log.append("Standardized common categorical values (yes/no, nan)")
 
         # 4. Remove columns with >50% missing or only 1 unique value
-        cols_to_drop = []
-        for col in cleaned_df.columns:
-            missing_pct = cleaned_df[col].isnull().mean()
-            unique_count = cleaned_df[col].nunique()
-            if missing_pct > 0.5 or unique_count <= 1:
-                cols_to_drop.append(col)
+        with run.timed_step("drop_columns"):
+            cols_to_drop = []
+            missing_pct = cleaned_df.isnull().mean()
+            for col in cleaned_df.columns:
+                if missing_pct[col] > 0.5:
+                    cols_to_drop.append(col)
+                    continue
+                if col in unique_counts:
+                    unique_count = unique_counts[col]
+                else:
+                    unique_count = approximate_nunique(cleaned_df[col]) if approx else cleaned_df[col].nunique()
+                if unique_count <= 1:
+                    cols_to_drop.append(col)
         
-        if cols_to_drop:
-            cleaned_df = cleaned_df.drop(columns=cols_to_drop)
-            cleaning_log.append(f"Dropped columns with >50% missing or ≤1 unique value: {cols_to_drop}")
+            if cols_to_drop:
+                cleaned_df = cleaned_df.drop(columns=cols_to_drop)
+                cleaning_log.append(f"Dropped columns with >50% missing or ≤1 unique value: {cols_to_drop}")
+            plan["string_cols"] = string_cols
+            plan["dropped"] = cols_to_drop
 
         # 5. Remove duplicate rows
-        duplicates = cleaned_df.duplicated().sum()
-        if duplicates > 0:
-            cleaned_df = cleaned_df.drop_duplicates()
-            cleaning_log.append(f"Removed {duplicates} duplicate rows")
+        with run.timed_step("drop_duplicates"):
+            cleaned_df, duplicated = _drop_duplicates(cleaned_df, dedup_mode, cleaning_log)
+
+        # Per-column fill values, clip bounds and label codes from the pool, applied below in column order
+        finish = {}
+        if parallel:
+            with run.timed_step("finish_columns"):
+                kept_rows = np.flatnonzero(~duplicated)
+                finish = parallel_clean.finish_columns(cleaned_df, numeric_cols, factorized, unique_counts, kept_rows, n_jobs)
 
         # 6. Handle missing values
-        missing_before = cleaned_df.isnull().sum().sum()
-        if missing_before > 0:
-            for col in cleaned_df.columns:
-                if cleaned_df[col].isnull().sum() == 0:  # Skip columns with no missing values
-                    continue
+        with run.timed_step("impute_missing"):
+            missing_counts = cleaned_df.isnull().sum()
+            missing_before = missing_counts.sum()
+            if missing_before > 0:
+                for col in cleaned_df.columns:
+                    if missing_counts[col] == 0:  # Skip columns with no missing values
+                        continue
                     
-                if pd.api.types.is_numeric_dtype(cleaned_df[col]):
-                    # Use median for numeric columns
-                    median_val = cleaned_df[col].median()
-                    if pd.notna(median_val):  # Only fill if median is not NaN
-                        cleaned_df[col] = cleaned_df[col].fillna(median_val)  # <-- CORRECT
-                elif cleaned_df[col].dtype == 'object':
-                    # Use mode for categorical columns
-                    mode_values = cleaned_df[col].mode()
-                    mode_val = mode_values[0] if len(mode_values) > 0 else 'unknown'
-                    cleaned_df[col] = cleaned_df[col].fillna(mode_val)
-                elif pd.api.types.is_datetime64_any_dtype(cleaned_df[col]):
-                    # Use mode for datetime columns
-                    mode_values = cleaned_df[col].mode()
-                    if len(mode_values) > 0:
+                    if pd.api.types.is_numeric_dtype(cleaned_df[col]):
+                        # Use median for numeric columns
+                        median_val = finish[col]["median"] if col in finish else cleaned_df[col].median()
+                        if pd.notna(median_val):  # Only fill if median is not NaN
+                            cleaned_df[col] = cleaned_df[col].fillna(median_val)  # <-- CORRECT
+                            plan["fill"][col] = cleaning_plan.plan_value(median_val)
+                    elif cleaned_df[col].dtype == 'object':
+                        # Use mode for categorical columns
+                        if col in finish:
+                            mode_val = finish[col]["mode"]
+                        else:
+                            mode_values = cleaned_df[col].mode()
+                            mode_val = mode_values[0] if len(mode_values) > 0 else 'unknown'
                         cleaned_df[col] = cleaned_df[col].fillna(mode_val)
-            cleaning_log.append(f"Handled {missing_before} missing values")
+                        plan["fill"][col] = cleaning_plan.plan_value(mode_val)
+                    elif pd.api.types.is_datetime64_any_dtype(cleaned_df[col]):
+                        # Use mode for datetime columns
+                        mode_values = cleaned_df[col].mode()
+                        if len(mode_values) > 0:
+                            cleaned_df[col] = cleaned_df[col].fillna(mode_values[0])
+                            plan["fill"][col] = mode_values[0].isoformat()
+                cleaning_log.append(f"Handled {missing_before} missing values")
 
         # 7. Advanced outlier handling (IQR)
-        numeric_cols = cleaned_df.select_dtypes(include=[np.number]).columns
-        outliers_capped = 0
-        for col in numeric_cols:
-            if cleaned_df[col].nunique() <= 1:  # Skip columns with no variance
-                continue
-                
-            Q1 = cleaned_df[col].quantile(0.25)
-            Q3 = cleaned_df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            
-            if IQR > 0:  # Only apply if there's actual variance
-                lower = Q1 - 1.5 * IQR
-                upper = Q3 + 1.5 * IQR
+        with run.timed_step("cap_outliers"):
+            numeric_cols = [col for col in numeric_cols if col in cleaned_df.columns]
+            outliers_capped = 0
+            if parallel:
+                bounds = {col: finish[col]["bounds"] for col in numeric_cols}
+            elif approx:
+                bounds = {}
+                for col in numeric_cols:
+                    sketch, moments = sketch_numeric(cleaned_df[col])
+                    if moments.n == 0 or moments.max <= moments.min:
+                        continue
+                    Q1, Q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+                    IQR = Q3 - Q1
+                    if IQR > 0:
+                        bounds[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+            else:
+                bounds = {}
+                if numeric_cols:
+                    # All quartiles in one call; max == min means at most one unique value
+                    quartiles = cleaned_df[numeric_cols].quantile([0.25, 0.75])
+                    varying = cleaned_df[numeric_cols].max() > cleaned_df[numeric_cols].min()
+                for col in numeric_cols:
+                    if not varying[col]:  # Skip columns with no variance
+                        continue
+
+                    Q1 = quartiles.at[0.25, col]
+                    Q3 = quartiles.at[0.75, col]
+                    IQR = Q3 - Q1
+                    if IQR > 0:  # Only apply if there's actual variance
+                        bounds[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+
+            for col in numeric_cols:
+                plan["bounds"][col] = None
+                if bounds.get(col) is None:
+                    continue
+                lower, upper = bounds[col]
+                plan["bounds"][col] = [cleaning_plan.plan_value(lower), cleaning_plan.plan_value(upper)]
                 mask = (cleaned_df[col] < lower) | (cleaned_df[col] > upper)
                 outliers_capped += mask.sum()
                 cleaned_df[col] = cleaned_df[col].clip(lower, upper)
+            plan["approximate_bounds"] = approx and not parallel
         
-        if outliers_capped > 0:
-            cleaning_log.append(f"Capped {outliers_capped} outliers using IQR method")
+            if outliers_capped > 0:
+                cleaning_log.append(f"Capped {outliers_capped} outliers using IQR method")
+                if approx and not parallel:
+                    cleaning_log.append(f"IQR bounds from KLL sketches (quartiles within ±{KLLSketch().rank_error:.2%} rank)")
 
         # 9. Encode categorical columns (EXCLUDE date columns)
-        categorical_cols_encoded = []
-        non_date_object_cols = [col for col in cleaned_df.select_dtypes(include=['object']).columns 
-                            if col not in date_cols]
+        with run.timed_step("encode_categoricals"):
+            categorical_cols_encoded = []
+            non_date_object_cols = [col for col in string_cols if col in cleaned_df.columns]
         
-        for col in non_date_object_cols:
-            unique_count = cleaned_df[col].nunique()
-            if unique_count < 20 and unique_count > 1:  # Only encode if there are multiple categories
-                # Use label encoding (convert to category first to handle NaN properly)
-                cleaned_df[col] = cleaned_df[col].astype('category')
-                cleaned_df[col] = cleaned_df[col].cat.codes
-                # Replace -1 (NaN category code) with NaN
-                cleaned_df[col] = cleaned_df[col].replace(-1, np.nan)
-                categorical_cols_encoded.append(col)
+            for col in non_date_object_cols:
+                # Dropping duplicate rows and filling with the mode keep the set of values
+                unique_count = unique_counts[col]
+                if unique_count < 20 and unique_count > 1:  # Only encode if there are multiple categories
+                    # Use label encoding (convert to category first to handle NaN properly)
+                    if col in finish:
+                        cleaned_df[col] = pd.Series(finish[col]["codes"], index=cleaned_df.index)
+                        plan["categories"][col] = finish[col]["categories"]
+                    else:
+                        cleaned_df[col] = cleaned_df[col].astype('category')
+                        plan["categories"][col] = cleaned_df[col].cat.categories.tolist()
+                        cleaned_df[col] = cleaned_df[col].cat.codes
+                    # Replace -1 (NaN category code) with NaN
+                    cleaned_df[col] = cleaned_df[col].replace(-1, np.nan)
+                    categorical_cols_encoded.append(col)
         
-        if categorical_cols_encoded:
-            cleaning_log.append(f"Encoded categorical columns with <20 unique values: {categorical_cols_encoded}")
+            if categorical_cols_encoded:
+                cleaning_log.append(f"Encoded categorical columns with <20 unique values: {categorical_cols_encoded}")
 
         final_shape = cleaned_df.shape
         cleaning_log.append(f"Final dataset shape: {final_shape}")
+        run.plan = plan
+        if reuse_plan:
+            cleaning_plan.store(plan)
         return cleaned_df, cleaning_log
+
+    def fit_cleaning_plan(self, df, n_jobs=None) -> dict:
+        """
+        Cleaning plan (utils.cleaning_plan) of df. The decisions depend on the values left by
+        the earlier steps (fills after duplicate removal, bounds after filling), so this runs
+        deep_clean_data and returns the decisions it took.
+        """
+        run = CleaningRun()
+        self.deep_clean_data(df, n_jobs, reuse_plan=False, run=run)
+        return run.plan
+
+    def apply_cleaning_plan(self, df, plan, dedup_mode=None, run=None):
+        """
+        deep_clean_data with the decisions of a fitted plan: no date detection, cardinality
+        counts, medians, modes or quartiles, values unseen by the plan encode as NaN.
+        Applied to the frame it was fitted on, the result is the same as deep_clean_data.
+        Returns (cleaned_df, cleaning_log); run (CleaningRun) gets the step timings and the
+        plan with the fill values derived for columns that had no gaps when it was fitted.
+        """
+        from utils import dedup, cleaning_plan
+        cleaned_df = _to_numpy_dtypes(df.copy())
+        cleaning_plan.check_plan(plan, cleaned_df)
+        run = run if run is not None else CleaningRun()
+        return self._apply_cleaning_plan(cleaned_df, plan, dedup.check_mode(dedup_mode or dedup.DEDUP_MODE), run)
+
+    def _apply_cleaning_plan(self, cleaned_df, plan, dedup_mode, run):
+        """Applies a copy of plan (kept in run.plan with the fill values it derived)"""
+        from utils import cleaning_plan
+        plan = copy.deepcopy(plan)
+        run.plan = plan
+        cleaning_log = [f"Initial dataset shape: {cleaned_df.shape}"]
+        # Dropped columns are known up front: they are neither parsed nor normalized
+        with run.timed_step("drop_columns"):
+            cleaned_df = cleaned_df.drop(columns=plan["dropped"])
+
+        with run.timed_step("parse_dates"):
+            for col, date_format in plan["date_cols"].items():
+                if col in cleaned_df.columns:
+                    cleaned_df[col] = parse_dates(cleaned_df[col], date_format)
+            if plan["date_cols"]:
+                cleaning_log.append(f"Parsed date columns: {list(plan['date_cols'])}")
+
+        with run.timed_step("normalize_strings"):
+            for col in plan["string_cols"]:
+                if col in cleaned_df.columns:
+                    codes, uniques = normalize_string_column(cleaned_df[col])
+                    cleaned_df[col] = take_uniques(cleaned_df[col], codes, map_categorical_values(uniques))
+            cleaning_log.append(f"Normalized string columns (excluding dates): {plan['string_cols']}")
+            cleaning_log.append("Standardized common categorical values (yes/no, nan)")
+        if plan["dropped"]:
+            cleaning_log.append(f"Dropped columns with >50% missing or ≤1 unique value: {plan['dropped']}")
+
+        with run.timed_step("drop_duplicates"):
+            cleaned_df, _ = _drop_duplicates(cleaned_df, dedup_mode, cleaning_log)
+
+        with run.timed_step("impute_missing"):
+            missing_counts = cleaned_df.isnull().sum()
+            missing_before = missing_counts.sum()
+            for col in missing_counts.index[missing_counts > 0]:
+                if col not in plan["fill"]:
+                    # No gaps when the plan was fitted: same rule as deep_clean_data, kept in the plan
+                    if pd.api.types.is_numeric_dtype(cleaned_df[col]):
+                        value = cleaned_df[col].median()
+                    elif cleaned_df[col].dtype == 'object':
+                        mode_values = cleaned_df[col].mode()
+                        value = mode_values[0] if len(mode_values) > 0 else 'unknown'
+                    elif pd.api.types.is_datetime64_any_dtype(cleaned_df[col]):
+                        mode_values = cleaned_df[col].mode()
+                        value = mode_values[0].isoformat() if len(mode_values) > 0 else np.nan
+                    else:
+                        continue
+                    if pd.isna(value):
+                        continue
+                    plan["fill"][col] = cleaning_plan.plan_value(value)
+                value = plan["fill"][col]
+                if pd.api.types.is_datetime64_any_dtype(cleaned_df[col]):
+                    # Date fill values are stored as ISO text
+                    value = pd.Timestamp(value)
+                cleaned_df[col] = cleaned_df[col].fillna(value)
+            if missing_before > 0:
+                cleaning_log.append(f"Handled {missing_before} missing values")
+
+        with run.timed_step("cap_outliers"):
+            outliers_capped = 0
+            for col, bounds in plan["bounds"].items():
+                if bounds is None:
+                    continue
+                lower, upper = bounds
+                mask = (cleaned_df[col] < lower) | (cleaned_df[col] > upper)
+                outliers_capped += mask.sum()
+                cleaned_df[col] = cleaned_df[col].clip(lower, upper)
+            if outliers_capped > 0:
+                cleaning_log.append(f"Capped {outliers_capped} outliers using IQR method")
+                if plan["approximate_bounds"]:
+                    cleaning_log.append(f"IQR bounds from KLL sketches (quartiles within ±{KLLSketch().rank_error:.2%} rank)")
+
+        with run.timed_step("encode_categoricals"):
+            for col, categories in plan["categories"].items():
+                codes = pd.Categorical(cleaned_df[col], categories=categories).codes
+                cleaned_df[col] = pd.Series(codes, index=cleaned_df.index).replace(-1, np.nan)
+            if plan["categories"]:
+                cleaning_log.append(f"Encoded categorical columns with <20 unique values: {list(plan['categories'])}")
+
+        cleaning_log.append(f"Final dataset shape: {cleaned_df.shape}")
+        return cleaned_df, cleaning_log
+
+    def optimize_memory(self, df):
+        """
+        Smallest lossless dtypes: integers downcast, floats to float32 when every value
+        survives the round trip, low-cardinality text to category, other text to the
+        Arrow string type. Returns (optimized_df, report) with bytes before/after per column.
+        """
+        optimized = {}
+        rows = []
+        for col in df.columns:
+            series = df[col]
+            converted = series
+            if pd.api.types.is_integer_dtype(series.dtype) and isinstance(series.dtype, np.dtype):
+                converted = pd.to_numeric(series, downcast='integer')
+            elif pd.api.types.is_float_dtype(series.dtype) and series.dtype.itemsize > 4:
+                as_float32 = series.astype('float32')
+                if as_float32.astype(series.dtype).equals(series):
+                    converted = as_float32
+            elif series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) == 'string':
+                if series.nunique() < CATEGORY_MAX_RATIO * len(series):
+                    converted = series.astype('category')
+                else:
+                    try:
+                        converted = series.astype('string[pyarrow]')
+                    except ImportError:
+                        pass
+            before = series.memory_usage(deep=True, index=False)
+            after = converted.memory_usage(deep=True, index=False)
+            # A conversion that does not pay off is not kept
+            if after >= before:
+                converted, after = series, before
+            optimized[col] = converted
+            rows.append({
+                "column": col, "dtype_before": str(series.dtype), "dtype_after": str(converted.dtype),
+                "bytes_before": before, "bytes_after": after,
+            })
+        report = pd.DataFrame(rows, columns=["column", "dtype_before", "dtype_after", "bytes_before", "bytes_after"])
+        return pd.DataFrame(optimized, index=df.index, columns=df.columns), report
     
-    def generate_insights(self, df, cleaning_log):
-        """Generate AI-powered insights using Gemini, remove markdown, and provide more actionable output"""
-        summary = f"""
-        Dataset Overview:
-        - Shape: {df.shape}
-        - Columns: {list(df.columns)}
-        - Data types: {df.dtypes.to_dict()}
-        - Missing values: {df.isnull().sum().to_dict()}
-        - Numeric summary: {df.describe().to_dict()}
-        - Categorical summary: {[{col: df[col].value_counts().to_dict()} for col in df.select_dtypes(include=['object','category']).columns]}
-        Cleaning Operations Performed:
-        {chr(10).join(cleaning_log)}
-        Sample data:
-        {df.head().to_string()}
+    def deep_clean_csv(self, path, output_path, chunksize=STREAM_CHUNK_ROWS, csv_args=None, state=None, statistics=True):
+        """
+        Streaming deep_clean_data for CSV files larger than memory.
+        Pass 1 (scan_csv) collects column statistics chunk by chunk, fit_stream_params turns
+        them into cleaning parameters and pass 2 cleans every chunk with apply_stream_chunk,
+        appending it to output_path. Memory is bounded by the chunk size plus 8 bytes per
+        distinct row for duplicate detection.
+
+        Differences with deep_clean_data: medians, quartiles and modes come from sketches
+        computed before duplicate removal, dates are detected on the first chunk and date
+        gaps are filled with the column's own mode.
+
+        Pass a dict as state to keep what extend_clean_csv needs to clean rows appended to
+        the file later: parameters, totals, duplicate row hashes and running statistics of
+        the cleaned numeric columns (see stream_statistics). Its totals count the rows and
+        missing values of the whole input and the rows left after cleaning
+        (analysis_cache.summarize_stream); statistics=False skips the running statistics.
+        """
+        stats = self.scan_csv(path, chunksize, csv_args)
+        params = self.fit_stream_params(stats)
+        run = state if state is not None else {}
+        run.update({
+            "params": params,
+            "csv_args": dict(csv_args or {}),
+            "totals": {"input_rows": 0, "input_missing": 0, "duplicates": 0, "missing": 0, "outliers": 0, "rows": 0},
+            "seen": SeenRowHashes(),
+            "summary": _new_stream_summary(params) if state is not None and statistics else None,
+        })
+        read_args = dict(csv_args or {})
+        read_args["dtype"] = {col: str for col in params["text_cols"]}
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
+            self._clean_stream(pd.read_csv(path, chunksize=chunksize, **read_args), run, f, header=True)
+        return output_path, _stream_cleaning_log(params, run["totals"])
+
+    def extend_clean_csv(self, source, output_path, state, chunksize=STREAM_CHUNK_ROWS):
+        """
+        Clean rows appended to a CSV already cleaned by deep_clean_csv(state=...).
+        source (path or binary file object) holds only the new rows, without a header.
+        They are cleaned with the stored parameters (fills, clip bounds and categories are
+        not refitted), checked for duplicates against every row seen so far and appended to
+        output_path; totals and running statistics in state are updated.
+        Returns the cleaning log of the whole file.
+        """
+        params = state["params"]
+        read_args = dict(state["csv_args"])
+        read_args["dtype"] = {col: str for col in params["text_cols"]}
+        try:
+            chunks = pd.read_csv(source, chunksize=chunksize, header=None, names=params["source_columns"], **read_args)
+            with open(output_path, "a", encoding="utf-8", newline="") as f:
+                self._clean_stream(chunks, state, f, header=False)
+        except pd.errors.EmptyDataError:
+            pass
+        return _stream_cleaning_log(params, state["totals"])
+
+    def _clean_stream(self, chunks, run, f, header):
+        for chunk in chunks:
+            cleaned_chunk, counts = self.apply_stream_chunk(chunk, run["params"], run["seen"])
+            totals = run["totals"]
+            totals["input_rows"] += len(chunk)
+            totals["input_missing"] += int(chunk.isnull().sum().sum())
+            for key, count in counts.items():
+                totals[key] += count
+            totals["rows"] += len(cleaned_chunk)
+            if run["summary"] is not None:
+                _update_stream_summary(run["summary"], cleaned_chunk)
+            cleaned_chunk.to_csv(f, header=header, index=False)
+            header = False
+
+    def stream_cleaning_log(self, state):
+        """Cleaning log of a streamed clean from its state"""
+        return _stream_cleaning_log(state["params"], state["totals"])
+
+    def stream_statistics(self, state):
+        """StatisticalReport (numeric columns and correlations) of a streamed clean from its running statistics"""
+        summary = state["summary"]
+        columns = summary["columns"]
+        desc = _describe_sketches(summary["sketches"]) if columns else None
+        corr = pd.DataFrame(summary["comoments"].corr(), index=columns, columns=columns) if len(columns) > 1 else None
+        return stats_report.StatisticalReport(state["totals"]["rows"], desc, corr, approximate=True)
+
+    def scan_csv(self, path, chunksize=STREAM_CHUNK_ROWS, csv_args=None):
+        """
+        Pass 1 of the streaming mode: per-column statistics of a CSV read chunk by chunk.
+        Columns whose inferred type changes between chunks are re-scanned as text.
+        """
+        text_cols = set()
+        while True:
+            read_args = dict(csv_args or {})
+            read_args["dtype"] = {col: str for col in text_cols}
+            stats = self._scan_chunks(pd.read_csv(path, chunksize=chunksize, **read_args))
+            if not stats["conflicts"]:
+                stats["text_cols"] = sorted(text_cols)
+                return stats
+            text_cols |= stats["conflicts"]
+
+    def _scan_chunks(self, chunks):
+        stats = {
+            "rows": 0, "columns": None, "kinds": {}, "float_cols": set(), "conflicts": set(),
+            "date_formats": {}, "date_valid": {}, "date_counts": {},
+            "missing": {}, "numeric": {}, "counts": {},
+        }
+        for chunk in chunks:
+            if stats["columns"] is None:
+                stats["columns"] = list(chunk.columns)
+                # Date detection on the first chunk, same 10-value sample rule as deep_clean_data
+                for col in chunk.select_dtypes(include=['object']).columns:
+                    sample_values = first_valid(chunk[col], 10)
+                    if len(sample_values) > 0:
+                        parsed_sample = pd.to_datetime(sample_values, format='%Y-%m-%d', errors='coerce')
+                        if parsed_sample.notna().sum() > len(sample_values) * 0.7:
+                            stats["date_formats"][col] = guess_date_format(sample_values)
+                            stats["date_valid"][col] = 0
+                            stats["date_counts"][col] = FrequentItems(STREAM_DISTINCT_CAP)
+            stats["rows"] += len(chunk)
+
+            for col in stats["columns"]:
+                values = chunk[col]
+                if values.dtype == object:
+                    kind = "object"
+                elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                    kind = "numeric"
+                else:
+                    kind = "other"
+                if stats["kinds"].setdefault(col, kind) != kind:
+                    stats["conflicts"].add(col)
+                    continue
+
+                if kind == "numeric":
+                    if values.dtype.kind == "f":
+                        stats["float_cols"].add(col)
+                    stats["numeric"].setdefault(col, KLLSketch()).update(values.to_numpy(dtype=float, na_value=np.nan))
+                    stats["missing"][col] = stats["missing"].get(col, 0) + int(values.isna().sum())
+                    continue
+
+                counts = stats["counts"].setdefault(col, FrequentItems(STREAM_DISTINCT_CAP))
+                if kind == "object":
+                    if col in stats["date_formats"]:
+                        parsed = parse_dates(values, stats["date_formats"][col]).dropna()
+                        stats["date_valid"][col] += len(parsed)
+                        stats["date_counts"][col].update(pd.Series(parsed.to_numpy(dtype='datetime64[ns]').view('int64')))
+                    codes, uniques = normalize_string_column(values)
+                    uniques = map_categorical_values(uniques).to_numpy(dtype=object)
+                    value_counts = pd.Series(np.bincount(codes[codes >= 0], minlength=len(uniques)), index=uniques)
+                    value_counts = value_counts[value_counts.index.notna()]
+                    counts.update_counts(value_counts.groupby(level=0).sum().to_dict())
+                    non_null = int(value_counts.sum())
+                else:
+                    counts.update(values)
+                    non_null = int(values.notna().sum())
+                stats["missing"][col] = stats["missing"].get(col, 0) + len(values) - non_null
+            if stats["conflicts"]:
+                break
+        if stats["columns"] is None:
+            raise ValueError("No columns to parse from file")
+        return stats
+
+    def fit_stream_params(self, stats):
+        """Cleaning parameters (JSON-serializable) from the pass 1 statistics"""
+        rows = stats["rows"]
+        columns = stats["columns"]
+        date_cols = {
+            col: date_format for col, date_format in stats["date_formats"].items()
+            if stats["date_valid"][col] > 0 and stats["date_valid"][col] > 0.3 * rows
+        }
+        object_cols = [col for col in columns if stats["kinds"][col] == "object"]
+        string_cols = [col for col in object_cols if col not in date_cols]
+        numeric_cols = [col for col in columns if stats["kinds"][col] == "numeric"]
+
+        # Missing share and cardinality after date parsing and string normalization
+        dropped = []
+        for col in columns:
+            if col in date_cols:
+                missing = rows - stats["date_valid"][col]
+                unique_count = stats["date_counts"][col].distinct
+            elif col in stats["numeric"]:
+                sketch = stats["numeric"][col]
+                missing = stats["missing"][col]
+                unique_count = 0 if sketch.n == 0 else (1 if sketch.min == sketch.max else 2)
+            else:
+                missing = stats["missing"][col]
+                unique_count = stats["counts"][col].distinct
+            if rows == 0 or missing / rows > 0.5 or unique_count <= 1:
+                dropped.append(col)
+        kept = [col for col in columns if col not in dropped]
+
+        fill = {}
+        clip = {}
+        numeric_dtypes = {}
+        categories = {}
+        for col in kept:
+            if col in date_cols:
+                if rows - stats["date_valid"][col] > 0:
+                    fill[col] = pd.Timestamp(stats["date_counts"][col].mode()).isoformat()
+            elif col in stats["numeric"]:
+                sketch = stats["numeric"][col]
+                is_float = col in stats["float_cols"]
+                median = sketch.quantile(0.5)
+                extra = None
+                if stats["missing"][col] > 0:
+                    fill[col] = median
+                    extra = {median: stats["missing"][col]}
+                Q1 = sketch.quantile(0.25, extra)
+                Q3 = sketch.quantile(0.75, extra)
+                IQR = Q3 - Q1
+                if sketch.max > sketch.min and IQR > 0:
+                    lower = Q1 - 1.5 * IQR
+                    upper = Q3 + 1.5 * IQR
+                    clip[col] = [lower, upper]
+                    # Clipping an int column to fractional bounds turns it into floats
+                    is_float = is_float or sketch.min < lower or sketch.max > upper
+                numeric_dtypes[col] = "float64" if is_float else "int64"
+            elif col in string_cols:
+                counts = stats["counts"][col]
+                if stats["missing"][col] > 0:
+                    mode_val = counts.mode()
+                    fill[col] = mode_val if mode_val is not None else 'unknown'
+                if 1 < counts.distinct < 20:
+                    categories[col] = counts.distinct_values()
+
+        return {
+            "initial_shape": [rows, len(columns)],
+            "source_columns": columns,
+            "text_cols": stats["text_cols"],
+            "date_cols": {col: date_cols[col] for col in kept if col in date_cols},
+            "parsed_date_cols": list(date_cols),
+            "normalized_cols": string_cols,
+            "string_cols": [col for col in kept if col in string_cols],
+            "numeric_dtypes": numeric_dtypes,
+            "dropped": dropped,
+            "columns": kept,
+            "fill": fill,
+            "clip": clip,
+            "categories": categories,
+        }
+
+    def apply_stream_chunk(self, chunk, params, seen=None):
+        """
+        Pass 2 of the streaming mode: clean one chunk with fitted parameters.
+        seen (SeenRowHashes) carries duplicate detection across chunks.
+        Returns (cleaned chunk, {"duplicates", "missing", "outliers"} counts).
         """
+        chunk = chunk[params["columns"]].copy()
+        for col, date_format in params["date_cols"].items():
+            chunk[col] = parse_dates(chunk[col], date_format)
+        for col in params["string_cols"]:
+            codes, uniques = normalize_string_column(chunk[col])
+            chunk[col] = take_uniques(chunk[col], codes, map_categorical_values(uniques))
+        for col, dtype in params["numeric_dtypes"].items():
+            chunk[col] = chunk[col].astype(dtype)
+
+        counts = {"duplicates": 0, "missing": 0, "outliers": 0}
+        if seen is not None:
+            is_new = seen.add(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+            counts["duplicates"] = int((~is_new).sum())
+            chunk = chunk[is_new]
+
+        counts["missing"] = int(chunk.isnull().sum().sum())
+        for col, value in params["fill"].items():
+            if col in params["date_cols"]:
+                value = pd.Timestamp(value)
+            chunk[col] = chunk[col].fillna(value)
+
+        for col, (lower, upper) in params["clip"].items():
+            mask = (chunk[col] < lower) | (chunk[col] > upper)
+            counts["outliers"] += int(mask.sum())
+            chunk[col] = chunk[col].clip(lower, upper)
+
+        for col, categories in params["categories"].items():
+            chunk[col] = pd.Categorical(chunk[col], categories=categories).codes
+            chunk[col] = chunk[col].replace(-1, np.nan)
+        return chunk, counts
+
+    def generate_insights(self, df, cleaning_log, report=None):
+        """
+        Generate AI-powered insights using Gemini, remove markdown, and provide more actionable output.
+        report is the StatisticalReport of df when the caller has it (statistical_analysis otherwise).
+        """
+        from utils.dataset_profile import build_profile
+        summary = build_profile(df, cleaning_log, report or self.statistical_analysis(df))
         prompt = f"""
         Analyze this dataset and provide deep, actionable insights. Do not use markdown or asterisks. Format your response in clear sections with numbered or bulleted lists. Include:
         1. Key findings and patterns
@@ -194,12 +986,19 @@ class DataAnalyzer:
         6. Statistical anomalies or outliers
         7. Any detected data issues or suggestions
         8. If possible, suggest predictive features or targets
+        Dataset profile:
         {summary}
         """
+        # Same profile -> same answer, across runs and processes
+        cache_key = hashlib.sha256(f"{INSIGHTS_MODEL}:{prompt}".encode("utf-8")).hexdigest()
+        cached = _insights_cache().get(cache_key)
+        if cached is not None:
+            return cached
         try:
-            response = self.model.generate_content(prompt)
+            response = llm_gateway.call(INSIGHTS_MODEL, self.model.generate_content, prompt)
             # Remove markdown/asterisks if any
             text = response.text.replace('*', '').replace('**', '')
+            _insights_cache().set(cache_key, text, expire=INSIGHTS_CACHE_TTL or None)
             return text
         except Exception as e:
             error_msg = str(e)
@@ -210,141 +1009,202 @@ class DataAnalyzer:
                         "Wait a minute and try again, or upgrade your plan if needed.</span>")
             return f"Error generating insights: {error_msg}"
     
-    def create_visualizations(self, df):
-        """Create comprehensive visualizations including advanced plots"""
+    def create_visualizations(self, df, engine="pandas", fingerprint=None):
+        """
+        Lazy specs of comprehensive visualizations including advanced plots: {name: PlotSpec}.
+        Nothing is plotted until spec.figure() is called; built figures are cached per
+        dataset fingerprint (pass one already known, e.g. an upload's cache key, to skip hashing df).
+        With engine="polars" the aggregations run in Polars, only plotted values become pandas/numpy.
+        """
+        from utils import engines
+        data = engines.frame(df, engine)
+        # The correlation matrix is shared with the callers passing the same fingerprint
+        corr_fingerprint = fingerprint
+        fingerprint = fingerprint or data.fingerprint()
+        numeric_cols = data.numeric_columns()
         plots = {}
-        
+
+        def add(key, title, build):
+            plots[key] = PlotSpec(key, title, build, fingerprint)
+
         # 1. Data Overview - Only Dataset Shape and Data Types
-        fig_overview = make_subplots(
-            rows=1, cols=2,
-            subplot_titles=('Dataset Shape', 'Data Types'),
-            specs=[[{"type": "indicator"}, {"type": "bar"}]]
-        )
-        
-        # Dataset shape
-        fig_overview.add_trace(
-            go.Indicator(
-                mode="number",
-                value=df.shape[0] * df.shape[1],
-                title={"text": f"<br>({df.shape[0]} rows × {df.shape[1]} cols)"},
-                domain={'row': 0, 'column': 0}
-            ),
-            row=1, col=1
-        )
-        
-        # Data types
-        dtype_counts = df.dtypes.value_counts()
-        fig_overview.add_trace(
-            go.Bar(x=dtype_counts.index.astype(str), y=dtype_counts.values, name="Data Types"),
-            row=1, col=2
-        )
-        
-        fig_overview.update_layout(height=400, title_text="Dataset Overview")
-        plots['overview'] = fig_overview
-        
+        def overview():
+            fig_overview = make_subplots(
+                rows=1, cols=2,
+                subplot_titles=('Dataset Shape', 'Data Types'),
+                specs=[[{"type": "indicator"}, {"type": "bar"}]]
+            )
+
+            # Dataset shape
+            fig_overview.add_trace(
+                go.Indicator(
+                    mode="number",
+                    value=data.shape[0] * data.shape[1],
+                    title={"text": f"<br>({data.shape[0]} rows × {data.shape[1]} cols)"},
+                    domain={'row': 0, 'column': 0}
+                ),
+                row=1, col=1
+            )
+
+            # Data types
+            dtype_counts = data.dtype_counts()
+            fig_overview.add_trace(
+                go.Bar(x=dtype_counts.index.astype(str), y=dtype_counts.values, name="Data Types"),
+                row=1, col=2
+            )
+
+            fig_overview.update_layout(height=400, title_text="Dataset Overview")
+            return fig_overview
+
+        add('overview', "Dataset Overview", overview)
+
         # 2. Correlation Heatmap
-        numeric_df = df.select_dtypes(include=[np.number])
-        if len(numeric_df.columns) > 1:
-            correlation_matrix = numeric_df.corr()
+        def correlation_heatmap():
+            correlation_matrix = correlation.correlation_matrix(data, numeric_cols, corr_fingerprint)
+            title = "Correlation Heatmap"
+            if len(numeric_cols) > correlation.CORR_MAX_DISPLAY_COLUMNS:
+                # Unreadable as a whole: the most correlated columns, clustered
+                correlation_matrix = correlation.clustered(correlation_matrix)
+                title += f" ({len(correlation_matrix)} most correlated of {len(numeric_cols)} columns, clustered)"
             fig_corr = px.imshow(
                 correlation_matrix,
-                title="Correlation Heatmap",
+                title=title,
                 color_continuous_scale="RdBu",
                 aspect="auto"
             )
             fig_corr.update_layout(height=600)
-            plots['correlation'] = fig_corr
-        
+            return fig_corr
+
+        if len(numeric_cols) > 1:
+            add('correlation', "Correlation Heatmap", correlation_heatmap)
+
         # 3. Distribution plots
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        if len(numeric_cols) > 0:
+        def distributions():
             fig_dist = make_subplots(
-                rows=min(3, len(numeric_cols)), 
+                rows=min(3, len(numeric_cols)),
                 cols=min(2, len(numeric_cols)),
                 subplot_titles=[f"{col} Distribution" for col in numeric_cols[:6]]
             )
-            
+
             for i, col in enumerate(numeric_cols[:6]):
                 row = i // 2 + 1
                 col_pos = i % 2 + 1
-                fig_dist.add_trace(
-                    go.Histogram(x=df[col], name=col, showlegend=False),
-                    row=row, col=col_pos
-                )
-            
+                fig_dist.add_trace(_histogram_trace(data.column(col), col), row=row, col=col_pos)
+
             fig_dist.update_layout(height=800, title_text="Distribution Plots")
-            plots['distributions'] = fig_dist
-        
-        # 4. Box plots for outlier detection
+            return fig_dist
+
         if len(numeric_cols) > 0:
+            add('distributions', "Distribution Plots", distributions)
+
+        # 4. Box plots for outlier detection
+        def boxplots():
             fig_box = go.Figure()
             for col in numeric_cols[:5]:  # Limit to first 5 columns
-                fig_box.add_trace(go.Box(y=df[col], name=col))
+                for trace in _box_traces(data.column(col), col):
+                    fig_box.add_trace(trace)
             fig_box.update_layout(title="Box Plots - Outlier Detection", height=500)
-            plots['boxplots'] = fig_box
-        
+            return fig_box
+
+        if len(numeric_cols) > 0:
+            add('boxplots', "Box Plots - Outlier Detection", boxplots)
+
         # 5. Categorical analysis
-        categorical_cols = df.select_dtypes(include=['object']).columns
-        if len(categorical_cols) > 0:
+        object_cols = data.object_columns()
+
+        def categorical():
             fig_cat = make_subplots(
-                rows=min(2, len(categorical_cols)), 
-                cols=min(2, len(categorical_cols)),
-                subplot_titles=[f"{col} Distribution" for col in categorical_cols[:4]]
+                rows=min(2, len(object_cols)),
+                cols=min(2, len(object_cols)),
+                subplot_titles=[f"{col} Distribution" for col in object_cols[:4]]
             )
-            
-            for i, col in enumerate(categorical_cols[:4]):
-                value_counts = df[col].value_counts().head(10)
+
+            for i, col in enumerate(object_cols[:4]):
+                value_counts = data.value_counts(col).head(10)
                 row = i // 2 + 1
                 col_pos = i % 2 + 1
                 fig_cat.add_trace(
                     go.Bar(x=value_counts.index, y=value_counts.values, name=col, showlegend=False),
                     row=row, col=col_pos
                 )
-            
+
             fig_cat.update_layout(height=600, title_text="Categorical Variables Distribution")
-            plots['categorical'] = fig_cat
-        
+            return fig_cat
+
+        if len(object_cols) > 0:
+            add('categorical', "Categorical Variables Distribution", categorical)
+
         # 6. Pairplot (scatter matrix)
-        numeric_df = df.select_dtypes(include=[np.number])
-        if len(numeric_df.columns) > 1:
-            fig_pair = px.scatter_matrix(numeric_df, title="Pairplot (Scatter Matrix)")
+        def pairplot():
+            sample = data.sample(numeric_cols, PLOT_POINT_BUDGET)
+            title = "Pairplot (Scatter Matrix)"
+            if len(sample) < data.shape[0]:
+                title += f" - {len(sample):,} of {data.shape[0]:,} rows sampled"
+            fig_pair = px.scatter_matrix(sample, title=title)
             fig_pair.update_layout(height=800)
-            plots['pairplot'] = fig_pair
-        
+            return fig_pair
+
+        if len(numeric_cols) > 1:
+            add('pairplot', "Pairplot (Scatter Matrix)", pairplot)
+
         # 7. Violin plots
-        if len(numeric_df.columns) > 0:
+        def violin():
             fig_violin = go.Figure()
-            for col in numeric_df.columns[:5]:
-                fig_violin.add_trace(go.Violin(y=df[col], name=col, box_visible=True, meanline_visible=True))
-            fig_violin.update_layout(title="Violin Plots", height=500)
-            plots['violin'] = fig_violin
-        
+            for position, col in enumerate(numeric_cols[:5]):
+                for trace in _violin_traces(data.column(col), col, position):
+                    fig_violin.add_trace(trace)
+            fig_violin.update_layout(
+                title="Violin Plots", height=500,
+                xaxis=dict(tickvals=list(range(len(numeric_cols[:5]))), ticktext=numeric_cols[:5])
+            )
+            return fig_violin
+
+        if len(numeric_cols) > 0:
+            add('violin', "Violin Plots", violin)
+
         # 8. Pie charts for categorical columns
-        categorical_cols = df.select_dtypes(include=['object','category']).columns
-        for col in categorical_cols[:2]:
-            value_counts = df[col].value_counts().head(6)
-            fig_pie = px.pie(values=value_counts.values, names=value_counts.index, title=f"{col} Proportion")
-            plots[f'pie_{col}'] = fig_pie
-        
+        def pie(col):
+            value_counts = data.value_counts(col).head(6)
+            return px.pie(values=value_counts.values, names=value_counts.index, title=f"{col} Proportion")
+
+        for col in data.categorical_columns()[:2]:
+            add(f'pie_{col}', f"{col} Proportion", lambda col=col: pie(col))
+
         return plots
 
-    def statistical_analysis(self, df):
-        """Return a deep statistical summary including normality, skew, kurtosis, and correlations"""
-        stats_report = []
-        numeric_df = df.select_dtypes(include=[np.number])
-        if not numeric_df.empty:
-            desc = numeric_df.describe().T
-            desc['skew'] = numeric_df.skew()
-            desc['kurtosis'] = numeric_df.kurtosis()
-            stats_report.append("Numeric Variable Summary:")
-            stats_report.append(desc.to_string())
-            # Correlation significance
-            corr = numeric_df.corr()
-            stats_report.append("Correlation Matrix:")
-            stats_report.append(corr.to_string())
-        categorical_df = df.select_dtypes(include=['object','category'])
-        if not categorical_df.empty:
-            stats_report.append("Categorical Variable Summary:")
-            for col in categorical_df.columns:
-                stats_report.append(f"{col}: {categorical_df[col].nunique()} unique values. Top: {categorical_df[col].value_counts().head().to_dict()}")
-        return '\n'.join(stats_report)
\ No newline at end of file
+    def statistical_analysis(self, df, engine="pandas", fingerprint=None):
+        """
+        StatisticalReport of df: count, mean, std, variance, quartiles, min/max, skew, kurtosis and
+        normality tests of the numeric columns, their correlations, and the top values of the text
+        columns (str() gives the text report). With a dataset fingerprint (e.g. an upload's
+        cache key) the report is kept in memory and shared by the callers passing the same one;
+        without one it is computed, hashing every column would cost about as much.
+        """
+        from utils import engines
+        data = engines.frame(df, engine)
+        if fingerprint is None:
+            return self._statistical_report(df, data, engine, None)
+        return stats_report.cached_report(
+            (fingerprint, engine), lambda: self._statistical_report(df, data, engine, fingerprint)
+        )
+
+    def _statistical_report(self, df, data, engine, fingerprint):
+        n_rows = data.shape[0]
+        approx = engine == "pandas" and n_rows >= APPROX_STATS_MIN_ROWS
+        numeric_cols = data.numeric_columns()
+        desc = corr = None
+        if numeric_cols and n_rows > 0:
+            # One pass over all numeric columns: moments from sketches or the vectorized engine
+            desc = _approximate_describe(df[numeric_cols]) if approx else data.describe(numeric_cols)
+            # Same key as the heatmap of create_visualizations: computed once for both
+            corr = correlation.correlation_matrix(data, numeric_cols, fingerprint)
+        categorical = {}
+        if n_rows > 0:
+            for col in data.categorical_columns():
+                if approx:
+                    categorical[col] = {"unique": approximate_nunique(df[col]), "top": approximate_top(df[col], 5)}
+                else:
+                    counts = data.value_counts(col)
+                    categorical[col] = {"unique": len(counts), "top": counts.head().to_dict()}
+        note = approximation_note(n_rows) if approx else None
+        return stats_report.StatisticalReport(n_rows, desc, corr, categorical, note, approx)
\ No newline at end of file
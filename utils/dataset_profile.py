@@ -0,0 +1,135 @@
+"""
+Compact dataset profile for the Gemini insights prompt.
+One line per column: the rounded statistics and normality verdict of the
+dataset's StatisticalReport for numeric columns, the top
+PROFILE_TOP_K values plus an "other" bucket for text columns, the range of
+date columns, and missing counts only where there are any. The text is cut
+to a token budget: columns that do not fit are listed by name, sample rows
+are only added when room is left. Prompt size no longer grows with row
+count or column cardinality.
+"""
+import os
+import numpy as np
+import pandas as pd
+from utils.sketches import (
+    APPROX_STATS_MIN_ROWS,
+    approximate_nunique,
+    approximate_top,
+    approximation_note,
+)
+
+# Prompt budget of the profile (tokens, estimated at about 4 characters per token)
+PROFILE_TOKEN_BUDGET = int(os.getenv("PROFILE_TOKEN_BUDGET", "1500"))
+# Most frequent values listed per text column, the rest is one "other" count
+PROFILE_TOP_K = int(os.getenv("PROFILE_TOP_K", "5"))
+# Rows of sample data included when the budget allows
+PROFILE_SAMPLE_ROWS = 3
+# Longest value (or column name) kept in the profile
+PROFILE_MAX_VALUE_CHARS = 40
+# Cleaning steps listed, and the longest step text kept
+PROFILE_MAX_LOG_LINES = 15
+PROFILE_MAX_LOG_CHARS = 200
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _short(value) -> str:
+    text = str(value)
+    return text if len(text) <= PROFILE_MAX_VALUE_CHARS else text[:PROFILE_MAX_VALUE_CHARS - 3] + "..."
+
+
+def _number(value) -> str:
+    return "nan" if pd.isna(value) else f"{value:.4g}"
+
+
+def _missing(series) -> str:
+    n_missing = int(series.isna().sum())
+    return f"; missing {n_missing:,} ({n_missing / len(series):.1%})" if n_missing else ""
+
+
+def _numeric_line(col, series, stats, normal) -> str:
+    values = ", ".join(
+        f"{name} {_number(stats[name])}" for name in ("mean", "std", "min", "25%", "50%", "75%", "max", "skew", "kurtosis")
+    )
+    if normal is not None:
+        values += ", normal" if normal else ", not normal"
+    return f"- {_short(col)} ({series.dtype}): {values}{_missing(series)}"
+
+
+def _text_line(col, series, approximate) -> str:
+    if approximate:
+        nunique = approximate_nunique(series)
+        top = approximate_top(series, PROFILE_TOP_K)
+    else:
+        counts = series.value_counts()
+        nunique = len(counts)
+        top = counts.head(PROFILE_TOP_K).to_dict()
+    if top and max(top.values()) == 1:
+        # Identifier-like: listing values seen once tells the model nothing
+        return f"- {_short(col)} ({series.dtype}): {nunique:,} distinct, no value repeats{_missing(series)}"
+    other = int(series.count()) - sum(top.values())
+    values = ", ".join(f'"{_short(value)}" {count:,}' for value, count in top.items())
+    if other > 0:
+        values += f", other {other:,}"
+    return f"- {_short(col)} ({series.dtype}): {nunique:,} distinct; top: {values or 'none'}{_missing(series)}"
+
+
+def _datetime_line(col, series) -> str:
+    return f"- {_short(col)} ({series.dtype}): {series.min()} to {series.max()}{_missing(series)}"
+
+
+def column_lines(df, report):
+    """
+    Profile line of each column, in column order (generated, stop early on wide frames);
+    numeric columns are described from report, the StatisticalReport of df
+    """
+    approximate = len(df) >= APPROX_STATS_MIN_ROWS
+    for col in df.columns:
+        series = df[col]
+        if col in report.numeric.index:
+            yield _numeric_line(col, series, report.numeric.loc[col], report.normality.at[col, 'normal'])
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            yield _datetime_line(col, series)
+        else:
+            yield _text_line(col, series, approximate)
+
+
+def _sample_rows(df) -> str:
+    sample = df.head(PROFILE_SAMPLE_ROWS).astype(str).map(_short)
+    sample.columns = [_short(col) for col in sample.columns]
+    return sample.to_csv(index=False)
+
+
+def build_profile(df, cleaning_log, report, token_budget: int = PROFILE_TOKEN_BUDGET) -> str:
+    """Profile text of df (report: its StatisticalReport) and its cleaning steps, at most about token_budget tokens"""
+    n_numeric = df.select_dtypes(include=[np.number]).shape[1]
+    header = [
+        f"Shape: {df.shape[0]:,} rows x {df.shape[1]} columns ({n_numeric} numeric)",
+        f"Missing values: {int(df.isna().sum().sum()):,} in total",
+    ]
+    if len(df) >= APPROX_STATS_MIN_ROWS:
+        header.append(approximation_note(len(df)))
+    steps = [str(step)[:PROFILE_MAX_LOG_CHARS] for step in cleaning_log[:PROFILE_MAX_LOG_LINES]]
+    if len(cleaning_log) > PROFILE_MAX_LOG_LINES:
+        steps.append(f"... {len(cleaning_log) - PROFILE_MAX_LOG_LINES} more steps")
+    text = "\n".join(header + ["Cleaning operations performed:"] + steps + ["Columns:"])
+
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    # A tenth of the budget stays free for the names of the columns that do not fit
+    lines_chars = budget_chars - budget_chars // 10
+    for i, line in enumerate(column_lines(df, report)):
+        if len(text) + len(line) + 1 > lines_chars:
+            omitted = ", ".join(_short(col) for col in df.columns[i:])
+            text += f"\n... {df.shape[1] - i} more columns not profiled: "
+            text += omitted[:max(budget_chars - len(text), 0)]
+            return text
+        text += "\n" + line
+
+    sample = "Sample rows:\n" + _sample_rows(df)
+    if len(text) + len(sample) + 1 <= budget_chars:
+        text += "\n" + sample
+    return text
@@ -0,0 +1,260 @@
+"""
+Duplicate row detection on 64-bit row hashes, plus optional near-duplicate detection.
+Exact mode hashes every row once, column by column with pandas' vectorized hashing,
+and finds repeated hashes with one hash-table pass; the rows flagged as duplicates
+are checked against their first occurrence, so a hash collision can never drop a
+distinct row (the frame then falls back to DataFrame.duplicated()). The same hashes
+answer both the mask and the count.
+Near mode finds rows that differ only in formatting or in a few cells: every cell
+becomes a token (column, normalized value), rows get MinHash signatures of their
+token sets, and locality-sensitive hashing over signature bands proposes candidate
+pairs without comparing all pairs; candidates are kept when the exact Jaccard
+similarity of their tokens reaches the threshold.
+"""
+import os
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+DEDUP_MODES = ("exact", "near")
+# "exact" removes identical rows; "near" also removes rows at least NEAR_DUPLICATE_SIMILARITY
+# similar to an earlier row (in-memory cleaning only, the chunked CSV mode stays exact)
+DEDUP_MODE = os.getenv("DEDUP_MODE", "exact")
+# Jaccard similarity of two rows' (column, normalized value) tokens from which they are near duplicates
+NEAR_DUPLICATE_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_SIMILARITY", "0.8"))
+# MinHash signature length: more permutations, fewer missed and fewer wasted candidates
+MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "64"))
+# Significant digits numbers are rounded to before tokenizing
+NEAR_DUPLICATE_DIGITS = 6
+
+# Rows sampled to decide whether a text column is hashed through its distinct values
+_CARDINALITY_SAMPLE = 10000
+# Token cells handled per block (bounds the permuted copies of the token matrix)
+_BLOCK_VALUES = 1 << 20
+_MAX_HASH = np.iinfo(np.uint64).max
+# Weight of missed pairs against wasted candidates when choosing LSH bands: candidates are
+# verified exactly, so a false positive only costs one comparison
+_FALSE_NEGATIVE_WEIGHT = 0.95
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def check_mode(mode: str) -> str:
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode {mode!r}, expected one of {DEDUP_MODES}")
+    return mode
+
+
+def _mix(values):
+    """splitmix64 finalizer: spreads uint64 values over all 64 bits"""
+    with np.errstate(over="ignore"):
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+
+def _column_hashes(series) -> np.ndarray:
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f':
+        # -0.0 and 0.0 (and every NaN payload) compare equal but differ in their bits
+        values = series.to_numpy()
+        return pd.util.hash_array(np.where(np.isnan(values), np.nan, values + 0.0))
+    # Hashing the distinct values only pays off when values repeat; on mostly-unique text it
+    # triples the cost (factorize, then hash)
+    sample = series.iloc[:_CARDINALITY_SAMPLE]
+    categorize = sample.dtype != object or sample.nunique() < len(sample) // 2
+    return pd.util.hash_pandas_object(series, index=False, categorize=categorize).to_numpy()
+
+
+def row_hashes(df) -> np.ndarray:
+    """uint64 hash of every row of df (index ignored); equal rows hash equal"""
+    hashes = np.zeros(len(df), dtype=np.uint64)
+    for col in df.columns:
+        hashes = _mix(hashes ^ _column_hashes(df[col]))
+    return hashes
+
+
+def _first_occurrence(hashes):
+    """(duplicated mask, index of each row's first occurrence) of a hash array"""
+    codes, _ = pd.factorize(hashes)
+    # Codes are numbered in order of first appearance: a row is new when its code exceeds every earlier one
+    seen = np.maximum.accumulate(codes)
+    new = np.empty(len(codes), dtype=bool)
+    new[:1] = True
+    new[1:] = codes[1:] > seen[:-1]
+    return ~new, np.flatnonzero(new)[codes]
+
+
+def _rows_equal(df, rows, other_rows) -> bool:
+    for col in df.columns:
+        values = df[col].to_numpy()
+        a, b = values[rows], values[other_rows]
+        equal = (a == b) | (pd.isna(a) & pd.isna(b))
+        if not np.all(equal):
+            return False
+    return True
+
+
+def duplicated(df, hashes=None) -> np.ndarray:
+    """DataFrame.duplicated() (first occurrence kept) as a boolean array, from row hashes"""
+    if df.shape[1] == 0:
+        # DataFrame.duplicated() of no columns is empty; rows without values are all kept
+        return np.zeros(len(df), dtype=bool)
+    mask, first = _first_occurrence(row_hashes(df) if hashes is None else hashes)
+    rows = np.flatnonzero(mask)
+    if len(rows) and not _rows_equal(df, rows, first[rows]):
+        # A hash collision (or values that only hash alike): compare the rows themselves
+        return df.duplicated().to_numpy()
+    return mask
+
+
+def count_duplicates(df, hashes=None) -> int:
+    return int(duplicated(df, hashes).sum())
+
+
+def _normalize_text(text: str) -> str:
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", text.lower())).strip()
+
+
+def _column_tokens(series):
+    """(uint64 token hashes, present mask) of one column's normalized values"""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        present = ~np.isnan(values)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            magnitude = np.floor(np.log10(np.abs(values)))
+            scale = 10.0 ** (NEAR_DUPLICATE_DIGITS - 1 - np.where(np.isfinite(magnitude), magnitude, 0))
+            rounded = np.round(values * scale) / scale + 0.0
+        return pd.util.hash_array(np.where(present, rounded, 0.0)), present
+    # Text, categories, dates, booleans: normalize the distinct values only
+    codes, uniques = pd.factorize(series)
+    normalized = pd.Index([_normalize_text(str(value)) for value in uniques], dtype=object)
+    hashes = pd.util.hash_array(normalized.to_numpy())
+    present = codes >= 0
+    present[present] = normalized.to_numpy()[codes[present]] != ""
+    return np.where(present, hashes[np.maximum(codes, 0)], np.uint64(0)), present
+
+
+def row_tokens(df):
+    """(n_rows x n_columns uint64 tokens, present mask): one (column, normalized value) token per cell"""
+    tokens = np.empty(df.shape, dtype=np.uint64)
+    present = np.empty(df.shape, dtype=bool)
+    for i, col in enumerate(df.columns):
+        hashes, present[:, i] = _column_tokens(df[col])
+        # The column position salts the value, equal values of different columns are different tokens
+        tokens[:, i] = _mix(hashes ^ _mix(np.uint64(i + 1)))
+    return tokens, present
+
+
+def minhash_signatures(tokens, present, num_perm=MINHASH_PERMUTATIONS, seed=0) -> np.ndarray:
+    """n_rows x num_perm MinHash signatures of the token sets (universal hashes a*x + b mod 2**64)"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MAX_HASH, num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, _MAX_HASH, num_perm, dtype=np.uint64, endpoint=True)
+    # An absent cell repeats a present token of its row: the set, and so its minimum, is unchanged.
+    # Column-major, each permutation is a minimum across a few contiguous rows
+    first = tokens[np.arange(len(tokens)), present.argmax(axis=1)]
+    columns = np.ascontiguousarray(np.where(present, tokens, first[:, None]).T)
+    signatures = np.empty((num_perm, len(tokens)), dtype=np.uint64)
+    block_rows = max(_BLOCK_VALUES // max(tokens.shape[1], 1), 1)
+    for start in range(0, len(tokens), block_rows):
+        block = columns[:, start:start + block_rows]
+        for i in range(num_perm):
+            with np.errstate(over="ignore"):
+                signatures[i, start:start + block_rows] = (block * a[i] + b[i]).min(axis=0)
+    return signatures.T
+
+
+@lru_cache(maxsize=None)
+def lsh_bands(threshold: float, num_perm: int) -> tuple:
+    """
+    (bands, rows per band) with bands * rows <= num_perm minimizing the weighted false positive
+    and false negative probability mass around threshold (pairs collide with probability 1 - (1 - s**r)**b)
+    """
+    best, best_error = (1, num_perm), np.inf
+    below = np.linspace(0.0, threshold, 101)
+    above = np.linspace(threshold, 1.0, 101)
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_positive = np.mean(1 - (1 - below ** rows) ** bands) * threshold
+            false_negative = np.mean((1 - above ** rows) ** bands) * (1 - threshold)
+            error = (1 - _FALSE_NEGATIVE_WEIGHT) * false_positive + _FALSE_NEGATIVE_WEIGHT * false_negative
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+def _candidate_pairs(signatures, valid, bands, band_rows):
+    """(earlier, later) row pairs sharing a band: each row with the first and the previous row of its bucket"""
+    pairs = []
+    for band in range(bands):
+        key = np.zeros(len(signatures), dtype=np.uint64)
+        for column in signatures[:, band * band_rows:(band + 1) * band_rows].T:
+            key = _mix(key ^ column)
+        codes, uniques = pd.factorize(key)
+        # Only rows of buckets with more than one row are sorted
+        shared = np.bincount(codes[valid], minlength=len(uniques)) > 1
+        members = np.flatnonzero(valid & shared[codes])
+        if len(members) == 0:
+            continue
+        members = members[np.argsort(codes[members], kind="stable")]
+        member_codes = codes[members]
+        starts = np.empty(len(members), dtype=bool)
+        starts[0] = True
+        starts[1:] = member_codes[1:] != member_codes[:-1]
+        bucket_first = members[np.maximum.accumulate(np.where(starts, np.arange(len(members)), 0))]
+        later = np.flatnonzero(~starts)
+        pairs.append(np.stack([bucket_first[later], members[later]]))
+        pairs.append(np.stack([members[later - 1], members[later]]))
+    if not pairs:
+        return np.empty((2, 0), dtype=np.intp)
+    pairs = np.concatenate(pairs, axis=1)
+    return np.unique(pairs[:, pairs[0] != pairs[1]], axis=1)
+
+
+def _jaccard(tokens, present, left, right) -> np.ndarray:
+    shared = ((tokens[left] == tokens[right]) & present[left] & present[right]).sum(axis=1)
+    union = present[left].sum(axis=1) + present[right].sum(axis=1) - shared
+    return shared / np.maximum(union, 1)
+
+
+def near_duplicated(df, threshold=NEAR_DUPLICATE_SIMILARITY, num_perm=MINHASH_PERMUTATIONS, removed=None) -> np.ndarray:
+    """
+    Boolean array of the rows at least threshold-similar (Jaccard of their (column, normalized
+    value) tokens) to an earlier kept row found by MinHash LSH. A row only counts as a match while
+    it is kept itself, so removal does not chain (a ~ b ~ c with a and c apart keeps a and c).
+    removed marks rows already dropped (exact duplicates), they are neither compared nor flagged.
+    Identical rows are not guaranteed to be flagged (their bucket may hold other rows too):
+    combine with duplicated() for those.
+    """
+    mask = np.zeros(len(df), dtype=bool)
+    if len(df) < 2 or df.shape[1] == 0:
+        return mask
+    tokens, present = row_tokens(df)
+    signatures = minhash_signatures(tokens, present, num_perm)
+    bands, band_rows = lsh_bands(threshold, num_perm)
+    candidates = present.any(axis=1)
+    if removed is not None:
+        candidates &= ~removed
+    pairs = _candidate_pairs(signatures, candidates, bands, band_rows)
+    block = max(_BLOCK_VALUES // max(df.shape[1], 1), 1)
+    similar = []
+    for start in range(0, pairs.shape[1], block):
+        block_pairs = pairs[:, start:start + block]
+        similar.append(block_pairs[:, _jaccard(tokens, present, *block_pairs) >= threshold])
+    if not similar:
+        return mask
+    left, right = np.concatenate(similar, axis=1)
+    # A row similar to a row that matches nothing earlier (so is kept) goes at once
+    matched = np.zeros(len(df), dtype=bool)
+    matched[right] = True
+    mask[right[~matched[left]]] = True
+    # The others in row order, so every earlier row is decided before a later one looks at it
+    pending = ~mask[right]
+    left, right = left[pending], right[pending]
+    order = np.argsort(right, kind="stable")
+    left, right = left[order], right[order]
+    starts = np.flatnonzero(np.r_[True, right[1:] != right[:-1]])[:len(right)]
+    for row, matches in zip(right[starts], np.split(left, starts[1:])):
+        mask[row] = not mask[matches].all()
+    return mask
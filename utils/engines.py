@@ -0,0 +1,339 @@
+"""
+Dataframe backends for DataAnalyzer.
+"pandas" runs everything eagerly on pandas; "polars" runs deep_clean_data as a
+Polars LazyFrame query (optimized, multithreaded) and computes the summaries
+and plot aggregations in Polars, converting to pandas/numpy only at the
+plotting edge.
+"""
+import hashlib
+import numpy as np
+import pandas as pd
+
+try:
+    import polars as pl
+except ImportError:  # only the pandas engine is available
+    pl = None
+
+from utils import correlation, dedup, stats_report
+from utils.cleaning_ops import CATEGORICAL_VALUE_MAPPING, guess_date_format
+
+ENGINES = ("pandas", "polars")
+
+
+def check_engine(engine: str) -> str:
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if engine == "polars" and pl is None:
+        raise ImportError("The polars engine needs the polars package (pip install polars)")
+    return engine
+
+
+def to_polars(df) -> "pl.DataFrame":
+    """pandas -> Polars; mixed object columns are stringified first (as deep_clean_data does)"""
+    if isinstance(df, pl.LazyFrame):
+        return df.collect()
+    if isinstance(df, pl.DataFrame):
+        return df
+    mixed = [
+        col for col in df.select_dtypes(include=['object']).columns
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty')
+    ]
+    if mixed:
+        df = df.copy()
+        for col in mixed:
+            mask = df[col].notna()
+            df[col] = df[col].where(~mask, df[col][mask].astype(str))
+    frame = pl.from_pandas(df)
+    # All-null object columns come in as the Null type
+    return frame.with_columns([pl.col(col).cast(pl.String) for col, dtype in frame.schema.items() if dtype == pl.Null])
+
+
+def frame(df, engine: str = "pandas"):
+    """Engine-specific summaries of a frame"""
+    if check_engine(engine) == "polars":
+        return PolarsFrame(to_polars(df))
+    return PandasFrame(df.to_pandas() if pl is not None and isinstance(df, pl.DataFrame) else df)
+
+
+class PandasFrame:
+    def __init__(self, df):
+        self.df = df
+
+    @property
+    def shape(self):
+        return self.df.shape
+
+    def fingerprint(self, cols=None) -> str:
+        df = self.df if cols is None else self.df[cols]
+        digest = hashlib.sha1(repr((list(df.columns), [str(dtype) for dtype in df.dtypes])).encode())
+        if len(df.columns):
+            digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def dtype_counts(self):
+        return self.df.dtypes.value_counts()
+
+    def numeric_columns(self):
+        return list(self.df.select_dtypes(include=[np.number]).columns)
+
+    def object_columns(self):
+        # Text stored as string or category by optimize_memory counts as text too
+        return list(self.df.select_dtypes(include=['object', 'string', 'category']).columns)
+
+    def categorical_columns(self):
+        return list(self.df.select_dtypes(include=['object', 'string', 'category']).columns)
+
+    def column(self, col):
+        return self.df[col]
+
+    def sample(self, cols, n):
+        """Seeded uniform sample of at most n rows as pandas"""
+        if len(self.df) <= n:
+            return self.df[cols]
+        return self.df[cols].sample(n=n, random_state=0)
+
+    def corr(self, cols):
+        values = self.df[cols].to_numpy(dtype=float, na_value=np.nan)
+        return pd.DataFrame(correlation.pearson(values), index=cols, columns=cols)
+
+    def value_counts(self, col):
+        return self.df[col].value_counts()
+
+    def nunique(self, col):
+        return self.df[col].nunique()
+
+    def describe(self, cols):
+        values = self.df[cols].to_numpy(dtype=float, na_value=np.nan)
+        return stats_report.moments_table(values, cols)
+
+
+class PolarsFrame:
+    def __init__(self, df):
+        self.df = df
+
+    @property
+    def shape(self):
+        return self.df.shape
+
+    def fingerprint(self, cols=None) -> str:
+        df = self.df if cols is None else self.df.select(cols)
+        digest = hashlib.sha1(repr((df.columns, [str(dtype) for dtype in df.dtypes])).encode())
+        if df.width:
+            digest.update(df.hash_rows(seed=0).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def dtype_counts(self):
+        return pd.Series([str(dtype) for dtype in self.df.dtypes]).value_counts()
+
+    def numeric_columns(self):
+        return [col for col, dtype in self.df.schema.items() if dtype.is_numeric()]
+
+    def object_columns(self):
+        return [col for col, dtype in self.df.schema.items() if dtype == pl.String]
+
+    def categorical_columns(self):
+        return [col for col, dtype in self.df.schema.items() if dtype in (pl.String, pl.Categorical, pl.Enum)]
+
+    def column(self, col):
+        return self.df[col].to_numpy()
+
+    def sample(self, cols, n):
+        selected = self.df.select(cols)
+        if selected.height > n:
+            selected = selected.sample(n, seed=0)
+        return selected.to_pandas()
+
+    def corr(self, cols):
+        values = self.df.select([pl.col(col).cast(pl.Float64) for col in cols]).to_numpy()
+        return pd.DataFrame(correlation.pearson(values), index=cols, columns=cols)
+
+    def value_counts(self, col):
+        counts = self.df[col].drop_nulls().value_counts(sort=True)
+        return pd.Series(counts["count"].to_numpy(), index=counts[col].to_list(), name="count")
+
+    def nunique(self, col):
+        return self.df[col].drop_nulls().n_unique()
+
+    def describe(self, cols):
+        stats = {
+            'count': lambda c: c.count().cast(pl.Float64),
+            'mean': lambda c: c.mean(),
+            'std': lambda c: c.std(),
+            'var': lambda c: c.var(),
+            'min': lambda c: c.min().cast(pl.Float64),
+            '25%': lambda c: c.quantile(0.25, "linear"),
+            '50%': lambda c: c.quantile(0.5, "linear"),
+            '75%': lambda c: c.quantile(0.75, "linear"),
+            'max': lambda c: c.max().cast(pl.Float64),
+            'skew': lambda c: c.skew(bias=False),
+            'kurtosis': lambda c: c.kurtosis(fisher=True, bias=False),
+        }
+        row = self.df.select([
+            fn(pl.col(col)).alias(f"{name}:{i}") for i, col in enumerate(cols) for name, fn in stats.items()
+        ]).row(0)
+        values = np.array(row, dtype=float).reshape(len(cols), len(stats))
+        return pd.DataFrame(values, index=cols, columns=list(stats))
+
+
+def polars_deep_clean(df, timed_step, dedup_mode="exact"):
+    """
+    deep_clean_data as a Polars LazyFrame query, collected only where a decision needs
+    column statistics. Returns (pl.DataFrame, cleaning_log).
+    Same steps and log as the pandas engine; dates are parsed by Polars and date gaps
+    are filled with the column's own mode. Near duplicates (dedup_mode="near") are found
+    by utils.dedup on a pandas copy of the deduplicated rows.
+    """
+    data = to_polars(df)
+    cleaning_log = [f"Initial dataset shape: {data.shape}"]
+    lf = data.lazy()
+    n_rows = data.height
+    text_cols = [col for col, dtype in data.schema.items() if dtype == pl.String]
+    numeric_cols = [col for col, dtype in data.schema.items() if dtype.is_numeric()]
+
+    # 1. Date candidates from the first 10 non-null values
+    with timed_step("detect_dates"):
+        candidates = {}
+        if text_cols:
+            samples = lf.select([pl.col(col).drop_nulls().head(10).implode() for col in text_cols]).collect()
+            for col in text_cols:
+                sample = samples[col][0]
+                if len(sample) > 0:
+                    parsed_sample = sample.str.to_datetime('%Y-%m-%d', strict=False)
+                    if parsed_sample.is_not_null().sum() > len(sample) * 0.7:
+                        candidates[col] = guess_date_format(sample.to_pandas())
+
+    # 2. Parse dates
+    with timed_step("parse_dates"):
+        date_exprs = {}
+        for col, date_format in candidates.items():
+            try:
+                expr = pl.col(col).str.to_datetime(date_format, strict=False)
+                valid_dates = lf.select(expr.is_not_null().sum()).collect().item()
+            except Exception:
+                continue
+            if valid_dates > 0 and valid_dates > 0.3 * n_rows:
+                date_exprs[col] = expr
+        date_cols = list(date_exprs)
+        if date_cols:
+            cleaning_log.append(f"Parsed date columns: {date_cols}")
+
+    # 3-4. Normalize strings and common categorical values
+    with timed_step("normalize_strings"):
+        string_cols = [col for col in text_cols if col not in date_cols]
+        mapping = {key: value for key, value in CATEGORICAL_VALUE_MAPPING.items() if isinstance(value, str)}
+        null_values = ['nan'] + [key for key, value in CATEGORICAL_VALUE_MAPPING.items() if not isinstance(value, str)]
+        string_exprs = []
+        for col in string_cols:
+            normalized = (pl.col(col).str.strip_chars().str.to_lowercase()
+                          .str.replace_all(r'[^\w\s]+', ''))
+            string_exprs.append(
+                pl.when(normalized.is_in(null_values)).then(None).otherwise(normalized.replace(mapping)).alias(col)
+            )
+        lf = lf.with_columns([expr.alias(col) for col, expr in date_exprs.items()] + string_exprs)
+        cleaning_log.append(f"Normalized string columns (excluding dates): {string_cols}")
+        cleaning_log.append("Standardized common categorical values (yes/no, nan)")
+
+    # 5. Remove columns with >50% missing or only 1 unique value
+    with timed_step("drop_columns"):
+        # Materialize the normalized text once, every later decision reads it
+        data = lf.collect()
+        lf = data.lazy()
+        columns = data.columns
+        # A select of no columns has no row to read
+        stats = lf.select(
+            [pl.col(col).null_count().alias(f"nulls:{i}") for i, col in enumerate(columns)]
+            + [pl.col(col).drop_nulls().n_unique().alias(f"unique:{i}") for i, col in enumerate(columns)]
+        ).collect().row(0) if columns else ()
+        cols_to_drop = [
+            col for i, col in enumerate(columns)
+            if (n_rows and stats[i] / n_rows > 0.5) or stats[len(columns) + i] <= 1
+        ]
+        if cols_to_drop:
+            lf = lf.drop(cols_to_drop)
+            cleaning_log.append(f"Dropped columns with >50% missing or ≤1 unique value: {cols_to_drop}")
+
+    # 6. Remove duplicate rows
+    with timed_step("drop_duplicates"):
+        data = lf.collect()
+        # Rows of no columns are not duplicates of each other in pandas, unique() would keep one
+        if data.width > 0 and data.height > 0:
+            data = data.unique(keep="first", maintain_order=True)
+        duplicates = n_rows - data.height
+        if duplicates > 0:
+            cleaning_log.append(f"Removed {duplicates} duplicate rows")
+        if dedup_mode == "near" and data.width > 0 and data.height > 0:
+            near = dedup.near_duplicated(data.to_pandas())
+            if near.any():
+                data = data.filter(pl.Series(~near))
+                cleaning_log.append(f"Removed {near.sum()} near-duplicate rows "
+                                    f"(similarity ≥ {dedup.NEAR_DUPLICATE_SIMILARITY})")
+        lf = data.lazy()
+
+    # 7. Handle missing values: median for numbers, mode for text and dates
+    with timed_step("impute_missing"):
+        missing_before = sum(data.null_count().row(0))
+        if missing_before > 0:
+            fills = []
+            for col, dtype in data.schema.items():
+                if data[col].null_count() == 0:
+                    continue
+                if dtype.is_numeric():
+                    fills.append(pl.col(col).fill_null(pl.col(col).median()))
+                elif dtype == pl.String or dtype.is_temporal():
+                    mode = pl.col(col).drop_nulls().mode().sort().first()
+                    fill_value = mode if dtype != pl.String else pl.coalesce(mode, pl.lit('unknown'))
+                    fills.append(pl.col(col).fill_null(fill_value))
+            lf = lf.with_columns(fills)
+            cleaning_log.append(f"Handled {missing_before} missing values")
+
+    # 8. Outlier capping (IQR)
+    with timed_step("cap_outliers"):
+        numeric_cols = [col for col in numeric_cols if col in data.columns]
+        outliers_capped = 0
+        if numeric_cols:
+            quartiles = lf.select(
+                [pl.col(col).quantile(0.25, "linear").alias(f"q1:{i}") for i, col in enumerate(numeric_cols)]
+                + [pl.col(col).quantile(0.75, "linear").alias(f"q3:{i}") for i, col in enumerate(numeric_cols)]
+                + [pl.col(col).drop_nulls().n_unique().alias(f"unique:{i}") for i, col in enumerate(numeric_cols)]
+            ).collect().row(0)
+            bounds = {}
+            for i, col in enumerate(numeric_cols):
+                Q1, Q3, unique_count = quartiles[i], quartiles[len(numeric_cols) + i], quartiles[2 * len(numeric_cols) + i]
+                if unique_count <= 1 or Q1 is None:
+                    continue
+                IQR = Q3 - Q1
+                if IQR > 0:
+                    bounds[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+            if bounds:
+                counts = lf.select([
+                    ((pl.col(col) < lower) | (pl.col(col) > upper)).sum().alias(col)
+                    for col, (lower, upper) in bounds.items()
+                ]).collect().row(0, named=True)
+                outliers_capped = sum(counts.values())
+                # Like pandas, integer columns only turn into floats when a value is actually capped
+                lf = lf.with_columns([
+                    pl.col(col).cast(pl.Float64).clip(lower, upper)
+                    for col, (lower, upper) in bounds.items() if counts[col] > 0
+                ])
+        if outliers_capped > 0:
+            cleaning_log.append(f"Capped {outliers_capped} outliers using IQR method")
+
+    # 9. Label-encode text columns with <20 unique values
+    with timed_step("encode_categoricals"):
+        string_cols = [col for col in string_cols if col in data.columns]
+        categorical_cols_encoded = []
+        if string_cols:
+            unique_counts = lf.select([pl.col(col).drop_nulls().n_unique() for col in string_cols]).collect().row(0)
+            categorical_cols_encoded = [
+                col for col, unique_count in zip(string_cols, unique_counts) if 1 < unique_count < 20
+            ]
+            # Dense rank over the sorted values gives the same codes as pandas' sorted categories
+            lf = lf.with_columns([
+                (pl.col(col).rank("dense") - 1).cast(pl.Int8) for col in categorical_cols_encoded
+            ])
+        data = lf.collect()
+        if categorical_cols_encoded:
+            cleaning_log.append(f"Encoded categorical columns with <20 unique values: {categorical_cols_encoded}")
+
+    cleaning_log.append(f"Final dataset shape: {data.shape}")
+    return data, cleaning_log
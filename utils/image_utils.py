@@ -0,0 +1,94 @@
+import os
+import io
+import base64
+from PIL import Image
+
+# Longest side (in pixels) of the image sent to the vision model
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1024"))
+# JPEG quality used when recompressing the image before upload
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Max Hamming distance between two perceptual hashes to treat images as the same
+IMAGE_PHASH_MAX_DISTANCE = int(os.getenv("IMAGE_PHASH_MAX_DISTANCE", "6"))
+# Max number of past images kept in the perceptual-hash index
+IMAGE_PHASH_INDEX_SIZE = int(os.getenv("IMAGE_PHASH_INDEX_SIZE", "5000"))
+
+PHASH_INDEX_KEY = "image_phash_index"
+
+
+def decode_image(image_base64: str) -> Image.Image:
+    """Decode a base64 string into a PIL image."""
+    image = Image.open(io.BytesIO(base64.b64decode(image_base64)))
+    image.load()
+    return image
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Difference hash (dHash) of an image as a 64-bit integer.
+    Re-saved, re-compressed or slightly resized copies of an image map to
+    hashes that differ in only a few bits.
+    """
+    gray = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(gray.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def find_similar_image(cache, phash: int, max_distance: int = IMAGE_PHASH_MAX_DISTANCE):
+    """
+    Return the cache key of the closest previously described image whose
+    perceptual hash is within max_distance bits, or None.
+    """
+    best_key, best_distance = None, max_distance + 1
+    for known_hash, image_key in cache.get(PHASH_INDEX_KEY, []):
+        distance = hamming_distance(phash, known_hash)
+        if distance < best_distance and image_key in cache:
+            best_key, best_distance = image_key, distance
+            if distance == 0:
+                break
+    return best_key
+
+
+def add_to_phash_index(cache, phash: int, image_key: str):
+    """Register a described image in the perceptual-hash index (bounded, oldest dropped first)."""
+    # One transaction: concurrent workers would otherwise drop each other's entries
+    with cache.transact():
+        index = cache.get(PHASH_INDEX_KEY, [])
+        index.append((phash, image_key))
+        cache[PHASH_INDEX_KEY] = index[-IMAGE_PHASH_INDEX_SIZE:]
+
+
+def prepare_image_for_upload(image: Image.Image, image_base64: str, image_type: str,
+                             max_side: int = IMAGE_MAX_SIDE, quality: int = IMAGE_JPEG_QUALITY):
+    """
+    Downscale the image so its longest side is at most max_side and recompress it as JPEG.
+    Returns (base64, mime type); falls back to the original payload if that is already smaller.
+    """
+    resized = image
+    if max(image.size) > max_side:
+        resized = image.copy()
+        resized.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    # JPEG has no alpha channel, flatten transparent images onto white
+    if resized.mode in ("RGBA", "LA", "P"):
+        rgba = resized.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[-1])
+        resized = background
+    elif resized.mode != "RGB":
+        resized = resized.convert("RGB")
+
+    buffer = io.BytesIO()
+    resized.save(buffer, format="JPEG", quality=quality, optimize=True)
+    encoded = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    if len(encoded) >= len(image_base64) and max(image.size) <= max_side:
+        return image_base64, image_type
+    return encoded, "image/jpeg"
@@ -0,0 +1,206 @@
+"""
+Incremental re-analysis of growing CSV files (the same daily export uploaded again
+with rows appended).
+Every CSV cleaned through clean_csv leaves an entry under INCREMENTAL_DIR: the
+content hashes of its leading blocks, the streaming cleaning state (parameters,
+totals, duplicate row hashes, running statistics) and the cleaned CSV. A later
+upload whose leading bytes are exactly an earlier file is a prefix-extension:
+only the bytes past the old end are parsed and cleaned with the stored
+parameters, and the running statistics are updated with the new rows instead
+of being recomputed.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import pickle
+import hashlib
+import logging
+
+INCREMENTAL_DIR = os.getenv("INCREMENTAL_DIR", "./.cache/incremental")
+# Size of the hashed blocks; a file extends an entry when all of the entry's blocks match
+INCREMENTAL_BLOCK_BYTES = 1 << 20
+# Refit from scratch when the file has grown past this multiple of the analyzed size:
+# parameters fitted on under half the rows no longer describe the data
+INCREMENTAL_MAX_GROWTH = float(os.getenv("INCREMENTAL_MAX_GROWTH", "2.0"))
+# Entries kept (and their total size: each holds a cleaned CSV), the oldest ones are removed
+INCREMENTAL_MAX_ENTRIES = int(os.getenv("INCREMENTAL_MAX_ENTRIES", "20"))
+INCREMENTAL_MAX_BYTES = int(float(os.getenv("INCREMENTAL_MAX_MB", "4096")) * 1024 * 1024)
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def block_hashes(path, block_bytes=INCREMENTAL_BLOCK_BYTES) -> list:
+    """blake2b of each block_bytes block of a file, the last one may be shorter"""
+    hashes = []
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_bytes), b""):
+            hashes.append(_digest(block))
+    return hashes
+
+
+def _entries():
+    if not os.path.isdir(INCREMENTAL_DIR):
+        return []
+    entries = []
+    for name in os.listdir(INCREMENTAL_DIR):
+        meta_path = os.path.join(INCREMENTAL_DIR, name, "meta.json")
+        if not name.startswith(".") and os.path.exists(meta_path):
+            entries.append((os.path.getmtime(meta_path), name))
+    return [name for _, name in sorted(entries, reverse=True)]
+
+
+def _load_meta(entry: str) -> dict:
+    with open(os.path.join(INCREMENTAL_DIR, entry, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_prefix(path, hashes: list, csv_args: dict):
+    """
+    (entry, meta) of the most recent entry whose file is a prefix of path (or path itself),
+    ending on a line break and read with the same CSV arguments; None when there is none
+    """
+    size = os.path.getsize(path)
+    for entry in _entries():
+        try:
+            meta = _load_meta(entry)
+        except (OSError, ValueError):
+            continue
+        old_hashes = meta["block_hashes"]
+        if not old_hashes or not meta["ends_with_newline"] or meta["csv_args"] != csv_args:
+            continue
+        if not meta["size"] <= size <= meta["size"] * INCREMENTAL_MAX_GROWTH:
+            continue
+        full_blocks = meta["size"] // INCREMENTAL_BLOCK_BYTES
+        if hashes[:full_blocks] != old_hashes[:full_blocks]:
+            continue
+        if len(old_hashes) > full_blocks:
+            # The entry's last block is partial: compare it with the same byte range of path
+            with open(path, "rb") as f:
+                f.seek(full_blocks * INCREMENTAL_BLOCK_BYTES)
+                if _digest(f.read(meta["size"] - full_blocks * INCREMENTAL_BLOCK_BYTES)) != old_hashes[-1]:
+                    continue
+        return entry, meta
+    return None
+
+
+def _ends_with_newline(path) -> bool:
+    with open(path, "rb") as f:
+        f.seek(max(os.path.getsize(path) - 1, 0))
+        return f.read(1) == b"\n"
+
+
+def _save(entry_dir: str, path, hashes: list, csv_args: dict, state: dict):
+    with open(os.path.join(entry_dir, "state.pkl"), "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    meta = {
+        "size": os.path.getsize(path),
+        "block_hashes": hashes,
+        "ends_with_newline": _ends_with_newline(path),
+        "csv_args": csv_args,
+        "rows": state["totals"]["input_rows"],
+        "created": time.time(),
+    }
+    with open(os.path.join(entry_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def _entry_bytes(entry: str) -> int:
+    try:
+        return sum(item.stat().st_size for item in os.scandir(os.path.join(INCREMENTAL_DIR, entry)) if item.is_file())
+    except OSError:
+        return 0
+
+
+def _prune():
+    total = 0
+    for i, entry in enumerate(_entries()):
+        total += _entry_bytes(entry)
+        # The newest entry is kept whatever its size
+        if i > 0 and (i >= INCREMENTAL_MAX_ENTRIES or total > INCREMENTAL_MAX_BYTES):
+            shutil.rmtree(os.path.join(INCREMENTAL_DIR, entry), ignore_errors=True)
+
+
+def clean_csv(analyzer, path, csv_args: dict = None) -> dict:
+    """
+    Clean a CSV with the streaming cleaner, or only its appended rows when it extends a
+    file cleaned before. Returns {"cleaned_path", "cleaning_log", "statistics", "extended",
+    "unchanged", "new_rows", "totals"}; statistics is the StatisticalReport of the running
+    statistics of every row, totals the streaming cleaning totals, unchanged is True (and
+    extended False) when the file was cleaned before as is.
+    Entries are written to a temporary directory and moved in place, an extension copies
+    the previous cleaned CSV first so the entry of the shorter file stays valid.
+    """
+    csv_args = dict(csv_args or {})
+    hashes = block_hashes(path)
+    match = None if csv_args.get("encoding", "").startswith("utf-16") else find_prefix(path, hashes, csv_args)
+    if match is not None and match[1]["size"] == os.path.getsize(path):
+        # Same file again: nothing to clean
+        entry_dir = os.path.join(INCREMENTAL_DIR, match[0])
+        try:
+            with open(os.path.join(entry_dir, "state.pkl"), "rb") as f:
+                state = pickle.load(f)
+            if "input_missing" not in state["totals"]:
+                # Entry written before the raw missing values were counted
+                raise KeyError("input_missing")
+            return {
+                "cleaned_path": os.path.join(entry_dir, "cleaned.csv"),
+                "cleaning_log": analyzer.stream_cleaning_log(state),
+                "statistics": analyzer.stream_statistics(state),
+                "extended": False,
+                "unchanged": True,
+                "new_rows": 0,
+                "totals": state["totals"],
+            }
+        except (OSError, KeyError, pickle.UnpicklingError) as e:
+            logger.warning("Ignoring unreadable incremental entry %s: %s", match[0], e)
+            match = None
+    os.makedirs(INCREMENTAL_DIR, exist_ok=True)
+    entry_dir = os.path.join(INCREMENTAL_DIR, f".{uuid.uuid4().hex}")
+    os.makedirs(entry_dir)
+    cleaned_path = os.path.join(entry_dir, "cleaned.csv")
+    try:
+        state = None
+        rows_before = 0
+        if match is not None:
+            entry, meta = match
+            old_dir = os.path.join(INCREMENTAL_DIR, entry)
+            try:
+                with open(os.path.join(old_dir, "state.pkl"), "rb") as f:
+                    state = pickle.load(f)
+                shutil.copyfile(os.path.join(old_dir, "cleaned.csv"), cleaned_path)
+                rows_before = state["totals"]["input_rows"]
+                with open(path, "rb") as f:
+                    f.seek(meta["size"])
+                    cleaning_log = analyzer.extend_clean_csv(f, cleaned_path, state)
+                logger.info("Cleaned %d appended rows of %s incrementally", state["totals"]["input_rows"] - rows_before, path)
+            except (OSError, ValueError, TypeError, KeyError, pickle.UnpicklingError) as e:
+                # New rows the stored parameters cannot clean (e.g. text in a numeric column)
+                logger.warning("Incremental clean of %s not possible, cleaning it fully: %s", path, e)
+                state = None
+                rows_before = 0
+        extended = state is not None
+        if state is None:
+            state = {}
+            _, cleaning_log = analyzer.deep_clean_csv(path, cleaned_path, csv_args=csv_args, state=state)
+        _save(entry_dir, path, hashes, csv_args, state)
+        final_dir = os.path.join(INCREMENTAL_DIR, uuid.uuid4().hex)
+        os.replace(entry_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        raise
+    _prune()
+    return {
+        "cleaned_path": os.path.join(final_dir, "cleaned.csv"),
+        "cleaning_log": cleaning_log,
+        "statistics": analyzer.stream_statistics(state),
+        "extended": extended,
+        "unchanged": False,
+        "new_rows": state["totals"]["input_rows"] - rows_before,
+        "totals": state["totals"],
+    }
@@ -0,0 +1,209 @@
+import os
+import time
+import random
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import httpx
+from utils.metrics import LLM_REQUEST_SECONDS
+from utils.profiling import span
+
+# Default deadline (seconds) for one logical LLM call, retries and hedges included
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+# Max retries of a failed upstream call (jittered exponential backoff)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_S = float(os.getenv("LLM_RETRY_BASE_S", "0.5"))
+# Max concurrent upstream requests per model
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Send a duplicate request when the first has not answered by the model's p95 latency
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded",
+}
+
+# One keep-alive connection pool shared by every Groq client
+_HTTP_CLIENT = httpx.Client(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60),
+    timeout=httpx.Timeout(LLM_TIMEOUT_S, connect=10.0),
+)
+_EXECUTOR = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-gateway")
+
+_lock = threading.Lock()
+_clients = {}
+_semaphores = {}
+_latencies = {}
+
+
+class LLMTimeoutError(TimeoutError):
+    """Raised when an LLM call does not finish before its deadline."""
+
+
+def get_groq_client():
+    """Long-lived Groq SDK client on the shared connection pool."""
+    with _lock:
+        if "groq" not in _clients:
+            from groq import Groq
+            # Retries and timeouts are handled by call()
+            _clients["groq"] = Groq(http_client=_HTTP_CLIENT, max_retries=0, timeout=LLM_TIMEOUT_S)
+        return _clients["groq"]
+
+
+def get_chat_llm(model_name: str, **kwargs):
+    """Long-lived LangChain ChatGroq model on the shared connection pool."""
+    key = ("chat", model_name, tuple(sorted(kwargs.items())))
+    with _lock:
+        if key not in _clients:
+            from langchain_groq import ChatGroq
+            _clients[key] = ChatGroq(
+                model_name=model_name,
+                http_client=_HTTP_CLIENT,
+                max_retries=0,
+                request_timeout=LLM_TIMEOUT_S,
+                **kwargs
+            )
+        return _clients[key]
+
+
+def get_gemini_model(model_name: str, api_key: str):
+    """Long-lived Gemini model; genai.configure is only called once per API key."""
+    key = ("gemini", model_name, api_key)
+    with _lock:
+        if key not in _clients:
+            import google.generativeai as genai
+            if _clients.get("gemini_api_key") != api_key:
+                genai.configure(api_key=api_key)
+                _clients["gemini_api_key"] = api_key
+            _clients[key] = genai.GenerativeModel(model_name)
+        return _clients[key]
+
+
+def _semaphore(model: str) -> threading.BoundedSemaphore:
+    with _lock:
+        if model not in _semaphores:
+            _semaphores[model] = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+        return _semaphores[model]
+
+
+def _record_latency(model: str, seconds: float):
+    with _lock:
+        _latencies.setdefault(model, deque(maxlen=500)).append(seconds)
+
+
+def latency_p95(model: str):
+    """p95 of recent successful call latencies for a model, or None if too few samples."""
+    with _lock:
+        samples = sorted(_latencies.get(model, ()))
+    if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+def _is_retryable(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    return isinstance(exc, (httpx.TransportError, ConnectionError, LLMTimeoutError)) \
+        or type(exc).__name__ in RETRYABLE_ERRORS
+
+
+def _submit(model: str, fn, args, kwargs, deadline: float, blocking: bool = True):
+    """
+    Run fn on the gateway pool, holding a concurrency slot of the model while it runs.
+    The slot is taken in the calling thread, waiting at most until the deadline (not at all
+    when blocking is False), so pool threads never wait for one. Returns the future, or
+    None when no slot was free in time.
+    """
+    semaphore = _semaphore(model)
+    if blocking:
+        acquired = semaphore.acquire(timeout=max(0.0, deadline - time.monotonic()))
+    else:
+        acquired = semaphore.acquire(blocking=False)
+    if not acquired:
+        return None
+    context = contextvars.copy_context()
+
+    def run():
+        start = time.perf_counter()
+        try:
+            with span("llm"):
+                result = fn(*args, **kwargs)
+        except Exception:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, model=model, outcome="error")
+            raise
+        finally:
+            semaphore.release()
+        elapsed = time.perf_counter() - start
+        LLM_REQUEST_SECONDS.observe(elapsed, model=model, outcome="ok")
+        _record_latency(model, elapsed)
+        return result
+
+    try:
+        future = _EXECUTOR.submit(context.run, run)
+    except BaseException:
+        semaphore.release()
+        raise
+    # A future cancelled before it started never reaches run's finally
+    future.add_done_callback(lambda f: f.cancelled() and semaphore.release())
+    return future
+
+
+def _attempt(model: str, fn, args, kwargs, deadline: float, hedge: bool):
+    first = _submit(model, fn, args, kwargs, deadline)
+    if first is None:
+        raise LLMTimeoutError(f"{model} had no free concurrency slot within the deadline")
+    futures = [first]
+    hedge_after = latency_p95(model) if hedge else None
+    if hedge_after is not None:
+        done, _ = wait(futures, timeout=min(hedge_after, max(0.0, deadline - time.monotonic())))
+        if not done and time.monotonic() < deadline:
+            # Only hedge into a free slot: a saturated model gets no extra load
+            second = _submit(model, fn, args, kwargs, deadline, blocking=False)
+            if second is not None:
+                futures.append(second)
+
+    pending = set(futures)
+    error = None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    if error is not None and not pending:
+        raise error
+    # Requests still queued on the pool are dropped, running ones end with the HTTP timeout
+    for future in pending:
+        future.cancel()
+    raise LLMTimeoutError(f"{model} did not answer within the deadline")
+
+
+def call(model: str, fn, /, *args, timeout: float = None, hedge: bool = None, **kwargs):
+    """
+    Call an upstream LLM through the gateway.
+    fn(*args, **kwargs) is run with a per-model concurrency limit, retried with jittered
+    exponential backoff on transient errors, and abandoned once the deadline passes.
+    With hedging enabled a duplicate request is sent when the first has not answered by p95.
+    """
+    deadline = time.monotonic() + (timeout or LLM_TIMEOUT_S)
+    hedge = LLM_HEDGE if hedge is None else hedge
+    attempt = 0
+    while True:
+        try:
+            return _attempt(model, fn, args, kwargs, deadline, hedge)
+        except Exception as e:
+            attempt += 1
+            if attempt > LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            # Full jitter backoff, never sleeping past the deadline
+            backoff = random.uniform(0, LLM_RETRY_BASE_S * (2 ** (attempt - 1)))
+            if time.monotonic() + backoff >= deadline:
+                raise
+            time.sleep(backoff)
@@ -0,0 +1,285 @@
+"""
+Process pool for the column-local parts of DataAnalyzer.deep_clean_data.
+Column data reaches the workers through shared memory (numeric arrays,
+factorized codes) or Arrow IPC buffers (text columns) instead of pickled
+copies; results come back as small values or are written into shared output
+arrays.
+"""
+import os
+import atexit
+import threading
+from multiprocessing import get_context, shared_memory
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # text columns are pickled instead
+    pa = None
+
+from utils.cleaning_ops import (
+    guess_date_format,
+    map_categorical_values,
+    normalize_string_column,
+    parse_dates,
+    take_uniques,
+)
+
+# Default worker count for DataAnalyzer(n_jobs=...) (1 = serial, 0 = every core)
+ANALYZER_N_JOBS = int(os.getenv("ANALYZER_N_JOBS", "1"))
+# Frames smaller than this (rows x columns) stay serial, the pool round trip costs more
+PARALLEL_MIN_CELLS = int(os.getenv("PARALLEL_MIN_CELLS", "2000000"))
+# Start method of the workers; spawn is safe next to the API/Streamlit threads
+POOL_START_METHOD = os.getenv("POOL_START_METHOD", "spawn")
+
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+def resolve_n_jobs(n_jobs) -> int:
+    n_jobs = ANALYZER_N_JOBS if n_jobs is None else n_jobs
+    if n_jobs <= 0:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+def use_pool(df, n_jobs) -> bool:
+    return n_jobs > 1 and df.shape[0] * df.shape[1] >= PARALLEL_MIN_CELLS
+
+
+def get_pool(n_jobs: int) -> ProcessPoolExecutor:
+    """Long-lived pool, workers import pandas and the analyzer once"""
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != n_jobs:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            _POOL = ProcessPoolExecutor(max_workers=n_jobs, mp_context=get_context(POOL_START_METHOD))
+            _POOL_WORKERS = n_jobs
+        return _POOL
+
+
+@atexit.register
+def _shutdown_pool():
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+
+
+class SharedArrays:
+    """Named numpy arrays packed in one shared memory block; workers attach by name"""
+
+    def __init__(self, arrays: dict):
+        self.layout = {}
+        offset = 0
+        for key, array in arrays.items():
+            self.layout[key] = (offset, array.dtype.str, array.shape)
+            # 64-byte aligned slots
+            offset += -(-array.nbytes // 64) * 64
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for key, array in arrays.items():
+            self.view(key)[...] = array
+
+    @classmethod
+    def empty(cls, specs: dict) -> "SharedArrays":
+        """Output block from {key: (shape, dtype)}"""
+        return cls({key: np.empty(shape, dtype=dtype) for key, (shape, dtype) in specs.items()})
+
+    @property
+    def handle(self) -> tuple:
+        return self.shm.name, self.layout
+
+    def view(self, key) -> np.ndarray:
+        offset, dtype, shape = self.layout[key]
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Attached:
+    """Worker side of a SharedArrays block; copy what you keep before leaving the block"""
+
+    def __init__(self, handle):
+        name, self.layout = handle
+        self.shm = shared_memory.SharedMemory(name=name)
+
+    def view(self, key) -> np.ndarray:
+        offset, dtype, shape = self.layout[key]
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shm.close()
+
+
+def share_text_columns(df, cols) -> tuple:
+    """
+    Text columns as Arrow IPC streams in one shared block: (SharedArrays, {col: source}).
+    Columns Arrow cannot hold losslessly (mixed objects) and all columns when pyarrow
+    is missing are passed as pickled arrays.
+    """
+    buffers = {}
+    sources = {}
+    for col in cols:
+        values = df[col]
+        if pa is not None and pd.api.types.infer_dtype(values, skipna=True) == 'string':
+            try:
+                sink = pa.BufferOutputStream()
+                array = pa.array(values.to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+                with pa.ipc.new_stream(sink, pa.schema([("values", pa.string())])) as writer:
+                    writer.write_batch(pa.record_batch([array], names=["values"]))
+                buffers[col] = np.frombuffer(sink.getvalue(), dtype=np.uint8)
+                sources[col] = ("arrow", col)
+                continue
+            except (pa.ArrowException, UnicodeError):
+                pass
+        sources[col] = ("pickle", values.to_numpy(dtype=object))
+    return SharedArrays(buffers), sources
+
+
+def _read_text_column(block, source) -> pd.Series:
+    kind, payload = source
+    if kind == "pickle":
+        return pd.Series(payload, dtype=object)
+    reader = pa.ipc.open_stream(pa.py_buffer(block.view(payload)))
+    array = reader.read_all().column(0)
+    return pd.Series(array.to_numpy(zero_copy_only=False), dtype=object)
+
+
+def object_column_task(text_handle, source, out_handle, col, date_format, is_candidate):
+    """
+    Steps 2-4 of deep_clean_data for one object column.
+    Date candidates that parse well enough come back parsed; other columns write their
+    codes into the shared output and return the normalized and mapped uniques.
+    """
+    with _Attached(text_handle) as block:
+        values = _read_text_column(block, source)
+    if is_candidate:
+        try:
+            parsed = parse_dates(values, date_format)
+            valid_dates = parsed.notna().sum()
+            if valid_dates > 0 and valid_dates > 0.3 * len(parsed):
+                return {"dates": parsed}
+        except Exception:
+            pass
+    codes, uniques = normalize_string_column(values)
+    with _Attached(out_handle) as out:
+        out.view(col)[...] = codes
+    return {"uniques": uniques.tolist(), "mapped": map_categorical_values(uniques).tolist()}
+
+
+def numeric_column_task(handle, col):
+    with _Attached(handle) as block:
+        series = pd.Series(block.view(col).copy())
+    return numeric_fill_and_bounds(series)
+
+
+def numeric_fill_and_bounds(series):
+    """Median fill value and IQR clip bounds of one numeric column, as the serial steps compute them"""
+    result = {"median": None, "bounds": None}
+    if series.isnull().sum() > 0:
+        median_val = series.median()
+        if pd.notna(median_val):
+            result["median"] = median_val
+            series = series.fillna(median_val)
+    if series.nunique() > 1:
+        Q1 = series.quantile(0.25)
+        Q3 = series.quantile(0.75)
+        IQR = Q3 - Q1
+        if IQR > 0:
+            result["bounds"] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+    return result
+
+
+def object_finish_task(codes_handle, codes_key, out_handle, col, mapped, encode):
+    """Mode fill value, label codes and their categories of one normalized text column"""
+    with _Attached(codes_handle) as block:
+        codes = block.view(codes_key).copy()
+    uniques = np.asarray(mapped + [np.nan], dtype=object)
+    # Code -1 (missing) picks the trailing NaN
+    series = pd.Series(uniques[codes], dtype=object)
+    result = {"mode": None}
+    if series.isnull().sum() > 0:
+        mode_values = series.mode()
+        result["mode"] = mode_values[0] if len(mode_values) > 0 else 'unknown'
+        series = series.fillna(result["mode"])
+    if encode:
+        categorical = series.astype('category')
+        result["categories"] = categorical.cat.categories.tolist()
+        with _Attached(out_handle) as out:
+            out.view(col)[...] = categorical.cat.codes
+    return result
+
+
+def clean_object_columns(cleaned_df, object_cols, date_samples, n_jobs):
+    """
+    Steps 2-4 of deep_clean_data on the pool, applied to cleaned_df in column order.
+    Returns (date_cols, {string col: (codes, mapped uniques)}).
+    """
+    pool = get_pool(n_jobs)
+    text_block, sources = share_text_columns(cleaned_df, object_cols)
+    with text_block, SharedArrays.empty({col: ((len(cleaned_df),), np.intp) for col in object_cols}) as codes_block:
+        futures = {
+            col: pool.submit(
+                object_column_task, text_block.handle, sources[col], codes_block.handle, col,
+                guess_date_format(date_samples[col]) if col in date_samples else None, col in date_samples,
+            )
+            for col in object_cols
+        }
+        date_cols = []
+        factorized = {}
+        for col in object_cols:
+            result = futures[col].result()
+            if "dates" in result:
+                cleaned_df[col] = result["dates"].set_axis(cleaned_df.index).rename(col)
+                date_cols.append(col)
+            else:
+                codes = codes_block.view(col).copy()
+                mapped = pd.Series(result["mapped"], dtype=object)
+                cleaned_df[col] = take_uniques(cleaned_df[col], codes, mapped)
+                factorized[col] = (codes, mapped)
+    return date_cols, factorized
+
+
+def finish_columns(cleaned_df, numeric_cols, factorized, unique_counts, kept_rows, n_jobs):
+    """
+    Per-column inputs of steps 6-9 computed on the pool: median fill and clip bounds of
+    numeric columns, mode fill and label codes of text columns. {col: result}
+    """
+    pool = get_pool(n_jobs)
+    strings = [col for col in factorized if col in cleaned_df.columns]
+    numeric = [col for col in numeric_cols if col in cleaned_df.columns]
+    shared = [col for col in numeric if isinstance(cleaned_df[col].dtype, np.dtype)]
+    encode = {col: 1 < unique_counts[col] < 20 for col in strings}
+
+    inputs = {("numeric", col): cleaned_df[col].to_numpy() for col in shared}
+    inputs.update({("codes", col): factorized[col][0][kept_rows] for col in strings})
+    outputs = {col: ((len(kept_rows),), np.int8) for col in strings if encode[col]}
+    results = {}
+    with SharedArrays(inputs) as block, SharedArrays.empty(outputs) as out:
+        futures = {col: pool.submit(numeric_column_task, block.handle, ("numeric", col)) for col in shared}
+        futures.update({
+            col: pool.submit(object_finish_task, block.handle, ("codes", col), out.handle, col,
+                             factorized[col][1].tolist(), encode[col])
+            for col in strings
+        })
+        # Extension dtypes (nullable ints, ...) cannot be shared as plain arrays, run them here
+        for col in numeric:
+            if col not in futures:
+                results[col] = numeric_fill_and_bounds(cleaned_df[col])
+        for col, future in futures.items():
+            results[col] = future.result()
+            if col in outputs:
+                results[col]["codes"] = out.view(col).copy()
+    return results
@@ -0,0 +1,68 @@
+"""
+Small dependency-graph runner for the analysis pages.
+Each stage is a function plus the names of the stages it needs; a stage starts
+on a thread pool as soon as its dependencies are done and receives their
+results as keyword arguments. Results are yielded as stages finish, so the
+caller (the Streamlit script thread, the only one allowed to draw) renders
+each section as soon as it is ready. Wall time is close to the slowest chain
+of stages rather than the sum.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.metrics import stage as timed_stage
+
+
+class StageSkipped(RuntimeError):
+    """Result of a stage whose dependency failed."""
+
+
+def run_stages(stages: dict, max_workers: int = None):
+    """
+    Run {name: (fn, deps)} and yield (name, result, error) as each stage finishes.
+    fn(**{dep: result}) runs once every dep succeeded; stages downstream of a failure
+    are yielded with a StageSkipped error instead of running.
+    """
+    for name, (_, deps) in stages.items():
+        missing = [dep for dep in deps if dep not in stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+
+    results, failed = {}, set()
+    pending = dict(stages)
+    running = {}
+
+    def start(executor, name):
+        fn, deps = pending.pop(name)
+        # Copy the context so metrics and profiling spans stay attributed to the caller
+        context = contextvars.copy_context()
+
+        def run():
+            with timed_stage(f"analysis_{name}"):
+                return fn(**{dep: results[dep] for dep in deps})
+
+        running[executor.submit(context.run, run)] = name
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1, thread_name_prefix="analysis") as executor:
+        while pending or running:
+            skipped = True
+            while skipped:
+                skipped = [name for name, (_, deps) in pending.items() if any(dep in failed for dep in deps)]
+                for name in skipped:
+                    pending.pop(name)
+                    failed.add(name)
+                    yield name, None, StageSkipped(f"{name} skipped, a dependency failed")
+            for name in [name for name, (_, deps) in pending.items() if all(dep in results for dep in deps)]:
+                start(executor, name)
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle between stages: {list(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    results[name] = future.result()
+                else:
+                    failed.add(name)
+                yield name, results.get(name), error
@@ -0,0 +1,232 @@
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+# Where profiles of sampled requests are written
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./.profiles")
+# Profiles kept (and their total size), the oldest ones are removed
+PROFILE_MAX_COUNT = int(os.getenv("PROFILE_MAX_COUNT", "200"))
+PROFILE_MAX_BYTES = int(float(os.getenv("PROFILE_MAX_MB", "100")) * 1024 * 1024)
+# Fraction of requests profiled without the X-Profile header (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Interval (seconds) between two stack samples of a profiled request
+PROFILE_INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_S", "0.005"))
+# Secret a client sends in X-Profile-Token to profile a request (X-Profile) or read the
+# /debug/profiles routes; unset, both are disabled and only sampling profiles requests
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+
+PROFILE_HEADER = "x-profile"
+PROFILE_TOKEN_HEADER = "x-profile-token"
+
+# Span categories shown in the span tree
+STAGE_CATEGORIES = {
+    "query_embedding": "retrieval",
+    "mmr_search": "retrieval",
+    "llm": "llm",
+    "llm_first_token": "llm",
+    "llm_total": "llm",
+    "prompt_build": "llm",
+    "csv_parse": "parsing",
+    "pdf_parse": "parsing",
+    "image_decode": "parsing",
+    "cache_read": "cache",
+    "cache_write": "cache",
+    "history_rebuild": "cache",
+}
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+current_profile = contextvars.ContextVar("current_profile", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, category: str = None):
+        self.name = name
+        self.category = category or STAGE_CATEGORIES.get(name, "other")
+        self.start = time.perf_counter()
+        self.end = None
+        self.thread = threading.current_thread().name
+        self.children = []
+
+    def to_dict(self, origin: float) -> dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "name": self.name,
+            "category": self.category,
+            "thread": self.thread,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+
+class RequestProfile:
+    """
+    Sampling profile and span tree of one request.
+    A background thread samples the stacks of every thread that opened a span
+    for this request and counts them as folded (flamegraph-ready) stacks.
+    """
+
+    def __init__(self, request_id: str, endpoint: str):
+        self.request_id = request_id
+        self.endpoint = endpoint
+        self.root = Span("request", "request")
+        self.thread_ids = set()
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{request_id}", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self.root.end = time.perf_counter()
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample(self):
+        while not self._stop.wait(PROFILE_INTERVAL_S):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.samples[_fold(frame)] += 1
+
+    def save(self, directory: str = PROFILE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{self.request_id}.folded"), "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(directory, f"{self.request_id}.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "request_id": self.request_id,
+                "endpoint": self.endpoint,
+                "sample_interval_s": PROFILE_INTERVAL_S,
+                "samples": sum(self.samples.values()),
+                "spans": self.root.to_dict(self.root.start),
+            }, f, indent=2)
+        _prune(directory)
+
+
+def _prune(directory: str = PROFILE_DIR):
+    """Remove the oldest profiles past PROFILE_MAX_COUNT or PROFILE_MAX_BYTES (the newest is kept)"""
+    profiles = {}
+    try:
+        items = list(os.scandir(directory))
+    except OSError:
+        return
+    for item in items:
+        request_id, _, kind = item.name.rpartition(".")
+        if kind not in ("json", "folded"):
+            continue
+        try:
+            stat = item.stat()
+        except OSError:
+            continue
+        saved, size, paths = profiles.get(request_id, (0.0, 0, []))
+        profiles[request_id] = (max(saved, stat.st_mtime), size + stat.st_size, paths + [item.path])
+    total = 0
+    for i, (_, size, paths) in enumerate(sorted(profiles.values(), key=lambda profile: profile[0], reverse=True)):
+        total += size
+        if i > 0 and (i >= PROFILE_MAX_COUNT or total > PROFILE_MAX_BYTES):
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _fold(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def authorized(headers) -> bool:
+    """The request carries PROFILING_TOKEN (never true when no token is configured)"""
+    token = headers.get(PROFILE_TOKEN_HEADER, "")
+    return bool(PROFILING_TOKEN) and hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+def should_profile(headers) -> bool:
+    if headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes") and authorized(headers):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def new_request_id() -> str:
+    """Server-side profile id: client-chosen names could overwrite other profiles"""
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def profile_request(request_id: str, endpoint: str):
+    """Profile everything run under this block (and threads it spans into); the caller saves it."""
+    profile = RequestProfile(request_id, endpoint)
+    profile_token = current_profile.set(profile)
+    span_token = _current_span.set(profile.root)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+        _current_span.reset(span_token)
+        current_profile.reset(profile_token)
+
+
+@contextmanager
+def span(name: str, category: str = None):
+    """Record a span in the current request's profile; a no-op when the request is not profiled."""
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    # Only the outermost span of a thread registers it for sampling
+    registered = thread_id not in profile.thread_ids
+    profile.thread_ids.add(thread_id)
+    new_span = Span(name, category)
+    parent = _current_span.get() or profile.root
+    parent.children.append(new_span)
+    token = _current_span.set(new_span)
+    try:
+        yield
+    finally:
+        new_span.end = time.perf_counter()
+        _current_span.reset(token)
+        if registered:
+            profile.thread_ids.discard(thread_id)
+
+
+def profiled(fn):
+    """Wrap an endpoint so the worker thread running it is sampled when the request is profiled."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span("handler", "handler"):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def load_profile(request_id: str, kind: str = "json", directory: str = PROFILE_DIR):
+    """Return the stored span tree (kind="json") or folded stacks (kind="folded"), or None."""
+    if not _REQUEST_ID_RE.match(request_id):
+        return None
+    path = os.path.join(directory, f"{request_id}.{kind}")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f) if kind == "json" else f.read()
@@ -0,0 +1,71 @@
+import os
+import threading
+from concurrent.futures import Future
+from diskcache import Lock
+from utils.metrics import CACHE_REQUESTS, stage
+
+# How long (seconds) a cross-worker lock may be held before it is considered abandoned
+SINGLE_FLIGHT_LOCK_EXPIRE = int(os.getenv("SINGLE_FLIGHT_LOCK_EXPIRE", "300"))
+# How long (seconds) a shared result stays in the cache when the caller does not keep it
+SINGLE_FLIGHT_RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "60"))
+
+_MISSING = object()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical work so it runs once.
+    Threads of one process wait on a shared Future; uvicorn workers wait on a
+    diskcache Lock and pick the result up from the shared cache.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, fn, expire=None, name: str = "default"):
+        """
+        Return cache[key], computing it with fn() if needed.
+        Concurrent callers with the same key share one call of fn.
+        The result is kept forever when expire is None, otherwise for expire seconds.
+        name labels the cache hit/miss metrics.
+        """
+        with stage("cache_read"):
+            cached = self.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            CACHE_REQUESTS.inc(cache=name, result="hit")
+            return cached
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            CACHE_REQUESTS.inc(cache=name, result="coalesced")
+            return call.result()
+
+        try:
+            result = self._run_across_workers(key, fn, expire, name)
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _run_across_workers(self, key: str, fn, expire, name: str):
+        with Lock(self.cache, f"single-flight:{key}", expire=SINGLE_FLIGHT_LOCK_EXPIRE):
+            # Another worker may have finished while we waited for the lock
+            cached = self.cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                CACHE_REQUESTS.inc(cache=name, result="coalesced")
+                return cached
+            CACHE_REQUESTS.inc(cache=name, result="miss")
+            result = fn()
+            with stage("cache_write"):
+                self.cache.set(key, result, expire=expire)
+            return result
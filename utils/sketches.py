@@ -0,0 +1,487 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Rows per chunk in the streaming (out-of-core) cleaning mode
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "200000"))
+# Distinct values counted exactly per text column before counts and modes become approximate
+STREAM_DISTINCT_CAP = int(os.getenv("STREAM_DISTINCT_CAP", "10000"))
+# From this many rows on quartiles, distinct counts and moments come from one-pass sketches
+APPROX_STATS_MIN_ROWS = int(os.getenv("APPROX_STATS_MIN_ROWS", "5000000"))
+
+
+def weighted_quantile(values, weights, q):
+    """Smallest value whose cumulative weight reaches q of the total weight"""
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    if len(values) == 0:
+        return np.nan
+    order = np.argsort(values, kind="stable")
+    cumulative = np.cumsum(weights[order])
+    index = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+    return float(values[order][min(index, len(values) - 1)])
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty) over floats.
+    Memory is O(k) whatever the stream length; rank error is roughly 1.7 / k (rank_error).
+    Sketches built on separate chunks can be merged.
+    """
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self) -> float:
+        return 1.7 / self.k
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self._compress()
+
+    def _capacity(self, h: int) -> int:
+        # The top level holds k items, each level below holds 2/3 of the one above
+        depth = len(self.levels) - h - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                level = np.sort(level)
+                # An odd item out stays on this level, every other item of the rest moves up with weight x2
+                keep, level = level[:len(level) % 2], level[len(level) % 2:]
+                promoted = level[self._rng.integers(2)::2]
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                self.levels[h] = keep
+            h += 1
+
+    def weighted_items(self):
+        """(values, weights) summarising the stream"""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        return values, weights
+
+    def quantile(self, q: float, extra: dict = None) -> float:
+        """
+        Approximate q-quantile. extra ({value: count}) adds exact point masses,
+        e.g. the missing values a median fill will add.
+        """
+        values, weights = self.weighted_items()
+        if extra:
+            values = np.concatenate([values, list(extra.keys())])
+            weights = np.concatenate([weights, list(extra.values())])
+        return weighted_quantile(values, weights, q)
+
+    def to_dict(self) -> dict:
+        return {
+            "k": self.k, "n": self.n, "min": self.min, "max": self.max,
+            "levels": [level.tolist() for level in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(data["k"])
+        sketch.n = data["n"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.levels = [np.asarray(level, dtype=float) for level in data["levels"]]
+        return sketch
+
+
+class StreamingMoments:
+    """
+    Count, mean, central moments M2-M4, min and max of a float stream in one pass;
+    chunks and merged partial results combine exactly (Chan et al. / Pebay update),
+    so std, skew and kurtosis match the full-data values up to rounding.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        batch = StreamingMoments()
+        batch.n = len(values)
+        batch.mean = float(values.mean())
+        deviations = values - batch.mean
+        squared = deviations * deviations
+        batch.m2 = float(squared.sum())
+        batch.m3 = float((squared * deviations).sum())
+        batch.m4 = float((squared * squared).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other: "StreamingMoments"):
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.__dict__.update(other.__dict__)
+            return
+        n_a, n_b = self.n, other.n
+        n = n_a + n_b
+        delta = other.mean - self.mean
+        delta_n = delta / n
+        m2 = self.m2 + other.m2 + delta * delta_n * n_a * n_b
+        m3 = (self.m3 + other.m3 + delta * delta_n * delta_n * n_a * n_b * (n_a - n_b)
+              + 3 * delta_n * (n_a * other.m2 - n_b * self.m2))
+        m4 = (self.m4 + other.m4
+              + delta * delta_n ** 3 * n_a * n_b * (n_a * n_a - n_a * n_b + n_b * n_b)
+              + 6 * delta_n * delta_n * (n_a * n_a * other.m2 + n_b * n_b * self.m2)
+              + 4 * delta_n * (n_a * other.m3 - n_b * self.m3))
+        self.mean += delta_n * n_b
+        self.n, self.m2, self.m3, self.m4 = n, m2, m3, m4
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1, like Series.std)"""
+        return float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else np.nan
+
+    @property
+    def skew(self) -> float:
+        """Bias-corrected skewness, as Series.skew computes it"""
+        n = self.n
+        if n < 3:
+            return np.nan
+        if self.m2 == 0:
+            return 0.0
+        return float(np.sqrt(n * (n - 1)) / (n - 2) * (self.m3 / n) / (self.m2 / n) ** 1.5)
+
+    @property
+    def kurtosis(self) -> float:
+        """Bias-corrected excess kurtosis, as Series.kurtosis computes it"""
+        n = self.n
+        if n < 4:
+            return np.nan
+        if self.m2 == 0:
+            return 0.0
+        numerator = n * (n + 1) * (n - 1) * self.m4
+        denominator = (n - 2) * (n - 3) * self.m2 ** 2
+        return float(numerator / denominator - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+
+
+class ColumnMoments:
+    """
+    StreamingMoments of every column of a stream of float rows (NaN = missing) at once.
+    A batch is reduced along axis 0 with numpy and merged with the same update, so a whole
+    numeric table is summarized in one vectorized pass; statistics are per-column arrays.
+    """
+
+    def __init__(self, n_columns: int):
+        self.n = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.m3 = np.zeros(n_columns)
+        self.m4 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        present = ~np.isnan(values)
+        if present.all():
+            n = np.full(values.shape[1], float(len(values)))
+            mean = values.mean(axis=0)
+            deviations = values - mean
+            low, high = values.min(axis=0), values.max(axis=0)
+        else:
+            n = present.sum(axis=0).astype(float)
+            mean = np.where(present, values, 0.0).sum(axis=0) / np.maximum(n, 1)
+            deviations = np.where(present, values - mean, 0.0)
+            low = np.where(present, values, np.inf).min(axis=0)
+            high = np.where(present, values, -np.inf).max(axis=0)
+        squared = deviations * deviations
+        self._merge(n, mean, squared.sum(axis=0), (squared * deviations).sum(axis=0), (squared * squared).sum(axis=0), low, high)
+
+    def _merge(self, n_b, mean_b, m2_b, m3_b, m4_b, min_b, max_b):
+        n_a = self.n
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        delta_n = delta / np.maximum(n, 1)
+        m2 = self.m2 + m2_b + delta * delta_n * n_a * n_b
+        m3 = (self.m3 + m3_b + delta * delta_n * delta_n * n_a * n_b * (n_a - n_b)
+              + 3 * delta_n * (n_a * m2_b - n_b * self.m2))
+        m4 = (self.m4 + m4_b
+              + delta * delta_n ** 3 * n_a * n_b * (n_a * n_a - n_a * n_b + n_b * n_b)
+              + 6 * delta_n * delta_n * (n_a * n_a * m2_b + n_b * n_b * self.m2)
+              + 4 * delta_n * (n_a * m3_b - n_b * self.m3))
+        self.mean = self.mean + delta_n * n_b
+        self.n, self.m2, self.m3, self.m4 = n, m2, m3, m4
+        self.min = np.minimum(self.min, min_b)
+        self.max = np.maximum(self.max, max_b)
+
+    @property
+    def var(self) -> np.ndarray:
+        """Sample variance (ddof=1)"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.n > 1, self.m2 / (self.n - 1), np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.var)
+
+    @property
+    def skew(self) -> np.ndarray:
+        """Bias-corrected skewness, as DataFrame.skew computes it"""
+        n = self.n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            skew = np.sqrt(n * (n - 1)) / (n - 2) * (self.m3 / n) / (self.m2 / n) ** 1.5
+        return np.where(n < 3, np.nan, np.where(self.m2 == 0, 0.0, skew))
+
+    @property
+    def kurtosis(self) -> np.ndarray:
+        """Bias-corrected excess kurtosis, as DataFrame.kurtosis computes it"""
+        n = self.n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            kurtosis = (n * (n + 1) * (n - 1) * self.m4 / ((n - 2) * (n - 3) * self.m2 ** 2)
+                        - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+        return np.where(n < 4, np.nan, np.where(self.m2 == 0, 0.0, kurtosis))
+
+
+class CoMoments:
+    """
+    Pairwise sums of a stream of float rows (NaN = missing) for Pearson correlations.
+    Every pair keeps its own count and sums over the rows where both values are present,
+    so corr() matches DataFrame.corr() (pairwise complete observations) up to rounding.
+    Values are shifted by the first batch's column means to limit cancellation. The
+    products of a batch are computed in dtype (float32 halves the BLAS work) and summed in float64.
+    """
+
+    def __init__(self, n_columns: int, dtype=np.float64):
+        self.dtype = dtype
+        self.n = np.zeros((n_columns, n_columns))
+        # sum_x[i, j]: sum of column i over the rows where columns i and j are both present
+        self.sum_x = np.zeros((n_columns, n_columns))
+        self.sum_xx = np.zeros((n_columns, n_columns))
+        self.sum_xy = np.zeros((n_columns, n_columns))
+        self.shift = None
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        if self.shift is None:
+            present = ~np.isnan(values)
+            self.shift = np.where(present.any(axis=0), np.nansum(values, axis=0) / np.maximum(present.sum(axis=0), 1), 0.0)
+        values = values - self.shift
+        present = ~np.isnan(values)
+        x = np.where(present, values, 0.0).astype(self.dtype)
+        mask = present.astype(self.dtype)
+        self.n += mask.T @ mask
+        self.sum_x += x.T @ mask
+        self.sum_xx += (x * x).T @ mask
+        self.sum_xy += x.T @ x
+
+    def corr(self) -> np.ndarray:
+        n = self.n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = n * self.sum_xy - self.sum_x * self.sum_x.T
+            variance = n * self.sum_xx - self.sum_x * self.sum_x
+            corr = covariance / np.sqrt(variance * variance.T)
+        corr[(n < 2) | ~np.isfinite(corr)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter (Flajolet et al.) over 64-bit value hashes, 2**p one-byte
+    registers. Standard error is 1.04 / sqrt(2**p) (0.81% at p=14); small counts switch to
+    linear counting and are close to exact. Counters of separate chunks can be merged.
+    """
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def update(self, values):
+        """Count the non-null values of a Series"""
+        values = values.dropna()
+        if len(values):
+            self.update_hashes(pd.util.hash_pandas_object(values, index=False).to_numpy())
+
+    def update_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes << np.uint64(self.p)
+        # Leading zeros of the remaining bits by binary search, exact on uint64
+        zeros = np.zeros(len(rest), dtype=np.uint8)
+        for shift in (32, 16, 8, 4, 2, 1):
+            top_clear = rest < np.uint64(1 << (64 - shift))
+            zeros[top_clear] += shift
+            rest[top_clear] <<= np.uint64(shift)
+        rank = np.minimum(zeros, 64 - self.p) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and empty:
+            estimate = m * np.log(m / empty)
+        return int(round(estimate))
+
+
+class FrequentItems:
+    """
+    Value counts capped at `capacity` distinct values (mergeable Misra-Gries summary).
+    Counts, mode and the distinct values are exact as long as the cap was never hit;
+    past it counts are underestimated by at most n / capacity.
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = capacity
+        self.counts = {}
+        self.n = 0
+        self.exact = True
+
+    def update_counts(self, counts: dict):
+        for value, count in counts.items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+            self.n += int(count)
+        self._truncate()
+
+    def update(self, values):
+        """Count the non-null values of a Series"""
+        self.update_counts(values.value_counts(dropna=True).to_dict())
+
+    def merge(self, other: "FrequentItems"):
+        n = self.n + other.n
+        self.update_counts(other.counts)
+        self.n = n
+        self.exact = self.exact and other.exact
+
+    def _truncate(self):
+        if len(self.counts) <= self.capacity:
+            return
+        self.exact = False
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        cutoff = ranked[self.capacity][1]
+        self.counts = {value: count - cutoff for value, count in ranked[:self.capacity] if count > cutoff}
+
+    @property
+    def distinct(self) -> int:
+        """Exact distinct count, or a lower bound (capacity + 1) once the cap was hit"""
+        return len(self.counts) if self.exact else max(len(self.counts), self.capacity + 1)
+
+    def mode(self):
+        """Most frequent value, the smallest one on ties (like Series.mode()[0]); None when empty"""
+        if not self.counts:
+            return None
+        top = max(self.counts.values())
+        return min(value for value, count in self.counts.items() if count == top)
+
+    def distinct_values(self) -> list:
+        if not self.exact:
+            raise ValueError("distinct values are only known below the capacity")
+        return sorted(self.counts)
+
+
+class SeenRowHashes:
+    """
+    Set of 64-bit row hashes kept as a sorted uint64 array (8 bytes per distinct row).
+    add() returns the mask of rows whose hash was not seen before (first occurrence wins).
+    """
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def add(self, hashes) -> np.ndarray:
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        _, first = np.unique(hashes, return_index=True)
+        new = np.zeros(len(hashes), dtype=bool)
+        new[first] = True
+        if len(self.hashes):
+            position = np.searchsorted(self.hashes, hashes)
+            seen = position < len(self.hashes)
+            seen[seen] = self.hashes[position[seen]] == hashes[seen]
+            new &= ~seen
+        self.hashes = np.union1d(self.hashes, hashes[new])
+        return new
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+def column_chunks(series, chunk_rows=STREAM_CHUNK_ROWS):
+    for start in range(0, len(series), chunk_rows):
+        yield series.iloc[start:start + chunk_rows]
+
+
+def sketch_numeric(series):
+    """(KLLSketch, StreamingMoments) of a numeric column in one chunked pass"""
+    sketch = KLLSketch()
+    moments = StreamingMoments()
+    for chunk in column_chunks(series):
+        values = chunk.to_numpy(dtype=float, na_value=np.nan)
+        sketch.update(values)
+        moments.update(values)
+    return sketch, moments
+
+
+def approximate_nunique(series):
+    counter = HyperLogLog()
+    for chunk in column_chunks(series):
+        counter.update(chunk)
+    return counter.count()
+
+
+def approximate_top(series, n):
+    """Approximate value_counts().head(n) from a bounded frequent-items summary"""
+    counts = FrequentItems(STREAM_DISTINCT_CAP)
+    for chunk in column_chunks(series):
+        counts.update(chunk)
+    return dict(sorted(counts.counts.items(), key=lambda item: item[1], reverse=True)[:n])
+
+
+def approximation_note(n_rows):
+    return (f"Approximate statistics ({n_rows:,} rows): quartiles within ±{KLLSketch().rank_error:.2%} rank, "
+            f"distinct counts within ±{HyperLogLog().relative_error:.2%}, top-value counts low by at most "
+            f"{n_rows // STREAM_DISTINCT_CAP:,}; count, mean, std, min, max, skew and kurtosis are exact")